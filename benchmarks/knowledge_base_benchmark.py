@@ -0,0 +1,217 @@
+import json
+import os
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from implementation.model.clause import Clause
+from implementation.solver.knowledge_base import KnowledgeBase
+from implementation.solver.solver_lookahead import LookAHeadSolver
+from implementation.util.data_management import DataManager
+
+#### Constants
+DATA = os.path.join(os.path.dirname(__file__), "..", "legacy", "data")
+RULES = os.path.join(DATA, "sudoku-rules.txt")
+SUDOKUS = os.path.join(DATA, "sudokus", "damnhard.sdk.txt")
+NUMBER_OF_SUDOKUS = 10
+DECISIONS = 2
+MIN_OPEN_VARIABLES = 100
+ATTEMPTS = 20
+SAMPLES = 50
+REPEATS = 3
+TRACED_SAMPLES = 5
+SEED = 0
+HISTORY = os.path.join(os.getcwd(), "results", "knowledge-base-benchmark.jsonl")
+
+data_manager = DataManager(os.getcwd() + '/results/')
+
+
+def mid_solve_state(clauses: Dict[int, Clause], rng: random.Random) -> KnowledgeBase:
+    """
+    Builds the state of a sudoku partway through a solve: the givens are propagated and a few random decisions
+    are taken on top of them, each followed by simplification. Decisions that lead to a conflict or leave
+    fewer than MIN_OPEN_VARIABLES unassigned are undone.
+    The knowledge base keeps the literal weights, like the one of the look ahead solver.
+
+    :param clauses:
+    :param rng:
+    :return:
+    """
+
+    state = KnowledgeBase(clauses, clause_counter=len(clauses), dependency_graph=False, trail=True)
+    state.track_weights()
+    state.simplify([], False)
+
+    decisions = 0
+    for _ in range(ATTEMPTS):
+        if (decisions == DECISIONS or len(state.bookkeeping) == 0):
+            break
+
+        level = state.decision_level
+        state.new_decision_level()
+        if state.set_literal(rng.choice(sorted(state.bookkeeping)), rng.random() < 0.5)[0] and state.simplify([], False)[0] \
+                and len(state.bookkeeping) >= MIN_OPEN_VARIABLES:
+            decisions += 1
+        else:
+            state.backtrack(level)
+
+    return state
+
+
+def operations(solver: LookAHeadSolver) -> Dict[str, Callable]:
+    """
+    The benchmarked operations. Each one gets a state and a random generator, prepares the state without being
+    measured and returns the call to measure. The state is backtracked to its decision level afterwards.
+
+    :param solver: look ahead solver for the diff, which only reads the states
+    :return:
+    """
+
+    def unassigned(state: KnowledgeBase, rng: random.Random) -> int:
+        return rng.choice(sorted(state.bookkeeping))
+
+    def set_literal(state, rng):
+        literal = unassigned(state, rng)
+        return lambda: state.set_literal(literal, rng.random() < 0.5)
+
+    def simplify_unit_clauses(state, rng):
+        state.set_literal(unassigned(state, rng), rng.random() < 0.5)
+        return lambda: state.simplify_unit_clauses([], False)
+
+    def simplify_pure_literal(state, rng):
+        state.set_literal(unassigned(state, rng), rng.random() < 0.5)
+        state.simplify_unit_clauses([], False)
+        return lambda: state.simplify_pure_literal([], False)
+
+    def remove_clauses(state, rng):
+        # the clauses a literal would satisfy
+        clauses = [state.clauses[id] for id in state.bookkeeping[unassigned(state, rng)]]
+        return lambda: state.remove_clauses(clauses)
+
+    def add_clause(state, rng):
+        # a ternary clause over unassigned variables, like a learned clause
+        literals = [variable if rng.random() < 0.5 else -variable for variable in rng.sample(sorted(state.bookkeeping), 3)]
+        clause = Clause(state.clause_counter + 1, literals)
+        return lambda: state.add_clause(clause)
+
+    def duplicate_knowledge_base(state, rng):
+        return lambda: data_manager.duplicate_knowledge_base(state, 0)
+
+    def diff(state, rng):
+        # the state before and after a probe, as the look ahead compares them
+        before = KnowledgeBase({}, clause_lengths=state.clause_lengths.copy())
+        state.set_literal(unassigned(state, rng), rng.random() < 0.5)
+        state.simplify_unit_clauses([], False)
+        return lambda: solver.diff(before, state)
+
+    return {"set_literal": set_literal,
+            "simplify_unit_clauses": simplify_unit_clauses,
+            "simplify_pure_literal": simplify_pure_literal,
+            "remove_clauses": remove_clauses,
+            "add_clause": add_clause,
+            "duplicate_knowledge_base": duplicate_knowledge_base,
+            "LookAHeadSolver.diff": diff}
+
+
+def measure(states: List[KnowledgeBase], prepare: Callable, samples: int, trace: bool) -> float:
+    """
+    Runs an operation a number of times on every state
+
+    :param states:
+    :param prepare: prepares a state and returns the call to measure
+    :param samples: calls per state
+    :param trace: measure allocations instead of time, tracing slows everything down so both are not done at once
+    :return: total seconds of all calls, or the mean peak of bytes allocated during a call
+    """
+
+    rng = random.Random(SEED)
+    total = 0.0
+
+    for state in states:
+        level = state.decision_level
+        for _ in range(samples):
+            state.new_decision_level()
+            call = prepare(state, rng)
+
+            if (trace):
+                tracemalloc.reset_peak()
+                allocated = tracemalloc.get_traced_memory()[0]
+                call()
+                total += tracemalloc.get_traced_memory()[1] - allocated
+            else:
+                start = timeit.default_timer()
+                call()
+                total += timeit.default_timer() - start
+
+            state.backtrack(level)
+
+    return total / (samples * len(states)) if trace else total
+
+
+def main(number_of_sudokus: int, label: str = ""):
+    """
+    Measures the operations per second and the bytes allocated per operation of the knowledge base primitives
+    on states taken partway through sudoku solves. Every run is appended to results/knowledge-base-benchmark.jsonl
+    and compared with the previous run in there.
+
+    :param number_of_sudokus:
+    :param label: stored with the run, for instance the change that is measured
+    :return:
+    """
+
+    rules, last_id = data_manager.read_rules_dimacs(RULES, id=0)
+    rng = random.Random(SEED)
+
+    states = []
+    for number in range(number_of_sudokus):
+        givens, found, _ = data_manager.read_text_sudoku(SUDOKUS, number, last_id)
+        if not found:
+            break
+
+        clauses = data_manager.personal_deepcopy(rules)
+        clauses.update(givens)
+        state = mid_solve_state(clauses, rng)
+        if (len(state.bookkeeping) >= MIN_OPEN_VARIABLES):
+            states.append(state)
+
+    solver = LookAHeadSolver(KnowledgeBase({}))
+    results = {}
+
+    for name, prepare in operations(solver).items():
+        # the fastest repeat is the one least disturbed by the rest of the machine
+        seconds = min(measure(states, prepare, SAMPLES, trace=False) for _ in range(REPEATS))
+
+        # allocations do not depend on the machine, a few calls are enough
+        tracemalloc.start()
+        allocated = measure(states, prepare, TRACED_SAMPLES, trace=True)
+        tracemalloc.stop()
+
+        results[name] = {"ops_per_second": SAMPLES * len(states) / max(seconds, 1e-9), "bytes_per_op": allocated}
+
+    previous = None
+    if (os.path.exists(HISTORY)):
+        with open(HISTORY) as file:
+            lines = [line for line in file if len(line.strip()) > 0]
+            if (len(lines) > 0):
+                previous = json.loads(lines[-1])
+
+    print(f"{len(states)} states, best of {REPEATS} times {SAMPLES} calls each" + (f", compared with {previous['time']} {previous['label']}" if previous else ""))
+    for name, values in results.items():
+        change = ""
+        if (previous is not None and name in previous["operations"]):
+            change = f" ({100 * (values['ops_per_second'] / previous['operations'][name]['ops_per_second'] - 1):+.1f}%)"
+        print(f"  {name}: {values['ops_per_second']:.0f} ops/second{change}, {values['bytes_per_op']:.0f} bytes allocated per op")
+
+    os.makedirs(os.path.dirname(HISTORY), exist_ok=True)
+    with open(HISTORY, "a") as file:
+        file.write(json.dumps({"time": time.strftime("%Y-%m-%d %H:%M:%S"), "label": label, "states": len(states), "operations": results}) + "\n")
+
+
+if __name__ == "__main__":
+
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER_OF_SUDOKUS, sys.argv[2] if len(sys.argv) > 2 else "")
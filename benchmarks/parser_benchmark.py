@@ -0,0 +1,114 @@
+import math
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from implementation.model.clause_store import ClauseStore
+from implementation.util.dimacs_parser import DimacsParser
+
+#### Constants
+VARIABLES_PER_CLAUSE = 0.23
+CLAUSE_LENGTH = 3
+SMALLEST = 62500
+DOUBLINGS = 5
+SEED = 0
+
+
+def write_cnf(path: str, number_of_clauses: int, seed: int):
+    """
+    Writes a random 3-SAT formula in dimacs, with comments, clauses spread over two lines and several clauses on one line
+
+    :param path:
+    :param number_of_clauses:
+    :param seed:
+    :return:
+    """
+
+    rng = random.Random(seed)
+    number_of_variables = max(CLAUSE_LENGTH, int(number_of_clauses * VARIABLES_PER_CLAUSE))
+
+    with open(path, "w") as f:
+        f.write(f"c random {CLAUSE_LENGTH}-SAT, seed {seed}\n")
+        f.write(f"p cnf {number_of_variables} {number_of_clauses}\n")
+
+        lines = []
+        for number in range(number_of_clauses):
+            clause = " ".join(str(rng.choice([1, -1]) * variable) for variable in rng.sample(range(1, number_of_variables + 1), CLAUSE_LENGTH))
+            if number % 100 == 0:
+                lines.append(f"c clause {number}\n")
+            if number % 7 == 0:
+                # spread over two lines
+                head, tail = clause.split(" ", 1)
+                lines.append(f"{head}\n{tail} 0\n")
+            elif number % 5 == 0:
+                # shares the line with the next clause
+                lines.append(f"{clause} 0 ")
+            else:
+                lines.append(f"{clause} 0\n")
+
+            if len(lines) >= 10000:
+                f.write("".join(lines))
+                lines = []
+
+        f.write("".join(lines))
+
+
+def parse(path: str):
+    """
+    Parses a file straight into a clause store
+
+    :param path:
+    :return: number of clauses, number of literals and the time it took
+    """
+
+    start = timeit.default_timer()
+    store = ClauseStore.build_flat(DimacsParser().parse_file_flat(path))
+    elapsed = timeit.default_timer() - start
+
+    return len(store), len(store.literals), elapsed
+
+
+def main(smallest: int, doublings: int):
+    """
+    Measures the parse time of files that double in size, parse time per literal should stay flat.
+    The slope of log(time) against log(size) is reported: 1 is linear, 2 would be quadratic.
+
+    :param smallest: number of clauses of the smallest file
+    :param doublings:
+    :return:
+    """
+
+    sizes = []
+    times = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for doubling in range(doublings + 1):
+            number_of_clauses = smallest * 2 ** doubling
+            path = os.path.join(directory, f"random_{number_of_clauses}.cnf")
+            write_cnf(path, number_of_clauses, SEED + doubling)
+
+            clauses, literals, elapsed = parse(path)
+            if clauses != number_of_clauses:
+                raise Exception(f"Parsed {clauses} clauses instead of {number_of_clauses}")
+
+            sizes.append(os.path.getsize(path))
+            times.append(elapsed)
+            print(f"{clauses} clauses, {sizes[-1] / 1e6:.1f} MB: {elapsed:.3f}s, {1e9 * elapsed / literals:.0f} ns/literal, {sizes[-1] / 1e6 / elapsed:.1f} MB/s")
+
+    # least squares slope in log-log space
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(time) for time in times]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+
+    print(f"scaling exponent: {slope:.2f} (1.00 is linear)")
+
+
+if __name__ == "__main__":
+
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else SMALLEST, int(sys.argv[2]) if len(sys.argv) > 2 else DOUBLINGS)
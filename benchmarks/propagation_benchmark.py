@@ -0,0 +1,105 @@
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from implementation.solver.knowledge_base import KnowledgeBase
+from implementation.solver.watched_knowledge_base import WatchedKnowledgeBase
+from implementation.util.data_management import DataManager
+
+#### Constants
+DATA = os.path.join(os.path.dirname(__file__), "..", "legacy", "data")
+RULES = os.path.join(DATA, "sudoku-rules.txt")
+SUDOKUS = os.path.join(DATA, "sudokus", "1000sudokus.txt")
+NUMBER_OF_SUDOKUS = 1000
+PROBES_PER_SUDOKU = 20
+
+
+def propagate(state: KnowledgeBase):
+    """
+    Runs unit propagation on a state, returns the number of literals propagated, the time it took and validity
+
+    :param state:
+    :return:
+    """
+
+    assigned = len(state.current_set_literals)
+    start = timeit.default_timer()
+    valid = state.simplify_unit_clauses([], False)[0]
+    elapsed = timeit.default_timer() - start
+
+    return len(state.current_set_literals) - assigned, elapsed, valid
+
+
+def benchmark_state(state: KnowledgeBase, probes: int):
+    """
+    Propagates the givens of a sudoku and then probes both truth values of the first unassigned variables,
+    undoing each probe on the trail
+
+    :param state:
+    :param probes:
+    :return: number of propagated literals and time spent propagating
+    """
+
+    propagations, runtime, valid = propagate(state)
+    if not valid:
+        return propagations, runtime
+
+    candidates = [literal for literal in sorted(state.bookkeeping.keys()) if literal not in state.current_set_literals]
+    for literal in candidates[:probes]:
+        for truth_value in [True, False]:
+            state.new_decision_level()
+            start = timeit.default_timer()
+            state.set_literal(literal, truth_value)
+            runtime += timeit.default_timer() - start
+            probe_propagations, probe_runtime, _ = propagate(state)
+            propagations += probe_propagations + 1
+            runtime += probe_runtime
+            state.backtrack(0)
+
+    return propagations, runtime
+
+
+def main(number_of_sudokus: int):
+    """
+    Compares propagations per second of the set based knowledge base (in trail mode) with the watched literal one
+    on the sudoku rules plus the givens of each sudoku
+
+    :param number_of_sudokus:
+    :return:
+    """
+
+    data_manager = DataManager(os.getcwd() + '/results/')
+    rules, last_id = data_manager.read_rules_dimacs(RULES, id=0)
+
+    totals = {"set based": [0, 0.0], "watched literals": [0, 0.0]}
+
+    for number in range(number_of_sudokus):
+        givens, found, _ = data_manager.read_text_sudoku(SUDOKUS, number, last_id)
+        if not found:
+            break
+
+        for name in totals:
+            clauses = data_manager.personal_deepcopy(rules)
+            clauses.update(data_manager.personal_deepcopy(givens))
+
+            if name == "watched literals":
+                state = WatchedKnowledgeBase(clauses, clause_counter=len(clauses))
+            else:
+                state = KnowledgeBase(clauses, clause_counter=len(clauses), dependency_graph=False, trail=True)
+
+            propagations, runtime = benchmark_state(state, PROBES_PER_SUDOKU)
+            totals[name][0] += propagations
+            totals[name][1] += runtime
+
+        print(f"\rBenchmarked {number + 1} sudokus", end='')
+
+    print()
+    for name, (propagations, runtime) in totals.items():
+        print(f"{name}: {propagations} propagations in {runtime:.3f}s, {propagations / max(runtime, 1e-9):.0f} propagations/second")
+
+
+if __name__ == "__main__":
+
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER_OF_SUDOKUS)
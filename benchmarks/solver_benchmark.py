@@ -0,0 +1,202 @@
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import timeit
+from multiprocessing import Pool
+from typing import Dict, List, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import main as sat
+from implementation.model.exception_implementations import RestartException
+from implementation.solver.solver_lookahead import LookAHeadSolver
+
+#### Constants
+DATA = os.path.join(os.path.dirname(__file__), "..", "legacy", "data")
+RULES = os.path.join(DATA, "sudoku-rules.txt")
+
+# name, file and the puzzle numbers solved from it, None for a dimacs file that is solved as it is
+INSTANCE_SETS = [
+    ("1000sudokus", os.path.join(DATA, "sudokus", "1000sudokus.txt"), list(range(10))),
+    ("damnhard", os.path.join(DATA, "sudokus", "damnhard.sdk.txt"), list(range(3))),
+    ("uf20-01", os.path.join(DATA, "sudokus", "uf20-01.cnf"), None),
+]
+VERSIONS = [1, 2, 3]
+SEEDS = [0, 1]
+TRIALS = 3
+
+# a configuration fails when its median wall time is this fraction slower than in the baseline
+SLOWDOWN_THRESHOLD = 0.25
+
+# slowdowns of less than this many seconds are timer noise and never fail
+MIN_SLOWDOWN = 0.05
+
+RESULTS = os.path.join(os.getcwd(), "results", "solver-benchmark.json")
+BASELINE = os.path.join(os.getcwd(), "results", "solver-benchmark-baseline.json")
+
+
+def load_instances(path: str, puzzles: List[int]) -> Tuple[Dict, List[Tuple[Dict, int]]]:
+    """
+    Reads the clauses that every instance of a set starts from and the clauses that make each instance
+
+    :param path:
+    :param puzzles: puzzle numbers of the sudokus, None for a dimacs file
+    :return: the shared clauses and per instance its extra clauses with the last clause id in use
+    """
+
+    if (puzzles is None):
+        clauses, last_id = sat.data_manager.read_rules_dimacs(path, id=0)
+        return clauses, [({}, last_id)]
+
+    rules, last_id = sat.data_manager.read_rules_dimacs(RULES, id=0)
+    with open(path) as file:
+        lines = [line.strip() for line in file if len(line.strip()) > 0]
+
+    return rules, [sat.data_manager.parse_text_sudoku(lines[puzzle], last_id) for puzzle in puzzles]
+
+
+def run(task: Tuple[int, str, str, List[int], int]) -> Dict:
+    """
+    Solves every instance of a set with one version and seed, in a process of its own so that
+    the peak memory is that of this run
+
+    :param task: version, name, path and puzzle numbers of the set, seed
+    :return: the measurements of the run
+    """
+
+    program_version, name, path, puzzles, seed = task
+    with contextlib.redirect_stdout(io.StringIO()):
+        shared, instances = load_instances(path, puzzles)
+
+    measurements = {"version": program_version, "instances": name, "seed": seed, "wall_time": 0.0,
+                    "splits": 0, "conflicts": 0, "propagations": 0, "solved": 0}
+
+    for extra, last_id in instances:
+        random.seed(seed)
+        settings = sat.get_settings(program_version)
+        clauses = sat.data_manager.personal_deepcopy(shared)
+        clauses.update(sat.data_manager.personal_deepcopy(extra))
+
+        start = timeit.default_timer()
+        with contextlib.redirect_stdout(io.StringIO()):
+            clauses, clause_counter, preprocessor = sat.preprocess(clauses, last_id, settings)
+            solver = sat.get_solver(clauses, clause_counter, settings)
+            try:
+                solution, solved, _ = solver.solve_instance()
+            except RestartException:
+                solution, solved = solver.initial, False
+        measurements["wall_time"] += timeit.default_timer() - start
+
+        search_statistics = solver.search_statistics
+        measurements["splits"] += solver.nr_of_splits if isinstance(solver, LookAHeadSolver) else search_statistics["decisions"]
+        measurements["conflicts"] += search_statistics["conflicts"]
+        measurements["propagations"] += search_statistics.get("propagations", solution.propagations)
+        measurements["solved"] += int(solved)
+
+    # kilobytes on linux
+    measurements["peak_memory_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    return measurements
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    """
+    Groups the runs per version and instance set, with the median over all seeds and trials
+
+    :param runs:
+    :return:
+    """
+
+    configurations = {}
+    for measurements in runs:
+        key = f"v{measurements['version']}/{measurements['instances']}"
+        configurations.setdefault(key, []).append(measurements)
+
+    return {key: {"median_wall_time": statistics.median(measurements["wall_time"] for measurements in group),
+                  "max_peak_memory_mb": max(measurements["peak_memory_mb"] for measurements in group),
+                  "runs": group}
+            for key, group in configurations.items()}
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Compares the median wall time of every configuration with the baseline
+
+    :param results:
+    :param baseline:
+    :param threshold:
+    :return: the configurations that got slower than the threshold allows
+    """
+
+    regressions = []
+    for key, summary in results.items():
+        if (key not in baseline):
+            print(f"{key}: {summary['median_wall_time']:.3f}s (not in baseline)")
+            continue
+
+        before = baseline[key]["median_wall_time"]
+        change = summary["median_wall_time"] / max(before, 1e-9) - 1
+        splits = sum(measurements["splits"] for measurements in summary["runs"])
+        splits_before = sum(measurements["splits"] for measurements in baseline[key]["runs"])
+        print(f"{key}: {summary['median_wall_time']:.3f}s vs {before:.3f}s ({100 * change:+.1f}%)"
+              f"{'' if splits == splits_before else f', splits changed: {splits_before} -> {splits}'}")
+
+        if (change > threshold and summary["median_wall_time"] - before > MIN_SLOWDOWN):
+            regressions.append(key)
+
+    return regressions
+
+
+def main(trials: int, threshold: float):
+    """
+    Solves fixed subsets of the bundled instances with every version and seed, a number of trials each.
+    The measurements are written to results/solver-benchmark.json and compared with
+    results/solver-benchmark-baseline.json, which is created from this run when it does not exist yet.
+    Exits with status 1 when a configuration is slower than the baseline by more than the threshold.
+
+    :param trials:
+    :param threshold: allowed slowdown as a fraction of the baseline
+    :return:
+    """
+
+    tasks = [(program_version, name, path, puzzles, seed)
+             for program_version in VERSIONS
+             for name, path, puzzles in INSTANCE_SETS
+             for seed in SEEDS
+             for _ in range(trials)]
+
+    runs = []
+    with Pool(1, maxtasksperchild=1) as pool:
+        for measurements in pool.imap(run, tasks):
+            runs.append(measurements)
+            print(f"\rBenchmarked {len(runs)}/{len(tasks)} runs", end='')
+    print()
+
+    results = summarize(runs)
+    os.makedirs(os.path.dirname(RESULTS), exist_ok=True)
+    with open(RESULTS, "w") as file:
+        json.dump(results, file, indent=2)
+
+    if (not os.path.exists(BASELINE)):
+        with open(BASELINE, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"No baseline yet, written to {BASELINE}")
+        return
+
+    with open(BASELINE) as file:
+        baseline = json.load(file)
+
+    regressions = compare(results, baseline, threshold)
+    if (len(regressions) > 0):
+        print(f"Slower than the baseline by more than {100 * threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else TRIALS, float(sys.argv[2]) if len(sys.argv) > 2 else SLOWDOWN_THRESHOLD)
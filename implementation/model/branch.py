@@ -0,0 +1,17 @@
+class Branch:
+    """
+    Untried branch on the depth first search stack of the look ahead solver
+
+    a decision (literal and the phase to try) with the point to return to before trying it: the decision level
+    to backtrack to in trail mode, the state to copy otherwise. A branch without literal continues on its state as it is.
+    """
+
+    __slots__ = ("literal", "phase", "undo_point")
+
+    def __init__(self, literal, phase, undo_point):
+        self.literal = literal
+        self.phase = phase
+        self.undo_point = undo_point
+
+    def __repr__(self):
+        return f"Branch({self.literal}, {self.phase}, {self.undo_point if isinstance(self.undo_point, int) else 'state'})"
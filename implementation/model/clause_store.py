@@ -0,0 +1,296 @@
+import hashlib
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from implementation.model.clause import Clause
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError("Please install numpy")
+
+# assignment values
+UNASSIGNED = -1
+FALSE = 0
+TRUE = 1
+
+
+class ClauseStore:
+    """
+    Flat, array backed clause database
+
+    variables are remapped to dense indices 0..n-1 and literals are encoded as 2 * index + sign (sign 1 for negative),
+    all clauses are stored back to back in one int32 buffer with an offset array (CSR layout):
+    the literals of clause i are literals[offsets[i]:offsets[i + 1]].
+
+    occurrence lists use the same layout per encoded literal and assignments are one int8 per variable,
+    so copying, hashing and scanning are operations on a handful of contiguous arrays.
+
+    """
+
+    variables: np.ndarray
+    index: Dict[int, int]
+    literals: np.ndarray
+    offsets: np.ndarray
+    ids: np.ndarray
+    assignments: np.ndarray
+    occurrences: np.ndarray
+    occurrence_offsets: np.ndarray
+
+    def __init__(self, variables, literals, offsets, ids, assignments=None, occurrences=None, occurrence_offsets=None):
+
+        # dense index -> dimacs variable
+        self.variables = np.asarray(variables, dtype=np.int32)
+
+        # dimacs variable -> dense index
+        self.index = {int(variable): i for i, variable in enumerate(self.variables)}
+
+        # encoded literals of all clauses, back to back
+        self.literals = np.asarray(literals, dtype=np.int32)
+
+        # start of every clause in literals, plus the end of the last one
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+
+        # id of each clause (as used by the knowledge base)
+        self.ids = np.asarray(ids, dtype=np.int32)
+
+        # truth value per variable
+        if assignments is None:
+            self.assignments = np.full(len(self.variables), UNASSIGNED, dtype=np.int8)
+        else:
+            self.assignments = np.asarray(assignments, dtype=np.int8)
+
+        # clause indices per encoded literal
+        if occurrences is None or occurrence_offsets is None:
+            self.build_occurrences()
+        else:
+            self.occurrences = np.asarray(occurrences, dtype=np.int32)
+            self.occurrence_offsets = np.asarray(occurrence_offsets, dtype=np.int32)
+
+    @classmethod
+    def build(cls, clauses: Iterable[Iterable[int]], first_id: int = 0, variables: Optional[Iterable[int]] = None) -> "ClauseStore":
+        """
+        Builds a store from an iterable of clauses (each an iterable of dimacs literals), consumed in one pass
+
+        :param clauses:
+        :param first_id: id of the first clause, the others are numbered consecutively
+        :param variables: variables to index even if they do not occur in any clause
+        :return:
+        """
+
+        index = {}
+        if variables is not None:
+            for variable in sorted(variables):
+                index[variable] = len(index)
+
+        literals = array('i')
+        offsets = array('i', [0])
+        for clause in clauses:
+            for literal in clause:
+                variable = abs(literal)
+                if variable not in index:
+                    index[variable] = len(index)
+                literals.append(2 * index[variable] + (literal < 0))
+            offsets.append(len(literals))
+
+        store = cls(np.fromiter(index.keys(), dtype=np.int32, count=len(index)),
+                    np.frombuffer(literals, dtype=np.int32),
+                    np.frombuffer(offsets, dtype=np.int32),
+                    np.arange(first_id, first_id + len(offsets) - 1, dtype=np.int32))
+
+        return store.sorted_variables()
+
+    @classmethod
+    def build_flat(cls, chunks: Iterable[Iterable[int]], first_id: int = 0) -> "ClauseStore":
+        """
+        Builds a store from chunks of dimacs literals in which every clause is terminated by a 0,
+        each chunk is converted at once instead of literal by literal
+
+        :param chunks:
+        :param first_id: id of the first clause, the others are numbered consecutively
+        :return:
+        """
+
+        arrays = [np.asarray(chunk, dtype=np.int32) for chunk in chunks]
+        flat = np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int32)
+
+        terminators = np.nonzero(flat == 0)[0]
+        dimacs_literals = flat[flat != 0]
+
+        # every terminator closes a clause at the number of literals before it
+        offsets = np.zeros(len(terminators) + 1, dtype=np.int32)
+        offsets[1:] = terminators - np.arange(len(terminators))
+
+        # unique returns the variables sorted, so the dense indices follow the dimacs order
+        variables, index = np.unique(np.abs(dimacs_literals), return_inverse=True)
+        literals = 2 * index.astype(np.int32) + (dimacs_literals < 0)
+
+        return cls(variables, literals, offsets, np.arange(first_id, first_id + len(terminators), dtype=np.int32))
+
+    @classmethod
+    def from_clauses(cls, clauses: Dict[int, Clause], current_set_literals: Optional[Dict[int, bool]] = None) -> "ClauseStore":
+        """
+        Builds a store from the clauses of a knowledge base, keeping their ids and the current assignment
+
+        :param clauses:
+        :param current_set_literals:
+        :return:
+        """
+
+        if current_set_literals is None:
+            current_set_literals = {}
+
+        store = cls.build((clause.literals for clause in clauses.values()), variables=current_set_literals.keys())
+        store.ids = np.fromiter(clauses.keys(), dtype=np.int32, count=len(clauses))
+
+        for variable, truth_value in current_set_literals.items():
+            store.assignments[store.index[variable]] = TRUE if truth_value else FALSE
+
+        return store
+
+    def sorted_variables(self) -> "ClauseStore":
+        """
+        Renumbers the dense indices so they follow the order of the dimacs variables
+
+        :return:
+        """
+
+        order = np.argsort(self.variables, kind='stable')
+        if np.all(order == np.arange(len(order))):
+            return self
+
+        new_index = np.empty(len(order), dtype=np.int32)
+        new_index[order] = np.arange(len(order), dtype=np.int32)
+        literals = 2 * new_index[self.literals >> 1] + (self.literals & 1)
+
+        return ClauseStore(self.variables[order], literals, self.offsets, self.ids, self.assignments[order])
+
+    def build_occurrences(self):
+        """
+        Builds the occurrence lists (clause indices per encoded literal) in CSR layout
+
+        :return:
+        """
+
+        clause_of_literal = np.repeat(np.arange(len(self), dtype=np.int32), self.lengths())
+        order = np.argsort(self.literals, kind='stable')
+        self.occurrences = clause_of_literal[order]
+
+        counts = np.bincount(self.literals, minlength=2 * self.number_of_variables)
+        self.occurrence_offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+        np.cumsum(counts, out=self.occurrence_offsets[1:])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def number_of_variables(self) -> int:
+        return len(self.variables)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array_.nbytes for array_ in [self.variables, self.literals, self.offsets, self.ids, self.assignments, self.occurrences, self.occurrence_offsets])
+
+    def encode(self, literal: int) -> int:
+        """ dimacs literal -> encoded literal """
+        return 2 * self.index[abs(literal)] + (literal < 0)
+
+    def decode(self, encoded: int) -> int:
+        """ encoded literal -> dimacs literal """
+        variable = int(self.variables[encoded >> 1])
+        return -variable if encoded & 1 else variable
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def clause(self, position: int) -> np.ndarray:
+        """ encoded literals of the clause at a position """
+        return self.literals[self.offsets[position]:self.offsets[position + 1]]
+
+    def clause_literals(self, position: int) -> List[int]:
+        """ dimacs literals of the clause at a position """
+        return [self.decode(encoded) for encoded in self.clause(position)]
+
+    def occurrence(self, literal: int) -> np.ndarray:
+        """ positions of the clauses that contain a dimacs literal """
+        encoded = self.encode(literal)
+        return self.occurrences[self.occurrence_offsets[encoded]:self.occurrence_offsets[encoded + 1]]
+
+    def to_clauses(self) -> Dict[int, Clause]:
+        """
+        Converts the store back into clause objects keyed by their ids
+
+        :return:
+        """
+
+        decoded = np.where(self.literals & 1, -self.variables[self.literals >> 1], self.variables[self.literals >> 1]).tolist()
+        offsets = self.offsets.tolist()
+
+        return {id: Clause(id, decoded[offsets[i]:offsets[i + 1]]) for i, id in enumerate(self.ids.tolist())}
+
+    def current_set_literals(self) -> Dict[int, bool]:
+        """
+        The assignment as used by the knowledge base
+
+        :return:
+        """
+
+        assigned = np.nonzero(self.assignments != UNASSIGNED)[0]
+        return {int(self.variables[i]): bool(self.assignments[i] == TRUE) for i in assigned}
+
+    def literal_values(self) -> np.ndarray:
+        """
+        Value (UNASSIGNED, FALSE or TRUE) of every literal in the literal buffer
+
+        :return:
+        """
+
+        values = self.assignments[self.literals >> 1]
+        return np.where(values == UNASSIGNED, UNASSIGNED, values ^ (self.literals & 1).astype(np.int8))
+
+    def satisfied(self) -> np.ndarray:
+        """
+        Boolean mask of the clauses that have a true literal
+
+        :return:
+        """
+
+        true_literals = np.concatenate([[0], np.cumsum(self.literal_values() == TRUE)])
+        return true_literals[self.offsets[1:]] > true_literals[self.offsets[:-1]]
+
+    def unassigned_lengths(self) -> np.ndarray:
+        """
+        Number of unassigned literals in every clause
+
+        :return:
+        """
+
+        unassigned = np.concatenate([[0], np.cumsum(self.literal_values() == UNASSIGNED)])
+        return unassigned[self.offsets[1:]] - unassigned[self.offsets[:-1]]
+
+    def copy(self) -> "ClauseStore":
+        """
+        Copies the store, the clause buffers are never written to so only the assignment is duplicated
+
+        :return:
+        """
+
+        return ClauseStore(self.variables, self.literals, self.offsets, self.ids, self.assignments.copy(), self.occurrences, self.occurrence_offsets)
+
+    def digest(self) -> str:
+        """
+        Hash of the formula (not the assignment)
+
+        :return:
+        """
+
+        sha = hashlib.sha1()
+        for array_ in [self.variables, self.literals, self.offsets]:
+            sha.update(array_.tobytes())
+        return sha.hexdigest()
+
+    def __str__(self):
+        return str({"variables": len(self.variables), "clauses": len(self), "literals": len(self.literals), "bytes": self.nbytes})
+
+    def __repr__(self):
+        return self.__str__()
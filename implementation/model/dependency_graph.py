@@ -44,15 +44,31 @@ class DependencyGraph:
 
         :param literal:
         :param split:
-        :return:
+        :return: the dependencies that were new for literal
         """
 
+        added = set()
         if (not split):
 
-            self.graph[literal].update([lit for lit in self.initial_coocurrence[literal] if abs(lit) in self.existing_literals])
+            added = {lit for lit in self.initial_coocurrence[literal] if abs(lit) in self.existing_literals} - self.graph[literal]
+            self.graph[literal].update(added)
 
         self.existing_literals.append(literal)
 
+        return added
+
+    def remove_literal(self, literal, added):
+        """
+        Undoes the last add_literal call for literal (used when backtracking on a trail)
+
+        :param literal:
+        :param added: the dependencies that were added by add_literal
+        :return:
+        """
+
+        self.existing_literals.pop()
+        self.graph[literal].difference_update(added)
+
     def find_conflict_clause(self, literal, id):
         """
         Finds the conflict clause given the literal that generated the conflict
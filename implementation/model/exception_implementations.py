@@ -3,7 +3,10 @@ class RunningTimeException(Exception):
     """
     Exception that is used to cancel some run on purpose without crashing
     """
-    pass
+
+    def __init__(self, message, budget = None):
+        super(RunningTimeException, self).__init__(message)
+        self.budget = budget
 
 
 
@@ -22,3 +25,17 @@ class RestartException(Exception):
         self.stats = stats
         self.runtime = elapsed_runtime
 
+
+
+
+class DimacsFormatException(Exception):
+
+    """
+    Exception for input that is not valid DIMACS cnf
+    """
+
+    def __init__(self, message, line = None):
+        if (line is not None):
+            message = f"{message} (line {line})"
+        super(DimacsFormatException, self).__init__(message)
+        self.line = line
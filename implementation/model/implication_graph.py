@@ -0,0 +1,224 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from implementation.model.clause import Clause
+
+
+class BinaryImplicationGraph:
+    """
+    Implication graph of the binary clauses of a formula
+
+    a binary clause (a or b) gives the edges -a -> b and -b -> a, so a literal implies every literal that can be
+    reached from it and the graph is its own contrapositive: x reaches y exactly when -y reaches -x.
+
+    on this graph
+    - probing a literal follows its implications, it fails when it reaches its own negation or a literal that is false
+    - the strongly connected components are sets of equivalent literals, a variable that is equivalent to its
+      own negation makes the formula unsatisfiable
+
+    binary clauses can be added at any time (for instance when they are learned), the literals whose implications
+    changed since the last probing round are kept as dirty.
+
+    """
+
+    edges: Dict[int, Set[int]]
+    dirty: Set[int]
+
+    def __init__(self):
+
+        # implied literals per literal
+        self.edges = defaultdict(set)
+
+        # number of binary clauses
+        self.binaries = 0
+
+        # literals with new implications since the last call of failed_literals
+        self.dirty = set()
+
+        # literals visited while probing
+        self.steps = 0
+
+    @classmethod
+    def from_clauses(cls, clauses: Iterable[Clause]) -> "BinaryImplicationGraph":
+        """
+        Builds the graph from the binary clauses among the given clauses
+
+        :param clauses:
+        :return:
+        """
+
+        graph = cls()
+        for clause in clauses:
+            if len(clause) == 2:
+                graph.add_binary(*clause.literals)
+
+        return graph
+
+    def add_binary(self, first: int, second: int):
+        """
+        Adds the clause (first or second)
+
+        :param first:
+        :param second:
+        :return:
+        """
+
+        if first == -second or second in self.edges[-first]:
+            return
+
+        self.edges[-first].add(second)
+        self.edges[-second].add(first)
+        self.dirty.add(-first)
+        self.dirty.add(-second)
+        self.binaries += 1
+
+    def __len__(self):
+        return self.binaries
+
+    def implied(self, literal: int) -> Set[int]:
+        """
+        All literals implied by a literal (itself included)
+
+        :param literal:
+        :return:
+        """
+
+        edges = self.edges
+        reached = {literal}
+        stack = [literal]
+        while stack:
+            for other in edges.get(stack.pop(), ()):
+                if other not in reached:
+                    reached.add(other)
+                    stack.append(other)
+
+        self.steps += len(reached)
+        return reached
+
+    def probe(self, literal: int, assignment: Optional[Dict[int, bool]] = None) -> bool:
+        """
+        Follows the implications of a literal and stops at the first contradiction
+
+        :param literal:
+        :param assignment: truth value per variable, implied literals that are false in it are contradictions too
+        :return: whether the literal fails: making it true contradicts itself or the assignment
+        """
+
+        if assignment is None:
+            assignment = {}
+
+        edges = self.edges
+        reached = {literal}
+        stack = [literal]
+        while stack:
+            for other in edges.get(stack.pop(), ()):
+                if other in reached:
+                    continue
+                if -other in reached or assignment.get(abs(other), other > 0) != (other > 0):
+                    self.steps += len(reached)
+                    return True
+                reached.add(other)
+                stack.append(other)
+
+        self.steps += len(reached)
+        return False
+
+    def failed_literals(self, candidates: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        Probes literals and returns the ones that fail, their negations hold in every model
+
+        :param candidates: literals to probe, by default every literal that implies a literal whose implications changed
+        :return:
+        """
+
+        if candidates is None:
+            candidates = self.ancestors(self.dirty)
+        self.dirty = set()
+
+        return [literal for literal in candidates if self.probe(literal)]
+
+    def ancestors(self, literals: Iterable[int]) -> Set[int]:
+        """
+        Literals that imply one of the given literals (themselves included),
+        these are the contrapositives of the literals implied by their negations
+
+        :param literals:
+        :return:
+        """
+
+        reached = set()
+        for literal in literals:
+            if -literal not in reached:
+                reached |= self.implied(-literal)
+
+        return {-literal for literal in reached}
+
+    def equivalences(self) -> Optional[Dict[int, int]]:
+        """
+        Equivalent literals from the strongly connected components (Tarjan, without recursion)
+
+        :return: representative literal for every variable in a component of more than one literal,
+                 the representative is the literal with the lowest variable of the component.
+                 None when a variable is equivalent to its own negation.
+        """
+
+        edges = self.edges
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        counter = 0
+        representatives = {}
+
+        for root in list(edges):
+            if root in index:
+                continue
+
+            work = [(root, iter(edges.get(root, ())))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+
+            while work:
+                node, children = work[-1]
+                pushed = False
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(edges.get(child, ()))))
+                        pushed = True
+                        break
+                    elif child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                if pushed:
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+
+                    if len(component) > 1:
+                        members = set(component)
+                        if any(-member in members for member in members):
+                            return None
+                        representative = min(component, key=abs)
+                        for member in component:
+                            if member != representative:
+                                representatives[abs(member)] = representative if member > 0 else -representative
+
+        self.steps += counter
+        return representatives
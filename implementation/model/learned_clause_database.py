@@ -0,0 +1,132 @@
+from typing import Dict, Iterable, List, Optional
+
+from implementation.model.clause import Clause
+
+
+class LearnedClauseDatabase:
+    """
+    Shared database of the clauses learned during a search
+
+    the database holds the learned clause objects themselves, the knowledge base watches the very same objects,
+    so a learned clause is stored once and never copied.
+
+    every clause is scored by its literal block distance (number of decision levels among its literals when it was
+    learned, lower is better) and an activity that is bumped whenever the clause takes part in a conflict analysis.
+    When more clauses than the budget are kept, the worse half is thrown out and the budget grows a little,
+    clauses with a literal block distance of at most 'keep_lbd' (glue clauses) are never thrown out.
+
+    """
+
+    clauses: Dict[int, Clause]
+    lbds: Dict[int, int]
+    activity: Dict[int, float]
+    budget: Optional[int]
+
+    def __init__(self, budget: Optional[int] = None, budget_increment: int = 300, keep_lbd: int = 2, decay: float = 0.999):
+
+        # learned clauses by id
+        self.clauses = {}
+
+        # literal block distance and activity per clause id
+        self.lbds = {}
+        self.activity = {}
+
+        # maximum number of clauses before a reduction, None to keep everything
+        self.budget = budget
+        self.budget_increment = budget_increment
+        self.keep_lbd = keep_lbd
+
+        # amount added on a bump, grows every conflict to decay older bumps
+        self.increment = 1.0
+        self.decay = decay
+
+        # number of reductions and clauses thrown out so far
+        self.reductions = 0
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.clauses)
+
+    def __contains__(self, id):
+        return id in self.clauses
+
+    def __iter__(self):
+        return iter(self.clauses.values())
+
+    def add(self, clause: Clause, lbd: int):
+        """
+        Stores a learned clause (by reference) with its literal block distance
+
+        :param clause:
+        :param lbd:
+        :return:
+        """
+
+        self.clauses[clause.id] = clause
+        self.lbds[clause.id] = lbd
+        self.activity[clause.id] = 0.0
+
+    def bump(self, ids: Iterable[int]):
+        """
+        Raises the activity of the learned clauses among the given clause ids
+
+        :param ids:
+        :return:
+        """
+
+        activity = self.activity
+        for id in ids:
+            if id in activity:
+                activity[id] += self.increment
+
+        # keep the numbers in range
+        if self.increment > 1e20:
+            for id in activity:
+                activity[id] *= 1e-20
+            self.increment *= 1e-20
+
+    def decay_activities(self):
+        """ decays all activities by growing the increment instead of shrinking every activity """
+        self.increment /= self.decay
+
+    def update_lbd(self, id: int, lbd: int):
+        """
+        Clauses only get better: keeps the lowest literal block distance seen for a clause
+
+        :param id:
+        :param lbd:
+        :return:
+        """
+
+        if id in self.lbds and lbd < self.lbds[id]:
+            self.lbds[id] = lbd
+
+    def should_reduce(self) -> bool:
+        return self.budget is not None and len(self.clauses) > self.budget
+
+    def reduce(self, locked) -> List[Clause]:
+        """
+        Throws out the worse half of the clauses that are not glue clauses and not locked,
+        worst first: highest literal block distance, then lowest activity
+
+        :param locked: function telling whether a clause id is in use (for instance as the reason of an assignment)
+        :return: the clauses that were thrown out, these still have to be detached from the knowledge base
+        """
+
+        lbds = self.lbds
+        activity = self.activity
+
+        candidates = [id for id in self.clauses if lbds[id] > self.keep_lbd and not locked(id)]
+        candidates.sort(key=lambda id: (-lbds[id], activity[id]))
+
+        removed = []
+        for id in candidates[:len(self.clauses) // 2]:
+            removed.append(self.clauses.pop(id))
+            del lbds[id]
+            del activity[id]
+
+        self.reductions += 1
+        self.removed += len(removed)
+        self.budget += self.budget_increment
+
+        return removed
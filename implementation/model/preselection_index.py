@@ -0,0 +1,81 @@
+import heapq
+from typing import Dict, Iterator, Iterable
+
+from implementation.model.variable_heap import VariableHeap
+
+#### Constants
+# weight of an occurrence of a literal per clause length, longer clauses do not count (propz)
+SHORT_CLAUSE_WEIGHTS = {2: 5, 3: 1}
+
+
+class PreselectionIndex(VariableHeap):
+    """
+    Variables ranked for the look ahead preselection
+
+    the knowledge base keeps the weighted number of binary and ternary clauses every literal occurs in, a variable
+    scores p * n + p + n for the weights p and n of its positive and negative literal, so variables that occur in
+    many short clauses in both polarities come first.
+
+    the ranking is a max-heap on the score that is repaired for the variables whose weights changed only, and
+    the best variables are read from the heap in order without popping them, so a preselection of k variables
+    costs O(k log k) instead of sorting all variables.
+
+    """
+
+    weights: Dict[int, int]
+
+    def __init__(self, weights: Dict[int, int]):
+        """
+        :param weights: weighted occurrences per literal, shared with the knowledge base
+        """
+
+        self.weights = weights
+        super().__init__([], {variable: self.score(variable) for variable in {abs(literal) for literal in weights}})
+
+    def score(self, variable: int) -> int:
+        positive = self.weights.get(variable, 0)
+        negative = self.weights.get(-variable, 0)
+        return positive * negative + positive + negative
+
+    def refresh(self, variables: Iterable[int]):
+        """
+        Updates the score of variables whose weights changed
+
+        :param variables:
+        :return:
+        """
+
+        for variable in variables:
+            score = self.score(variable)
+            previous = self.activity.get(variable, None)
+            if score == previous:
+                continue
+
+            self.activity[variable] = score
+            if variable not in self.positions:
+                self.insert(variable)
+            elif previous is None or score > previous:
+                self.sift_up(self.positions[variable])
+            else:
+                self.sift_down(self.positions[variable])
+
+    def ranked(self) -> Iterator[int]:
+        """
+        Yields the variables from the highest score down, without changing the heap
+
+        :return:
+        """
+
+        heap = self.heap
+        activity = self.activity
+        if not heap:
+            return
+
+        frontier = [(-activity[heap[0]], 0)]
+        while frontier:
+            _, position = heapq.heappop(frontier)
+            yield heap[position]
+
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (-activity[heap[child]], child))
@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, List
+
+
+class VariableHeap:
+    """
+    Binary max-heap of variables ordered by activity
+
+    keeps the position of every variable in the heap, so that the activity of a variable can be raised
+    and a variable can be (re)inserted in O(log n) without searching for it.
+
+    """
+
+    activity: Dict[int, float]
+    heap: List[int]
+    positions: Dict[int, int]
+
+    def __init__(self, variables: Iterable[int], activity: Dict[int, float] = None):
+
+        # activity per variable, also for variables that are not in the heap at the moment
+        if activity is None:
+            self.activity = {variable: 0.0 for variable in variables}
+        else:
+            self.activity = activity
+
+        self.heap = []
+        self.positions = {}
+        for variable in self.activity:
+            self.insert(variable)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, variable):
+        return variable in self.positions
+
+    def insert(self, variable: int):
+        """
+        Adds a variable to the heap, if it is not in there already
+
+        :param variable:
+        :return:
+        """
+
+        if variable in self.positions:
+            return
+
+        self.activity.setdefault(variable, 0.0)
+        self.positions[variable] = len(self.heap)
+        self.heap.append(variable)
+        self.sift_up(len(self.heap) - 1)
+
+    def pop(self) -> int:
+        """
+        Removes and returns the variable with the highest activity
+
+        :return:
+        """
+
+        top = self.heap[0]
+        last = self.heap.pop()
+        del self.positions[top]
+
+        if self.heap:
+            self.heap[0] = last
+            self.positions[last] = 0
+            self.sift_down(0)
+
+        return top
+
+    def increase(self, variable: int, amount: float):
+        """
+        Raises the activity of a variable and restores the heap order
+
+        :param variable:
+        :param amount:
+        :return:
+        """
+
+        self.activity[variable] = self.activity.get(variable, 0.0) + amount
+        if variable in self.positions:
+            self.sift_up(self.positions[variable])
+
+    def rescale(self, factor: float):
+        """
+        Multiplies all activities with the same factor, the order stays the same
+
+        :param factor:
+        :return:
+        """
+
+        for variable in self.activity:
+            self.activity[variable] *= factor
+
+    def sift_up(self, position: int):
+        heap = self.heap
+        activity = self.activity
+        variable = heap[position]
+
+        while position > 0:
+            parent = (position - 1) >> 1
+            if activity[heap[parent]] >= activity[variable]:
+                break
+            heap[position] = heap[parent]
+            self.positions[heap[position]] = position
+            position = parent
+
+        heap[position] = variable
+        self.positions[variable] = position
+
+    def sift_down(self, position: int):
+        heap = self.heap
+        activity = self.activity
+        variable = heap[position]
+        size = len(heap)
+
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and activity[heap[child + 1]] > activity[heap[child]]:
+                child += 1
+            if activity[heap[child]] <= activity[variable]:
+                break
+            heap[position] = heap[child]
+            self.positions[heap[position]] = position
+            position = child
+
+        heap[position] = variable
+        self.positions[variable] = position
@@ -0,0 +1,86 @@
+import sys
+import timeit
+from typing import Optional, Tuple
+
+from implementation.model.exception_implementations import RunningTimeException
+
+try:
+    import resource
+except ImportError:
+    # not available on windows, the memory limit is not checked there
+    resource = None
+
+#### Constants
+# the clock and the memory are only read every this many checks, the counters on every check
+CHECK_INTERVAL = 16
+
+# ru_maxrss is in kilobytes, except on macOS where it is in bytes
+MAXRSS_PER_MEGABYTE = 1024 * 1024 if sys.platform == "darwin" else 1024
+
+
+class Budget:
+    """
+    Limits on the resources of one solve: wall time, decisions, conflicts, propagations and memory
+
+    the solver starts the budget when a solve begins and checks it once per iteration of its main loop with its
+    counters, a RunningTimeException tells it to stop with an unknown result. The counters are taken relative to
+    the start, so an incremental solver gets the whole budget on every call. Memory is the peak resident memory
+    of the process, which also counts what was in use before the solve started.
+
+    """
+
+    def __init__(self, seconds: Optional[float] = None, decisions: Optional[int] = None, conflicts: Optional[int] = None,
+                 propagations: Optional[int] = None, memory: Optional[float] = None):
+        """
+        :param seconds: wall time of a solve
+        :param decisions: splits of a solve
+        :param conflicts: conflicts of a solve
+        :param propagations: literals set during a solve
+        :param memory: peak resident memory of the process in megabytes
+        """
+
+        self.seconds = seconds
+        self.limits = (decisions, conflicts, propagations)
+        self.memory = memory if resource is not None else None
+
+        # counters at the start of the solve and at the last check
+        self.offsets = (0, 0, 0)
+        self.counters = (0, 0, 0)
+        self.start_time = None
+        self.checks = 0
+
+    def start(self, counters: Tuple[int, int, int]):
+        """
+        Starts the budget of a solve
+
+        :param counters: decisions, conflicts and propagations of the solver so far
+        :return:
+        """
+
+        self.offsets = counters
+        self.counters = counters
+        self.start_time = timeit.default_timer()
+        self.checks = 0
+
+    def check(self, counters: Tuple[int, int, int]):
+        """
+        Raises a RunningTimeException naming the resource when the budget is exhausted
+
+        :param counters: decisions, conflicts and propagations of the solver so far
+        :return:
+        """
+
+        self.counters = counters
+        for name, limit, counter, offset in zip(("decisions", "conflicts", "propagations"), self.limits, counters, self.offsets):
+            if (limit is not None and counter - offset > limit):
+                raise RunningTimeException(f"Budget of {limit} {name} exhausted", budget=name)
+
+        self.checks += 1
+        if (self.checks % CHECK_INTERVAL != 0):
+            return
+
+        if (self.seconds is not None and timeit.default_timer() - self.start_time > self.seconds):
+            raise RunningTimeException(f"Budget of {self.seconds}s exhausted", budget="time")
+
+        if (self.memory is not None and resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / MAXRSS_PER_MEGABYTE > self.memory):
+            raise RunningTimeException(f"Budget of {self.memory}MB exhausted", budget="memory")
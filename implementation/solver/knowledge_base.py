@@ -1,10 +1,19 @@
 from collections import defaultdict
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Optional, Set, Tuple
 
 from implementation.model.clause import Clause
+from implementation.model.clause_store import ClauseStore
 from implementation.model.dependency_graph import DependencyGraph
+from implementation.model.preselection_index import SHORT_CLAUSE_WEIGHTS
 from implementation.model.split import Split
 
+# kinds of entries on the trail (undo log)
+ASSIGNMENT = 0
+CLAUSE_REMOVAL = 1
+LITERAL_REMOVAL = 2
+CLAUSE_ADDITION = 3
+DEPENDENCY = 4
+
 class KnowledgeBase:
     """
     knowledge base class
@@ -16,6 +25,14 @@ class KnowledgeBase:
     - bookkeeping
     - current assignments
     - dependency graph
+    - polarity occurrence counters for pure literal detection
+    - unit clause candidates
+    - number of clauses per clause length
+    - weighted occurrences of literals in short clauses, for the look ahead preselection (optional)
+    - trail (optional)
+
+    In trail mode every change to the knowledge base is recorded on a trail together with the decision level it was made on,
+    so that backtracking undoes the changes in place instead of restoring a copy of an earlier state.
 
     """
 
@@ -23,9 +40,17 @@ class KnowledgeBase:
     clauses: Dict[int, Clause]
     current_set_literals: Dict[int, bool]
     dependency_graph : DependencyGraph
+    trail: List[Tuple]
+    trail_limits: List[int]
+    polarity_counts: Dict[int, int]
+    pure_candidates: Set[int]
+    unit_candidates: Set[int]
+    clause_lengths: Dict[int, int]
+    literal_weights: Optional[Dict[int, int]]
+    reweighted: Set[int]
 
 
-    def __init__(self, clauses = None, current_set_literals = None, bookkeeping = None, clause_counter = 0, literal_counter = -1, dependency_graph = None, timestep=0):
+    def __init__(self, clauses = None, current_set_literals = None, bookkeeping = None, clause_counter = 0, literal_counter = -1, dependency_graph = None, timestep=0, trail=False, polarity_counts = None, pure_candidates = None, unit_candidates = None, clause_lengths = None, literal_weights = None):
 
         # clauses
         if clauses is None:
@@ -64,6 +89,171 @@ class KnowledgeBase:
 
         self.timestep = timestep
 
+        # number of clauses each (signed) literal occurs in
+        if polarity_counts is None:
+            self.polarity_counts = defaultdict(int)
+            for clause in self.clauses.values():
+                for literal in clause.literals:
+                    self.polarity_counts[literal] += 1
+        else:
+            self.polarity_counts = polarity_counts
+
+        # variables that may have become pure, every unassigned pure variable is in here
+        if pure_candidates is None:
+            self.pure_candidates = set(self.bookkeeping.keys())
+        else:
+            self.pure_candidates = pure_candidates
+
+        # ids of clauses that may have become unit, every unit clause is in here
+        if unit_candidates is None:
+            self.unit_candidates = {clause.id for clause in self.clauses.values() if len(clause.literals) == 1}
+        else:
+            self.unit_candidates = unit_candidates
+
+        # number of clauses per clause length
+        if clause_lengths is None:
+            self.clause_lengths = defaultdict(int)
+            for clause in self.clauses.values():
+                self.clause_lengths[len(clause.literals)] += 1
+        else:
+            self.clause_lengths = clause_lengths
+
+        # variables whose weights changed since the preselection last looked at them
+        self.reweighted = set()
+
+        # weighted number of binary and ternary clauses per (signed) literal, None when they are not kept
+        self.literal_weights = literal_weights
+
+        # number of literals set so far, probes included
+        self.propagations = 0
+
+        # undo log, only filled in trail mode
+        self.trail_active = trail
+        self.trail = []
+
+        # trail length at the start of each decision level
+        self.trail_limits = []
+
+    @classmethod
+    def from_clause_store(cls, store: ClauseStore, **kwargs) -> "KnowledgeBase":
+        """
+        Builds a knowledge base from a flat clause store, assigned variables of the store are set on the new knowledge base
+
+        :param store:
+        :param kwargs: passed on to the constructor
+        :return:
+        """
+
+        knowledge_base = cls(store.to_clauses(), **kwargs)
+        for literal, truth_value in store.current_set_literals().items():
+            knowledge_base.set_literal(literal, truth_value)
+
+        return knowledge_base
+
+    def to_clause_store(self) -> ClauseStore:
+        """
+        Flat, array backed copy of the clauses and assignments of this knowledge base
+
+        :return:
+        """
+        return ClauseStore.from_clauses(self.clauses, self.current_set_literals)
+
+    @property
+    def decision_level(self) -> int:
+        return len(self.trail_limits)
+
+    def new_decision_level(self):
+        """
+        Opens a new decision level on the trail, changes after this call are undone by backtrack(level) for a lower level
+
+        :return:
+        """
+        self.trail_limits.append(len(self.trail))
+
+    def backtrack(self, level: int):
+        """
+        Undoes all changes made after decision level 'level' was reached
+
+        :param level:
+        :return:
+        """
+
+        if level >= self.decision_level:
+            return
+
+        limit = self.trail_limits[level]
+        while len(self.trail) > limit:
+            self.undo(self.trail.pop())
+
+        del self.trail_limits[level:]
+
+    def record(self, entry: Tuple):
+        """
+        Records a change on the trail, changes on decision level 0 are never undone so they are not stored
+
+        :param entry:
+        :return:
+        """
+        if self.trail_active and self.trail_limits:
+            self.trail.append(entry)
+
+    def undo(self, entry: Tuple):
+        """
+        Undoes a single entry of the trail
+
+        :param entry:
+        :return:
+        """
+
+        kind = entry[0]
+
+        if kind == ASSIGNMENT:
+            _, abs_literal, previous = entry
+            if previous is None:
+                del self.current_set_literals[abs_literal]
+            else:
+                self.current_set_literals[abs_literal] = previous
+            self.pure_candidates.add(abs_literal)
+
+        elif kind == CLAUSE_REMOVAL:
+            clause = entry[1]
+            self.clauses[clause.id] = clause
+            self.clause_lengths[len(clause.literals)] += 1
+            self.weigh(clause.literals, 1)
+            for literal in clause.literals:
+                self.bookkeeping[abs(literal)].add(clause.id)
+                self.add_occurrence(literal)
+            if len(clause.literals) == 1:
+                self.unit_candidates.add(clause.id)
+
+        elif kind == LITERAL_REMOVAL:
+            _, clause, literal = entry
+            if clause.id in self.clauses:
+                self.weigh(clause.literals, -1)
+                clause.literals.add(literal)
+                self.weigh(clause.literals, 1)
+                self.bookkeeping[abs(literal)].add(clause.id)
+                self.add_occurrence(literal)
+                self.resize(len(clause.literals) - 1, len(clause.literals))
+            else:
+                clause.literals.add(literal)
+
+        elif kind == CLAUSE_ADDITION:
+            self.clause_counter -= 1
+            clause = self.clauses.pop(entry[1])
+            self.clause_lengths[len(clause.literals)] -= 1
+            self.weigh(clause.literals, -1)
+            for literal in clause.literals:
+                abs_literal = abs(literal)
+                self.remove_occurrence(literal)
+                self.bookkeeping[abs_literal].discard(clause.id)
+                if len(self.bookkeeping[abs_literal]) == 0:
+                    del self.bookkeeping[abs_literal]
+
+        elif kind == DEPENDENCY:
+            _, abs_literal, added = entry
+            self.dependency_graph.remove_literal(abs_literal, added)
+
 
     def validate(self) -> bool:
         """
@@ -93,9 +283,12 @@ class KnowledgeBase:
         simplifies knowledge base for unit clauses
         """
         literals_set = 0
-        for clause in list(self.clauses.values()):
 
-            if len(clause.literals) != 1:
+        # only the clauses that lost literals can have become unit
+        while self.unit_candidates:
+            clause = self.clauses.get(self.unit_candidates.pop(), None)
+
+            if clause is None or len(clause.literals) != 1:
                 continue
 
             literal = clause.first()
@@ -108,10 +301,7 @@ class KnowledgeBase:
             if not valid:
                 return valid, potential_problem
 
-        if (literals_set > 0):
-            return self.simplify_unit_clauses(set_literals, use_dependency_graph)
-
-        return True, literals_set
+        return True, 0
 
     def simplify_pure_literal(self, set_literals, use_dependency_graph) -> Tuple[bool, int]:
         """
@@ -119,20 +309,20 @@ class KnowledgeBase:
         """
 
         literals_set = 0
-        # Wrap in list call is necessary to not change dict while iterating
-        for literal in list(self.bookkeeping.keys()):
-            attempt = set()
+        polarity_counts = self.polarity_counts
 
-            for clause_id in self.bookkeeping[literal]:
-                if len(attempt) > 1:
-                    break
-                if literal in self.clauses[clause_id].literals:
-                    attempt.add(True)
-                elif (-literal) in self.clauses[clause_id].literals:
-                    attempt.add(False)
+        # only the variables of which an occurrence counter changed can have become pure
+        while self.pure_candidates:
+            literal = self.pure_candidates.pop()
 
-            if len(attempt) == 1:
-                value = attempt.pop()
+            if literal in self.current_set_literals:
+                continue
+
+            positive = polarity_counts.get(literal, 0) > 0
+            negative = polarity_counts.get(-literal, 0) > 0
+
+            if positive != negative:
+                value = positive
                 set_literals.append(literal)
                 valid, potential_problem = self.set_literal(literal, value, dependency_graph=use_dependency_graph)
                 if not valid:
@@ -163,16 +353,23 @@ class KnowledgeBase:
 
         abs_literal = abs(literal)
 
-        if abs_literal in self.current_set_literals:
-            if (self.current_set_literals[abs_literal] == truth_value):
-                return True, 0
+        previous = self.current_set_literals.get(abs_literal, None)
+        if previous == truth_value:
+            return True, 0
+        elif previous is not None:
+            # already set to the opposite value
+            return False, abs_literal
 
         if (dependency_graph):
-            self.dependency_graph.add_literal(abs_literal, split=split)
+            added = self.dependency_graph.add_literal(abs_literal, split=split)
+            self.record((DEPENDENCY, abs_literal, added))
 
         # Set literal
         self.current_set_literals[abs_literal] = truth_value
+        self.record((ASSIGNMENT, abs_literal, previous))
+        self.propagations += 1
 
+        literal_weights = self.literal_weights
         clauses_to_remove = []
         for clause_id in self.bookkeeping[abs_literal]:
             clause = self.clauses[clause_id]
@@ -188,10 +385,23 @@ class KnowledgeBase:
                     return False, abs_literal
 
                 # Remove empty and satisfied clauses
+                # (the variable itself is assigned now, so it is not a pure literal candidate)
+                if literal_weights is not None and len(clause.literals) <= 4:
+                    self.weigh(clause.literals, -1)
                 if -abs_literal in clause.literals:
                     clause.remove_literal(-abs_literal)
+                    self.polarity_counts[-abs_literal] -= 1
+                    self.resize(len(clause.literals) + 1, len(clause.literals))
+                    self.record((LITERAL_REMOVAL, clause, -abs_literal))
                 if abs_literal in clause.literals:
                     clause.remove_literal(abs_literal)
+                    self.polarity_counts[abs_literal] -= 1
+                    self.resize(len(clause.literals) + 1, len(clause.literals))
+                    self.record((LITERAL_REMOVAL, clause, abs_literal))
+                if literal_weights is not None and len(clause.literals) <= 3:
+                    self.weigh(clause.literals, 1)
+                if len(clause.literals) == 1:
+                    self.unit_candidates.add(clause_id)
 
         if (abs_literal in self.bookkeeping):
             del self.bookkeeping[abs_literal]
@@ -206,10 +416,23 @@ class KnowledgeBase:
         Remove list of clauses from KB
         :param clauses_to_remove:
         """
+        polarity_counts = self.polarity_counts
+        literal_weights = self.literal_weights
         for clause in clauses_to_remove:
+            weight = SHORT_CLAUSE_WEIGHTS.get(len(clause.literals), 0) if literal_weights is not None else 0
 
             for literal in clause.literals:
                 abs_literal = abs(literal)
+
+                # the other literals of the clause lose an occurrence, which might make them pure
+                polarity_counts[literal] -= 1
+                if polarity_counts[literal] == 0:
+                    self.pure_candidates.add(abs_literal)
+
+                if weight:
+                    literal_weights[literal] -= weight
+                    self.reweighted.add(abs_literal)
+
                 if abs_literal not in self.bookkeeping:
                     # This can happen if we remove a tautology forexample
                     continue
@@ -219,6 +442,71 @@ class KnowledgeBase:
                 if len(self.bookkeeping[abs_literal]) == 0:
                     del self.bookkeeping[abs_literal]
             del self.clauses[clause.id]
+            self.clause_lengths[len(clause.literals)] -= 1
+            self.record((CLAUSE_REMOVAL, clause))
+
+    def resize(self, old_length: int, new_length: int):
+        """ moves a clause from one length to another in the clause length counts """
+        self.clause_lengths[old_length] -= 1
+        self.clause_lengths[new_length] += 1
+
+    def track_weights(self):
+        """
+        Starts keeping the weighted occurrences of the literals in binary and ternary clauses
+
+        :return:
+        """
+
+        if self.literal_weights is not None:
+            return
+
+        literal_weights = self.literal_weights = defaultdict(int)
+        for clause in self.clauses.values():
+            weight = SHORT_CLAUSE_WEIGHTS.get(len(clause.literals), 0)
+            if weight:
+                for literal in clause.literals:
+                    literal_weights[literal] += weight
+        self.reweighted.update(self.bookkeeping)
+
+    def weigh(self, literals: Set[int], sign: int):
+        """
+        Adds (sign 1) or removes (sign -1) the weight of a clause with these literals to the weights of its literals,
+        only binary and ternary clauses have a weight
+
+        :param literals:
+        :param sign:
+        :return:
+        """
+        if self.literal_weights is None:
+            return
+
+        weight = SHORT_CLAUSE_WEIGHTS.get(len(literals), 0)
+        if weight:
+            for literal in literals:
+                self.literal_weights[literal] += sign * weight
+                self.reweighted.add(abs(literal))
+
+    def add_occurrence(self, literal: int):
+        """
+        Counts one more clause with this literal, a variable that had no clauses left may become pure
+
+        :param literal:
+        :return:
+        """
+        self.polarity_counts[literal] += 1
+        if self.polarity_counts[literal] == 1:
+            self.pure_candidates.add(abs(literal))
+
+    def remove_occurrence(self, literal: int):
+        """
+        Counts one clause less with this literal, when none are left its variable may have become pure
+
+        :param literal:
+        :return:
+        """
+        self.polarity_counts[literal] -= 1
+        if self.polarity_counts[literal] == 0:
+            self.pure_candidates.add(abs(literal))
 
     def __str__(self):
         return str({"bookkeeping" : self.bookkeeping, "current_set_literals" : self.current_set_literals, "clause_counter" : self.clause_counter, "clauses" : self.clauses})
@@ -252,9 +540,14 @@ class KnowledgeBase:
 
         first looks whether it is a valid addition
 
+        In trail mode the clause is copied, so that the given clause object keeps all its literals after backtracking
+
         :param clause:
         :return:
         """
+        if self.trail_active:
+            clause = Clause(clause.id, clause.literals)
+
         literals = clause.literals
         id = clause.id
 
@@ -284,9 +577,15 @@ class KnowledgeBase:
         # adding
         for literal in literals:
             self.bookkeeping[abs(literal)].add(id)
+            self.add_occurrence(literal)
+        if len(literals) == 1:
+            self.unit_candidates.add(id)
         self.clauses[id] = clause
+        self.clause_lengths[len(literals)] += 1
+        self.weigh(literals, 1)
         self.clause_counter += 1
+        self.record((CLAUSE_ADDITION, id))
         return True
 
     def nr_of_binary_clauses(self):
-        return sum((1 for clause in self.clauses.values() if len(clause.literals) == 2))
+        return self.clause_lengths[2]
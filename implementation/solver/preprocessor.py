@@ -0,0 +1,374 @@
+import timeit
+from collections import defaultdict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from implementation.model.clause import Clause
+from implementation.model.implication_graph import BinaryImplicationGraph
+
+
+class Preprocessor:
+    """
+    Simplifies a formula before it is handed to a knowledge base
+
+    - subsumption: a clause that contains all literals of another clause is removed
+    - self-subsuming strengthening: when a clause C contains all literals of a clause D except for one literal that
+      occurs negated in C, that literal is removed from C (the resolvent of C and D subsumes C)
+    - failed literal probing and equivalent literal substitution on the binary implication graph: the negation of
+      a literal that implies a contradiction over the binary clauses is added as a unit, and every variable that is
+      equivalent to another literal is replaced by that literal
+    - bounded variable elimination: a variable is eliminated by replacing all clauses it occurs in by all their
+      non-tautological resolvents on it, as long as that does not give more clauses
+
+    every clause that is added or strengthened is checked against the others again (backward subsumption),
+    resolvents are only added when no clause subsumes them (forward subsumption). Unit clauses subsume the clauses
+    they satisfy and strengthen the clauses they falsify, so the givens of a sudoku disappear together with the
+    variables they fix.
+
+    eliminated and substituted variables are not in the simplified formula, reconstruct gives them a value in the model afterwards.
+    The effort is counted in literals visited and can be capped, the preprocessor stops where it is when the cap
+    is reached, which always leaves a formula that is satisfiable exactly when the original one is.
+
+    """
+
+    clauses: Dict[int, Clause]
+    occurrences: Dict[int, Set[int]]
+    eliminated: List[Tuple[int, List[Set[int]]]]
+
+    def __init__(self, clauses: Dict[int, Clause], clause_counter: int, effort: Optional[int] = None, frozen: Iterable[int] = (), max_occurrences: int = 10, max_resolvent_length: int = 16):
+        """
+        :param clauses: the formula, the clause objects are not changed
+        :param clause_counter: last clause id in use, resolvents are numbered after it
+        :param effort: maximum number of literals visited, None for no limit
+        :param frozen: variables that may not be eliminated, for instance because they are used as assumptions
+        :param max_occurrences: variables that occur more often than this in both polarities are not eliminated
+        :param max_resolvent_length: variables with a longer resolvent are not eliminated
+        """
+
+        self.clauses = {id: Clause(id, clause.literals) for id, clause in clauses.items()}
+        self.clause_counter = clause_counter
+        self.effort = effort
+        self.frozen = set(frozen)
+        self.max_occurrences = max_occurrences
+        self.max_resolvent_length = max_resolvent_length
+
+        # clause ids per literal
+        self.occurrences = defaultdict(set)
+
+        # eliminated variables with the clauses they occurred in, in order of elimination
+        self.eliminated = []
+
+        # size of the original formula
+        self.variables = {abs(literal) for clause in clauses.values() for literal in clause.literals}
+        self.original_clauses = len(clauses)
+
+        # literals visited so far
+        self.steps = 0
+
+        # set when the empty clause is derived
+        self.unsatisfiable = False
+
+        self.statistics = defaultdict(int)
+
+    def preprocess(self) -> Tuple[Dict[int, Clause], int]:
+        """
+        Runs subsumption, strengthening and variable elimination until nothing changes or the effort is spent
+
+        :return: the simplified clauses and the last clause id in use
+        """
+
+        start = timeit.default_timer()
+
+        # tautologies are satisfied anyway
+        for id, clause in list(self.clauses.items()):
+            if any(-literal in clause.literals for literal in clause.literals):
+                del self.clauses[id]
+                self.statistics["tautologies"] += 1
+
+        for id, clause in self.clauses.items():
+            for literal in clause.literals:
+                self.occurrences[literal].add(id)
+
+        # shortest clauses first, they subsume the most
+        self.subsume(deque(sorted(self.clauses, key=lambda id: len(self.clauses[id]))))
+
+        self.probe()
+
+        eliminated = -1
+        while (eliminated != len(self.eliminated) and not self.exhausted()):
+            eliminated = len(self.eliminated)
+            self.eliminate_variables()
+
+        self.statistics["time"] = timeit.default_timer() - start
+        self.report()
+
+        return self.clauses, self.clause_counter
+
+    def exhausted(self) -> bool:
+        return self.unsatisfiable or (self.effort is not None and self.steps > self.effort)
+
+    def subsume(self, queue: deque):
+        """
+        Uses every clause in the queue to remove the clauses it subsumes and strengthen the clauses it
+        subsumes but for one negated literal, strengthened clauses are queued again
+
+        :param queue: clause ids
+        :return:
+        """
+
+        clauses = self.clauses
+        occurrences = self.occurrences
+
+        while (len(queue) > 0 and not self.exhausted()):
+            id = queue.popleft()
+            if id not in clauses:
+                continue
+
+            literals = clauses[id].literals
+            if len(literals) == 0:
+                self.unsatisfiable = True
+                return
+
+            if len(literals) == 1:
+                self.propagate_unit(id, next(iter(literals)), queue)
+                continue
+
+            # the clauses that contain all of its literals, found by intersecting their occurrences
+            ordered = sorted(literals, key=lambda literal: len(occurrences[literal]))
+            self.steps += sum(len(occurrences[literal]) + len(occurrences[-literal]) for literal in literals)
+
+            for other in set.intersection(*(occurrences[literal] for literal in ordered)):
+                if other != id:
+                    self.remove_clause(other)
+                    self.statistics["subsumed"] += 1
+
+            # the clauses that contain all of its literals but one, which they contain negated
+            for negated in ordered:
+                others = occurrences[-negated].intersection(*(occurrences[literal] for literal in ordered if literal != negated))
+                for other in others:
+                    self.strengthen(other, -negated, queue)
+
+    def strengthen(self, id: int, literal: int, queue: deque):
+        """ removes a literal from a clause and queues the clause to be checked again """
+        self.clauses[id].literals.remove(literal)
+        self.occurrences[literal].discard(id)
+        self.statistics["strengthened"] += 1
+        queue.append(id)
+
+    def propagate_unit(self, id: int, literal: int, queue: deque):
+        """
+        Subsumption and strengthening by a unit clause: every other clause with the literal is removed
+        and its negation is removed from every clause
+
+        :param id:
+        :param literal:
+        :param queue:
+        :return:
+        """
+
+        occurrences = self.occurrences
+        self.steps += len(occurrences[literal]) + len(occurrences[-literal])
+
+        for other in list(occurrences[literal]):
+            if other != id:
+                self.remove_clause(other)
+                self.statistics["subsumed"] += 1
+
+        for other in list(occurrences[-literal]):
+            self.strengthen(other, -literal, queue)
+
+    def probe(self):
+        """
+        Adds the root level facts found by failed literal probing on the binary implication graph,
+        then substitutes the equivalent literals found on the graph of the simplified clauses
+
+        :return:
+        """
+
+        if self.exhausted():
+            return
+
+        graph = BinaryImplicationGraph.from_clauses(self.clauses.values())
+        queue = deque()
+        for literal in graph.failed_literals():
+            self.clause_counter += 1
+            self.add_clause(Clause(self.clause_counter, [-literal]))
+            self.statistics["failed literals"] += 1
+            queue.append(self.clause_counter)
+
+        self.steps += graph.steps
+        self.subsume(queue)
+        if self.exhausted():
+            return
+
+        graph = BinaryImplicationGraph.from_clauses(self.clauses.values())
+        equivalences = graph.equivalences()
+        self.steps += graph.steps
+        if equivalences is None:
+            self.unsatisfiable = True
+            return
+
+        queue = deque()
+        for variable, representative in equivalences.items():
+            if variable not in self.frozen:
+                self.substitute(variable, representative, queue)
+
+        self.subsume(queue)
+
+    def substitute(self, variable: int, representative: int, queue: deque):
+        """
+        Replaces a variable by an equivalent literal in all clauses, clauses that become tautologies are removed
+
+        :param variable:
+        :param representative: literal that is equivalent to the variable
+        :param queue: the changed clauses are added to it
+        :return:
+        """
+
+        occurrences = self.occurrences
+
+        # the equivalence, for the reconstruction of the model
+        self.eliminated.append((variable, [{variable, -representative}, {-variable, representative}]))
+
+        for literal, replacement in [(variable, representative), (-variable, -representative)]:
+            for id in list(occurrences[literal]):
+                self.steps += 1
+                literals = self.clauses[id].literals
+                if -replacement in literals:
+                    self.remove_clause(id)
+                    continue
+
+                literals.remove(literal)
+                occurrences[literal].discard(id)
+                literals.add(replacement)
+                occurrences[replacement].add(id)
+                queue.append(id)
+
+        self.statistics["substituted"] += 1
+
+    def eliminate_variables(self):
+        """
+        One pass of bounded variable elimination over the variables that are left, cheapest first
+
+        :return:
+        """
+
+        occurrences = self.occurrences
+        candidates = [variable for variable in self.variables if variable not in self.frozen and (occurrences[variable] or occurrences[-variable])]
+        candidates.sort(key=lambda variable: len(occurrences[variable]) * len(occurrences[-variable]))
+
+        for variable in candidates:
+            if self.exhausted():
+                return
+
+            resolvents = self.resolve(variable)
+            if resolvents is None:
+                continue
+
+            clauses = [self.clauses[id].literals for id in occurrences[variable] | occurrences[-variable]]
+            self.eliminated.append((variable, clauses))
+            for id in list(occurrences[variable] | occurrences[-variable]):
+                self.remove_clause(id)
+
+            queue = deque()
+            for resolvent in resolvents:
+                if not self.is_subsumed(resolvent):
+                    self.clause_counter += 1
+                    self.add_clause(Clause(self.clause_counter, resolvent))
+                    queue.append(self.clause_counter)
+
+            self.statistics["eliminated"] += 1
+            self.subsume(queue)
+
+    def resolve(self, variable: int) -> Optional[List[Set[int]]]:
+        """
+        Non-tautological resolvents of all clauses with the variable against all clauses with its negation
+
+        :param variable:
+        :return: the resolvents, None if eliminating the variable would add clauses or too long ones
+        """
+
+        positive = self.occurrences[variable]
+        negative = self.occurrences[-variable]
+
+        if len(positive) > self.max_occurrences and len(negative) > self.max_occurrences:
+            return None
+
+        limit = len(positive) + len(negative)
+        resolvents = []
+
+        for positive_id in positive:
+            positive_literals = self.clauses[positive_id].literals
+            for negative_id in negative:
+                negative_literals = self.clauses[negative_id].literals
+                self.steps += len(positive_literals) + len(negative_literals)
+
+                if any(-literal in negative_literals for literal in positive_literals if literal != variable):
+                    continue
+
+                resolvent = (positive_literals | negative_literals) - {variable, -variable}
+                if len(resolvent) > self.max_resolvent_length:
+                    return None
+
+                resolvents.append(resolvent)
+                if len(resolvents) > limit:
+                    return None
+
+        return resolvents
+
+    def is_subsumed(self, literals: Set[int]) -> bool:
+        """
+        Whether a clause in the formula subsumes the given literals
+
+        :param literals:
+        :return:
+        """
+
+        clauses = self.clauses
+        for literal in literals:
+            for id in self.occurrences[literal]:
+                self.steps += 1
+                if len(clauses[id]) <= len(literals) and clauses[id].literals <= literals:
+                    return True
+
+        return False
+
+    def add_clause(self, clause: Clause):
+        self.clauses[clause.id] = clause
+        for literal in clause.literals:
+            self.occurrences[literal].add(clause.id)
+
+    def remove_clause(self, id: int):
+        for literal in self.clauses.pop(id).literals:
+            self.occurrences[literal].discard(id)
+
+    def reconstruct(self, assignment: Dict[int, bool]):
+        """
+        Extends a model of the simplified formula to a model of the original formula, in place.
+        Variables that are gone from the simplified formula are set to False, then the eliminated variables
+        are set in reverse order of elimination: True exactly when a clause with the variable is not satisfied otherwise.
+
+        :param assignment: truth value per variable
+        :return:
+        """
+
+        for variable in self.variables:
+            if variable not in assignment:
+                assignment[variable] = False
+
+        for variable, clauses in reversed(self.eliminated):
+            assignment[variable] = any(variable in literals and not any(literal != variable and assignment[abs(literal)] == (literal > 0) for literal in literals)
+                                       for literals in clauses)
+
+    def report(self):
+        """
+        Prints the reductions and the time spent
+
+        :return:
+        """
+
+        variables = len({abs(literal) for literal, ids in self.occurrences.items() if ids})
+
+        print(f"Preprocessing: {self.original_clauses} -> {len(self.clauses)} clauses, {len(self.variables)} -> {variables} variables, "
+              f"{self.statistics['subsumed']} subsumed, {self.statistics['strengthened']} strengthened, {self.statistics['eliminated']} eliminated, "
+              f"{self.statistics['failed literals']} failed literals, {self.statistics['substituted']} substituted, "
+              f"{self.steps} steps{' (effort spent)' if self.exhausted() and not self.unsatisfiable else ''} in {self.statistics['time']:.3f}s")
@@ -0,0 +1,125 @@
+from collections import deque
+
+
+class RestartPolicy:
+    """
+    Parent class for restart policies, tells the solver after each conflict whether to restart
+
+    """
+
+    def __init__(self):
+
+        # conflicts since the last restart
+        self.conflicts = 0
+
+    def on_conflict(self, lbd: int) -> bool:
+        """
+        Registers a conflict and the literal block distance of the clause learned from it
+
+        :param lbd:
+        :return: whether the solver should restart now
+        """
+        raise NotImplementedError("Method needs to be overrided by child-class")
+
+    def on_restart(self):
+        self.conflicts = 0
+
+
+class NoRestarts(RestartPolicy):
+    """
+    Never restarts
+    """
+
+    def on_conflict(self, lbd: int) -> bool:
+        self.conflicts += 1
+        return False
+
+
+class LubyRestarts(RestartPolicy):
+    """
+    Restarts after unit * luby(i) conflicts, where luby is the sequence 1 1 2 1 1 2 4 1 1 2 1 1 2 4 8 ...
+    """
+
+    def __init__(self, unit=100):
+        super().__init__()
+        self.unit = unit
+        self.index = 1
+
+    @staticmethod
+    def luby(i: int) -> int:
+        """
+        i-th element (starting at 1) of the luby sequence
+
+        :param i:
+        :return:
+        """
+
+        while True:
+            k = 1
+            while (1 << k) - 1 < i:
+                k += 1
+            if (1 << k) - 1 == i:
+                return 1 << (k - 1)
+            i -= (1 << (k - 1)) - 1
+
+    def on_conflict(self, lbd: int) -> bool:
+        self.conflicts += 1
+        return self.conflicts >= self.unit * self.luby(self.index)
+
+    def on_restart(self):
+        super().on_restart()
+        self.index += 1
+
+
+class GlucoseRestarts(RestartPolicy):
+    """
+    Restarts when the recent learned clauses are worse than average:
+    when the moving average of the literal block distance over the last 'window' conflicts,
+    times 'margin', exceeds the average over all conflicts
+    """
+
+    def __init__(self, window=50, margin=0.8):
+        super().__init__()
+        self.margin = margin
+        self.recent = deque(maxlen=window)
+        self.recent_sum = 0
+        self.total_sum = 0
+        self.total = 0
+
+    def on_conflict(self, lbd: int) -> bool:
+        self.conflicts += 1
+        self.total += 1
+        self.total_sum += lbd
+
+        if len(self.recent) == self.recent.maxlen:
+            self.recent_sum -= self.recent[0]
+        self.recent.append(lbd)
+        self.recent_sum += lbd
+
+        if len(self.recent) < self.recent.maxlen:
+            return False
+
+        return (self.recent_sum / len(self.recent)) * self.margin > self.total_sum / self.total
+
+    def on_restart(self):
+        super().on_restart()
+        self.recent.clear()
+        self.recent_sum = 0
+
+
+def get_restart_policy(name: str) -> RestartPolicy:
+    """
+    Restart policy for a setting value
+
+    :param name: 'Luby', 'Glucose' or 'None'
+    :return:
+    """
+
+    if name == "Luby":
+        return LubyRestarts()
+    elif name == "Glucose":
+        return GlucoseRestarts()
+    elif name == "None" or name is None:
+        return NoRestarts()
+
+    raise Exception(f"Unknown restart policy {name}")
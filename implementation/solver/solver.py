@@ -1,6 +1,9 @@
 from implementation.util.data_management import DataManager
 from implementation.solver.knowledge_base import KnowledgeBase
+from implementation.solver.budget import Budget
+from implementation.model.exception_implementations import RunningTimeException
 from typing import Tuple, List
+from collections import defaultdict
 import random
 
 try:
@@ -27,12 +30,49 @@ class Solver:
         # problem id
         self.problem_id = problem_id
 
+        # counters of the search (decisions, conflicts, propagations, ...)
+        self.search_statistics = defaultdict(int)
+
+        # resource limits of a solve, None for no limits
+        self.budget: Budget = None
+
     def split(self, current_state: KnowledgeBase):
         raise NotImplementedError("Method needs to be overrided by child-class")
 
     def solve_instance(self)-> Tuple[KnowledgeBase, bool, List]:
         raise NotImplementedError("Method needs to be overrided by child-class")
 
+    def budget_counters(self, state: KnowledgeBase) -> Tuple[int, int, int]:
+        """ decisions, conflicts and propagations so far, as the budget counts them """
+        return self.search_statistics["decisions"], self.search_statistics["conflicts"], state.propagations
+
+    def check_budget(self, state: KnowledgeBase):
+        """ Raises a RunningTimeException when the budget of the solve is exhausted """
+        if (self.budget is not None):
+            self.budget.check(self.budget_counters(state))
+
+    def within_budget(self, search, *arguments) -> Tuple[KnowledgeBase, bool, List]:
+        """
+        Runs a search loop under the budget. When the budget runs out the result is unknown: the initial state,
+        None instead of whether it is satisfiable and the statistics so far, the exhausted resource is
+        recorded as 'budget_exhausted' in the search statistics.
+
+        :param search: solving loop
+        :param arguments: passed on to the loop
+        :return:
+        """
+
+        if (self.budget is not None):
+            self.budget.start(self.budget_counters(self.initial))
+
+        try:
+            return search(*arguments)
+        except RunningTimeException as exception:
+            print(f"\n{exception}")
+            self.search_statistics["budget_exhausted"] = exception.budget
+            self.search_statistics["propagations"] = self.budget.counters[2]
+            return self.initial, None, self.split_statistics
+
     def get_elapsed_runtime(self):
         return timeit.default_timer() - self.start
 
@@ -4,6 +4,10 @@ from implementation.model.clause import Clause
 from collections import defaultdict
 from implementation.model.exception_implementations import RestartException
 from implementation.solver.solver import Solver
+from implementation.model.variable_heap import VariableHeap
+from implementation.solver.restart_policy import get_restart_policy
+from implementation.model.learned_clause_database import LearnedClauseDatabase
+from implementation.model.implication_graph import BinaryImplicationGraph
 import random
 try:
     import numpy as np
@@ -57,6 +61,20 @@ class CDCL_DPLL_Solver(Solver):
         # keeps track of which timestep was backtracked too last
         self.cyclefree = defaultdict(int)
 
+        # VSIDS: amount added to the activity of a variable on a conflict, grows every conflict to decay older bumps
+        self.activity_increment = 1.0
+        self.activity_decay = 0.95
+
+        # decides when the search restarts from level 0
+        self.restart_policy = get_restart_policy(self.heuristics.get("Restarts", "None"))
+        self.search_statistics["restart_intervals"] = []
+
+        # learned clauses, shared with the knowledge base by reference and reduced when they exceed the budget
+        self.learned_clauses = LearnedClauseDatabase(budget=self.heuristics.get("LearnedClauseBudget", None))
+
+        # implications of the binary clauses, original and learned, built when conflict learning starts
+        self.implication_graph = None
+
         self.start = start
 
 
@@ -79,6 +97,21 @@ class CDCL_DPLL_Solver(Solver):
         # Check tautology (part of simplify, but only done once)
         self.initial.simplify_tautology()
 
+        if (self.is_conflict_learning_active()):
+            return self.within_budget(self.solve_with_learning)
+
+        if (self.initial.trail_active):
+            return self.within_budget(self.solve_on_trail)
+
+        return self.within_budget(self.solve_on_copies)
+
+    def solve_on_copies(self) -> Tuple[KnowledgeBase, bool, List]:
+        """
+        Solving loop for a knowledge base in copy mode, every node of the search tree gets its own copy of the state
+
+        :return:
+        """
+
         solved = False
         count = 0
 
@@ -92,6 +125,7 @@ class CDCL_DPLL_Solver(Solver):
 
             # get next entry from stack
             current_state : KnowledgeBase = self.get_next_state()
+            self.check_budget(current_state)
 
             # user & statistics
             count = self.inform_user(current_state, count, self.start)
@@ -115,6 +149,7 @@ class CDCL_DPLL_Solver(Solver):
             # detect problems
             if not valid:
                 # backtrack
+                self.search_statistics["conflicts"] += 1
                 self.handle_problem_clause(current_state, potential_problem)
                 continue
 
@@ -127,9 +162,317 @@ class CDCL_DPLL_Solver(Solver):
                 return self.wrap_up_result(current_state, True, self.split_statistics, list(self.initial.bookkeeping.keys()))
             else:
                 # split
+                self.search_statistics["decisions"] += 1
                 future_states, literal = self.split(current_state)
                 self.stack[literal] = future_states
 
+    def solve_on_trail(self) -> Tuple[KnowledgeBase, bool, List]:
+        """
+        Solving loop for a knowledge base in trail mode.
+        The search tree is expanded on one single state, backtracking undoes the changes on the trail instead of
+        restoring a copy, so memory grows with the search depth instead of with the number of nodes.
+
+        :return:
+        """
+
+        current_state = self.initial
+        all_literals = list(current_state.bookkeeping.keys())
+
+        # decisions on the current path: literal and the truth assignments that are not tried yet
+        decisions = []
+
+        valid = True
+        potential_problem = 0
+        count = 0
+
+        while (True):
+
+            self.check_budget(current_state)
+
+            if valid:
+
+                count += 1
+
+                # user & statistics
+                count = self.inform_user(current_state, count, self.start)
+                self.split_statistics.append(current_state.split_statistics(self.get_elapsed_runtime()))
+
+                # simplify
+                valid, potential_problem = current_state.simplify([], self.is_dependency_graph_active())
+
+            if valid:
+
+                # check for solution
+                if current_state.validate():
+                    print("\nSolved")
+                    return self.wrap_up_result(current_state, True, self.split_statistics, all_literals)
+
+                # split
+                self.timestep += 1
+                self.search_statistics["decisions"] += 1
+                truth_assignments = [False, True]
+                random.shuffle(truth_assignments)
+                decisions.append((self.choose_literal(current_state), truth_assignments))
+
+            else:
+                # conflict
+                self.search_statistics["conflicts"] += 1
+                self.handle_problem_clause(current_state, potential_problem)
+
+            # chronological backtracking to the most recent decision with an untried truth assignment
+            while (True):
+
+                while (len(decisions) > 0 and len(decisions[-1][1]) == 0):
+                    decisions.pop()
+
+                if (len(decisions) == 0):
+                    if (self.is_dependency_graph_active()):
+                        # the problem clauses of the dependency graph are not guaranteed to be implied
+                        raise RestartException("Search space exhausted!", restart=True, stats=self.split_statistics, elapsed_runtime=self.get_elapsed_runtime())
+                    print("\nUnsatisfiable")
+                    return current_state, False, self.split_statistics
+
+                literal, truth_assignments = decisions[-1]
+                current_state.backtrack(len(decisions) - 1)
+
+                # problem clauses that are violated here rule out both truth assignments
+                if (self.is_dependency_graph_active() and not self.add_problem_clauses_to_state(current_state)):
+                    truth_assignments.clear()
+                    continue
+
+                break
+
+            # do split
+            current_state.new_decision_level()
+            valid, potential_problem = current_state.set_literal(literal, truth_assignments.pop(), split=True, dependency_graph=self.is_dependency_graph_active())
+            if not valid:
+                potential_problem = literal
+
+    def solve(self, assumptions: List[int] = None) -> Tuple[KnowledgeBase, bool, List]:
+        """
+        Incremental solving: solves the formula the solver was made with, under assumptions (signed literals),
+        and can be called again and again with other assumptions.
+
+        Assumptions are taken as the first decisions instead of being added as clauses, so every learned clause
+        follows from the formula alone and is kept for the next call, together with the variable activities and
+        saved phases. Everything that was assigned on top of level 0 (the assumptions and the search under them)
+        is undone at the start of the next call, so the returned state holds the model until then.
+
+        :param assumptions:
+        :return: state, whether it is satisfiable under the assumptions and the split statistics of this call
+        """
+
+        if (not self.is_conflict_learning_active()):
+            raise Exception("Solving under assumptions needs conflict learning")
+
+        if (assumptions is None):
+            assumptions = []
+
+        for literal in assumptions:
+            if abs(literal) not in self.initial.bookkeeping:
+                raise Exception(f"Assumption {literal} is not a variable of the formula")
+
+        if (self.start is None):
+            self.start = timeit.default_timer()
+            self.initial.simplify_tautology()
+
+        self.split_statistics = []
+
+        return self.within_budget(self.solve_with_learning, assumptions)
+
+    def solve_with_learning(self, assumptions: List[int] = ()) -> Tuple[KnowledgeBase, bool, List]:
+        """
+        Conflict driven clause learning on a WatchedKnowledgeBase.
+        Every conflict is analysed on the implication graph (first UIP), the learned clause is added
+        and the search jumps back straight to the level on which that clause asserts its first literal.
+
+        :param assumptions: literals that are decided on the first levels, in order
+        :return:
+        """
+
+        current_state = self.initial
+        all_literals = list(current_state.bookkeeping.keys())
+        count = 0
+
+        if (self.is_vsids_active() and current_state.variable_order is None):
+            current_state.variable_order = VariableHeap(all_literals, self.initial_activities(current_state, all_literals))
+
+        # a conflict on level 0 (found by an earlier call or while loading the clauses) holds under any assumptions
+        if current_state.unsatisfiable:
+            print("\nUnsatisfiable")
+            return current_state, False, self.split_statistics
+
+        # undo the assumptions and the search of a previous call
+        if current_state.decision_level > 0:
+            current_state.backtrack(0)
+
+        self.fix_root_facts(current_state)
+
+        while (True):
+
+            self.check_budget(current_state)
+
+            conflict = current_state.propagate()
+
+            if conflict is not None:
+
+                self.search_statistics["conflicts"] += 1
+
+                if current_state.decision_level == 0:
+                    print("\nUnsatisfiable")
+                    self.search_statistics["propagations"] = current_state.propagations
+                    return current_state, False, self.split_statistics
+
+                # learn and backjump
+                learned, level = current_state.analyze(conflict)
+                lbd = current_state.lbd(learned)
+                if (self.is_vsids_active()):
+                    self.bump_activities(current_state)
+                self.bump_learned_clauses(current_state)
+                current_state.backtrack(level)
+                self.clause_counter += 1
+                self.learned_clauses.add(current_state.learn(self.clause_counter, learned), lbd)
+                if len(learned) == 2:
+                    self.implication_graph.add_binary(*learned)
+                self.search_statistics["learned_literals"] += len(learned)
+
+                if self.learned_clauses.should_reduce():
+                    self.reduce_learned_clauses(current_state)
+
+                if self.restart_policy.on_conflict(lbd):
+                    self.restart(current_state)
+                continue
+
+            # the assumptions are the first decisions, a level is opened for each even when it is already true
+            if current_state.decision_level < len(assumptions):
+                assumption = assumptions[current_state.decision_level]
+                value = current_state.value(assumption)
+                current_state.new_decision_level()
+                if value is False:
+                    print("\nUnsatisfiable under assumptions")
+                    self.search_statistics["propagations"] = current_state.propagations
+                    return current_state, False, self.split_statistics
+                if value is None:
+                    current_state.assign(assumption)
+                continue
+
+            if current_state.validate():
+                print("\nSolved")
+                self.search_statistics["propagations"] = current_state.propagations
+                return self.wrap_up_result(current_state, True, self.split_statistics, all_literals)
+
+            count += 1
+
+            # user & statistics
+            count = self.inform_user(current_state, count, self.start)
+            self.split_statistics.append(current_state.split_statistics(self.get_elapsed_runtime()))
+
+            # split
+            self.search_statistics["decisions"] += 1
+            literal = self.choose_literal(current_state)
+            current_state.new_decision_level()
+            current_state.assign(literal if self.choose_phase(current_state, literal) else -literal)
+
+    def restart(self, current_state: KnowledgeBase):
+        """
+        Restarts the search from decision level 0,
+        learned clauses, saved phases and variable activities all live on and are kept
+
+        :param current_state:
+        :return:
+        """
+
+        self.search_statistics["restarts"] += 1
+        self.search_statistics["restart_intervals"].append(self.restart_policy.conflicts)
+        self.restart_policy.on_restart()
+        current_state.backtrack(0)
+        self.fix_root_facts(current_state)
+
+    def fix_root_facts(self, current_state: KnowledgeBase):
+        """
+        Failed literal probing on the binary implication graph, on decision level 0:
+        a literal that implies a contradiction over the binary clauses is false in every model, so its negation
+        is assigned as a fact. After the first round only the literals that reach a literal with new implications
+        (from learned binary clauses) are probed again.
+
+        :param current_state:
+        :return:
+        """
+
+        if (self.implication_graph is None):
+            self.implication_graph = BinaryImplicationGraph.from_clauses(current_state.clauses.values())
+
+        for literal in self.implication_graph.failed_literals():
+            if current_state.value(-literal) is None:
+                current_state.assign(-literal)
+                self.search_statistics["root_facts"] += 1
+
+    def bump_learned_clauses(self, current_state: KnowledgeBase):
+        """
+        Bumps the activity of the learned clauses used in the last conflict analysis
+        and updates their literal block distance, which can only get lower
+
+        :param current_state:
+        :return:
+        """
+
+        learned_clauses = self.learned_clauses
+        learned_clauses.bump(current_state.analyzed_clauses)
+        for id in current_state.analyzed_clauses:
+            if id in learned_clauses:
+                learned_clauses.update_lbd(id, current_state.lbd(learned_clauses.clauses[id].literals))
+        learned_clauses.decay_activities()
+
+    def reduce_learned_clauses(self, current_state: KnowledgeBase):
+        """
+        Throws out the worse half of the learned clauses, clauses that are the reason of an assignment are kept
+
+        :param current_state:
+        :return:
+        """
+
+        removed = self.learned_clauses.reduce(current_state.locked)
+        for clause in removed:
+            current_state.detach_clause(clause)
+
+        self.search_statistics["reductions"] += 1
+        self.search_statistics["removed_clauses"] += len(removed)
+
+    def initial_activities(self, current_state: KnowledgeBase, all_literals: List[int]) -> Dict[int, float]:
+        """
+        Starting point of VSIDS and phase saving. With seed 0 (the default) all activities are 0 and all phases False,
+        any other seed gives random initial phases and tiny random activities, which only break the ties
+        between variables that were not bumped yet, so every seed searches differently.
+
+        :param current_state:
+        :param all_literals:
+        :return: activity per variable, None for all 0
+        """
+
+        seed = self.heuristics.get("Seed", 0)
+        if (seed == 0):
+            return None
+
+        rng = random.Random(seed)
+        for literal in all_literals:
+            current_state.phases.setdefault(literal, rng.random() < 0.5)
+
+        return {literal: rng.random() * 1e-6 for literal in all_literals}
+
+    def choose_phase(self, current_state: KnowledgeBase, literal: int) -> bool:
+        """
+        Truth value to try first for a decision literal: the saved phase (False if there is none yet) or random
+
+        :param current_state:
+        :param literal:
+        :return:
+        """
+
+        if (self.heuristics.get("PhaseSaving", False)):
+            return current_state.phases.get(literal, False)
+
+        return random.choice([True, False])
+
     def handle_problem_clause(self, state, literal):
         """
         Triggers backtracke mode and finds a new problem clause to add to knowledge base
@@ -168,9 +511,7 @@ class CDCL_DPLL_Solver(Solver):
         self.timestep += 1
 
         # choose a literal
-        literal = random.choice(list(current_state.bookkeeping.keys()))
-        while literal in current_state.current_set_literals:
-            literal = random.choice(list(current_state.bookkeeping.keys()))
+        literal = self.choose_literal(current_state)
 
         # add literal to order
         self.order.append(literal)
@@ -195,6 +536,42 @@ class CDCL_DPLL_Solver(Solver):
 
         return new_states, literal
 
+    def choose_literal(self, current_state: KnowledgeBase) -> int:
+        """
+        Chooses an unassigned literal to split on, the one with the highest activity for VSIDS and at random otherwise
+
+        :param current_state:
+        :return:
+        """
+
+        if (self.is_vsids_active() and current_state.variable_order is not None):
+            literal = current_state.variable_order.pop()
+            while literal in current_state.current_set_literals:
+                literal = current_state.variable_order.pop()
+            return literal
+
+        return random.choice([literal for literal in current_state.bookkeeping.keys() if literal not in current_state.current_set_literals])
+
+    def bump_activities(self, current_state: KnowledgeBase):
+        """
+        VSIDS: raises the activity of the variables in the last analysed conflict and decays all others
+        by growing the increment instead of shrinking every activity
+
+        :param current_state:
+        :return:
+        """
+
+        variable_order = current_state.variable_order
+        for variable in current_state.analyzed:
+            variable_order.increase(variable, self.activity_increment)
+
+        self.activity_increment /= self.activity_decay
+
+        # keep the numbers in range
+        if self.activity_increment > 1e100:
+            variable_order.rescale(1e-100)
+            self.activity_increment *= 1e-100
+
     def get_next_state(self) -> KnowledgeBase:
         """
         Gets the next state.
@@ -280,10 +657,18 @@ class CDCL_DPLL_Solver(Solver):
         """
         Adds list of discovered problem clauses to new state
 
+        The clauses that are already attached to the state are skipped,
+        in trail mode the state itself copies the ones it adds and returns whether the addition was valid.
+
         :param state:
         :return:
         """
-        valid = state.add_clauses(self.data_manager.personal_deepcopy(self.problem_clauses))
+        missing = [clause for clause in self.problem_clauses if clause.id not in state.clauses]
+
+        if (state.trail_active):
+            return state.add_clauses(missing)
+
+        valid = state.add_clauses(self.data_manager.personal_deepcopy(missing))
         if (not valid):
             raise RestartException("Adding clauses led to invalid addition!", restart=True, stats=self.split_statistics, elapsed_runtime=self.get_elapsed_runtime())
 
@@ -319,3 +704,9 @@ class CDCL_DPLL_Solver(Solver):
 
     def is_dependency_graph_active(self) -> bool:
         return self.heuristics["DependencyGraph"]
+
+    def is_conflict_learning_active(self) -> bool:
+        return self.heuristics.get("ConflictLearning", False)
+
+    def is_vsids_active(self) -> bool:
+        return self.heuristics.get("DecisionHeuristic", "Random") == "VSIDS"
@@ -1,13 +1,27 @@
-import itertools
-from collections import defaultdict
-from typing import Tuple, List, Generator
+import heapq
+from multiprocessing import Pool
+from typing import Dict, Tuple, List, Generator
 from implementation.solver.knowledge_base import KnowledgeBase
+from implementation.model.clause import Clause
 import timeit
 from implementation.solver.solver import Solver
+from implementation.model.implication_graph import BinaryImplicationGraph
+from implementation.model.preselection_index import PreselectionIndex
+from implementation.model.branch import Branch
+
+#### Constants
+# weight per clause length in the clause reduction heuristic
+GAMMAS = {2: 1, 3: 0.2, 4: 0.05, 5: 0.01, 6: 0.003, **{k: 20.4514 * 0.218673 ** k for k in range(7, 10)}}
+
+# a probe that gives more new binary clauses than this is followed by a double look
+DOUBLE_LOOK_BINARIES = 65
+
+# solver of a look ahead worker process, set once by init_probe_worker
+probe_worker = {}
 
 
 class LookAHeadSolver(Solver):
-    def __init__(self, knowledge_base: KnowledgeBase, problem_id=None):
+    def __init__(self, knowledge_base: KnowledgeBase, problem_id=None, workers=None):
 
         super().__init__(knowledge_base, problem_id)
         self.initial = knowledge_base
@@ -15,6 +29,24 @@ class LookAHeadSolver(Solver):
         self.total_literals = knowledge_base.literal_counter
         self.failed_literals = 0
 
+        # implications of the binary clauses, refutes branches without copying the state
+        self.implication_graph = BinaryImplicationGraph.from_clauses(knowledge_base.clauses.values())
+
+        # untried branches of the depth first search
+        self.stack = []
+
+        # ranking of the variables for the preselection, on the weights the knowledge base keeps
+        knowledge_base.track_weights()
+        self.index = None
+
+        # the candidates of a node are probed by a pool of workers that each hold a copy of the formula
+        self.workers = workers if workers is not None and workers > 1 else None
+        self.pool = None
+        if (self.workers is not None):
+            if (not knowledge_base.trail_active):
+                raise Exception("Look ahead can only be parallel on a knowledge base in trail mode")
+            self.formula = ({id: list(clause.literals) for id, clause in knowledge_base.clauses.items()}, knowledge_base.clause_counter)
+
     def solve_instance(self) -> Tuple[KnowledgeBase, bool, List]:
         """ main function for solving knowledge base """
         self.nr_of_splits = -1
@@ -24,25 +56,43 @@ class LookAHeadSolver(Solver):
         # Check tautology (part of simplify, but only done once)
         self.initial.simplify_tautology()
 
-        stack = iter([self.data_manager.personal_deepcopy(self.initial)])
-        solved = False
+        if (self.initial.trail_active):
+            try:
+                return self.within_budget(self.solve_on_trail)
+            finally:
+                self.close_pool()
+
+        return self.within_budget(self.solve_on_copies)
+
+    def solve_on_copies(self) -> Tuple[KnowledgeBase, bool, List]:
+        """
+        Solving loop for a knowledge base in copy mode, every branch gets its own copy of the state
+
+        :return:
+        """
+
+        self.stack = [Branch(None, None, self.data_manager.personal_deepcopy(self.initial))]
         count = 0
 
-        while (not solved):
+        while (True):
             count += 1
-            # get next entry from stack
-            try:
-                current_state: KnowledgeBase = next(stack)
+            # get next branch from the stack
+            if (len(self.stack) == 0):
+                raise Exception("Sudoku solving failed")
 
-                self.nr_of_splits += 1
+            current_state = self.open_branch(self.stack.pop())
+            if current_state is None:
+                continue
 
-                # inform user of progress
-                count = self.inform_user(current_state, count, self.start)
+            self.check_budget(current_state)
 
-                # add stats
-                self.split_statistics.append(current_state.split_statistics(self.get_elapsed_runtime()))
-            except StopIteration:
-                raise Exception("Sudoku solving failed")
+            self.nr_of_splits += 1
+
+            # inform user of progress
+            count = self.inform_user(current_state, count, self.start)
+
+            # add stats
+            self.split_statistics.append(current_state.split_statistics(self.get_elapsed_runtime()))
 
             # check for solution
             solved = current_state.validate()
@@ -52,7 +102,7 @@ class LookAHeadSolver(Solver):
                 return self.wrap_up_result(self.data_manager.duplicate_knowledge_base(current_state, -1, False), True, self.split_statistics, self.data_manager.personal_deepcopy(list(self.initial.bookkeeping.keys())))
 
             # simplify
-            valid = current_state.simplify([], False)
+            valid = current_state.simplify([], False)[0]
             if not valid:
                 continue
 
@@ -64,84 +114,277 @@ class LookAHeadSolver(Solver):
                 print("\nSolved")
                 return self.wrap_up_result(self.data_manager.duplicate_knowledge_base(current_state, -1, False), True, self.split_statistics, self.data_manager.personal_deepcopy(list(self.initial.bookkeeping.keys())))
             else:
-                # split
-                future_states = self.split(current_state)
-                stack = itertools.chain(future_states, stack)
+                # split, the first branch to try goes on top
+                self.push_branches(reversed(self.branch(current_state)))
 
-    def split(self, current_state: KnowledgeBase) -> Generator[KnowledgeBase, None, None]:
+    def solve_on_trail(self) -> Tuple[KnowledgeBase, bool, List]:
         """
-        Splits current state with values {False, True}, for a certain literal
+        Solving loop for a knowledge base in trail mode.
+        The search tree is expanded depth first on one single state, forced literals are set in place
+        and backtracking undoes the changes on the trail.
+
+        :return:
+        """
+
+        current_state = self.initial
+        all_literals = list(current_state.bookkeeping.keys())
+
+        # untried branches, at most two per decision level on the current path
+        self.stack = []
+
+        valid = True
+        count = 0
+
+        while (True):
+
+            self.check_budget(current_state)
+
+            if valid:
+                count += 1
+                self.nr_of_splits += 1
+
+                # inform user of progress
+                count = self.inform_user(current_state, count, self.start)
+
+                # add stats
+                self.split_statistics.append(current_state.split_statistics(self.get_elapsed_runtime()))
+
+                # simplify
+                valid = current_state.simplify([], False)[0]
+
+            if valid and current_state.validate():
+                # found solution
+                print("\nSolved")
+                return self.wrap_up_result(current_state, True, self.split_statistics, all_literals)
+
+            if valid:
+                # look ahead sets forced literals in place and ranks the branches
+                branches = self.branch(current_state)
+
+                if len(branches) > 0 and branches[0].literal is None:
+                    # all candidates turned out to be forced, look ahead again on the simplified state
+                    continue
+
+                # the first branch to try goes on top
+                self.push_branches(reversed(branches))
+
+            if not valid:
+                self.search_statistics["conflicts"] += 1
+
+            # backtrack to the most recent untried branch
+            if (len(self.stack) == 0):
+                print("\nUnsatisfiable")
+                return current_state, False, self.split_statistics
+
+            valid = self.open_branch(self.stack.pop()) is not None
+
+    def budget_counters(self, state: KnowledgeBase) -> Tuple[int, int, int]:
+        """ every node of the look ahead tree is a decision """
+        return self.nr_of_splits, self.search_statistics["conflicts"], state.propagations
+
+    def cubes(self, depth: int, cutoff: int = 0) -> Generator[List[int], None, None]:
+        """
+        Splits the problem into cubes for cube-and-conquer: the search tree of the look ahead is expanded
+        up to a depth and every open leaf is yielded as the list of literals decided on the way to it.
+        Branches that the look ahead refutes are left out, so the formula is satisfiable if and only if
+        one of the cubes is satisfiable in it.
+        Works on a knowledge base in trail mode, the state is changed in place between two cubes.
+
+        :param depth: maximum number of decisions in a cube
+        :param cutoff: a node with at most this many unassigned variables is not split any further
+        :return:
+        """
+
+        if (not self.initial.trail_active):
+            raise Exception("Cubes can only be split off a knowledge base in trail mode")
+
+        self.nr_of_splits = -1
+        self.split_statistics = []
+        self.start = timeit.default_timer()
+
+        # Check tautology (part of simplify, but only done once)
+        self.initial.simplify_tautology()
+
+        try:
+            yield from self.split_cube(self.initial, [], depth, cutoff)
+        finally:
+            self.close_pool()
+
+    def split_cube(self, current_state: KnowledgeBase, cube: List[int], depth: int, cutoff: int) -> Generator[List[int], None, None]:
+        """
+        Yields the cubes below one node of the look ahead tree
 
         :param current_state:
+        :param cube: literals decided so far
+        :param depth:
+        :param cutoff:
         :return:
         """
-        iterator = self.look_ahead(current_state)
-        for new_state, literal, choice in iterator:
-            if literal is None or new_state is None:
+
+        while (True):
+            self.nr_of_splits += 1
+            self.split_statistics.append(current_state.split_statistics(self.get_elapsed_runtime()))
+
+            if not current_state.simplify([], False)[0]:
                 return
-            current_state: KnowledgeBase = new_state
 
-            # do split
-            new_state = self.data_manager.duplicate_knowledge_base(current_state, -1, False)
-            valid = new_state.set_literal(literal, choice)[0]
-            if not valid:
-                self.failed_literals += 1
-                # Reached non-valid state, thus leaf-node
+            if current_state.validate() or len(cube) >= depth or self.total_literals - len(current_state.current_set_literals) <= cutoff:
+                yield list(cube)
+                return
+
+            # look ahead sets forced literals in place and ranks the branches
+            assigned = len(current_state.current_set_literals)
+            state, literal, choice = self.look_ahead(current_state)[0]
+
+            if state is None:
                 return
+            if literal is not None:
+                break
+            if len(current_state.current_set_literals) == assigned:
+                # there was no candidate to split on, the node stays open as a cube
+                yield list(cube)
+                return
+
+            # all candidates turned out to be forced, look ahead again on the simplified state
+
+        level = current_state.decision_level
+        for truth_value in [choice, not choice]:
+            current_state.new_decision_level()
+            if current_state.set_literal(literal, truth_value)[0]:
+                yield from self.split_cube(current_state, cube + [literal if truth_value else -literal], depth, cutoff)
+            else:
+                self.failed_literals += 1
+            current_state.backtrack(level)
+
+    def split(self, current_state: KnowledgeBase) -> Generator[KnowledgeBase, None, None]:
+        """
+        Splits current state with values {False, True}, for a certain literal
+
+        :param current_state:
+        :return:
+        """
+        for branch in self.branch(current_state):
+            new_state = self.open_branch(branch)
+            if new_state is not None:
+                yield new_state
+
+    def branch(self, current_state: KnowledgeBase) -> List[Branch]:
+        """
+        Looks ahead on a state and returns its branches in the order to try them:
+        none when the state has no valid branch, one without literal when only forced literals were found,
+        otherwise both truth values of the chosen literal.
+        The undo point is the decision level of the state in trail mode and the state itself otherwise.
+
+        :param current_state:
+        :return:
+        """
+
+        ranking = self.look_ahead(current_state)
+        state, literal, choice = ranking[0]
 
-            yield new_state
+        if state is None:
+            return []
+
+        undo_point = state.decision_level if state.trail_active else state
+        if literal is None:
+            return [Branch(None, None, undo_point)]
+
+        return [Branch(literal, choice, undo_point), Branch(literal, ranking[1][2], undo_point)]
+
+    def push_branches(self, branches):
+        """
+        Pushes branches on the search stack and keeps track of its largest size
+
+        :param branches:
+        :return:
+        """
+
+        self.stack.extend(branches)
+        if len(self.stack) > self.search_statistics["max_stack"]:
+            self.search_statistics["max_stack"] = len(self.stack)
+
+    def open_branch(self, branch: Branch):
+        """
+        Makes the decision of a branch: in trail mode the state is backtracked to the undo point and the literal is
+        set on a new decision level, otherwise the literal is set on a copy of the state of the undo point
+
+        :param branch:
+        :return: the state with the decision, None if the decision leads to a conflict right away
+        """
+
+        if (isinstance(branch.undo_point, int)):
+            state = self.initial
+            state.backtrack(branch.undo_point)
+            state.new_decision_level()
+        elif (branch.literal is None):
+            return branch.undo_point
+        else:
+            state = self.data_manager.duplicate_knowledge_base(branch.undo_point, -1, False)
+
+        if not state.set_literal(branch.literal, branch.phase)[0]:
+            self.failed_literals += 1
+            return None
+
+        return state
 
     def look_ahead(self, current_state):
         """
         Look ahead of the current state
         And set any forced literals
-        Returns the most promising branch according to a heuristic
+        Returns the most promising branch according to a heuristic,
+        (state, None, None) if forced literals were set but nothing was left to rank and (None, None, None) when the
+        state has no valid branch.
+        In trail mode the forced literals are set on current_state itself instead of on a copy.
         :param current_state:
         :return:
         """
         heuristic = {}
         f: KnowledgeBase = current_state
-        for literal in self.preselect(f):
+        forced = 0
+        candidates = self.preselect(f)
+        if (self.workers is not None):
+            candidates = self.probe_in_parallel(f, list(candidates))
+
+        for candidate in candidates:
             # if literal in f.current_set_literals:
             #     continue
 
-            fprime = self.data_manager.duplicate_knowledge_base(f, -1, False)
-            valid1 = fprime.set_literal(literal, False)[0]
-            if valid1:
-                valid1 = fprime.simplify([], False)[0]
-            self.split_statistics.append(fprime.split_statistics(self.get_elapsed_runtime()))
-
-            if valid1 and fprime.nr_of_binary_clauses() - 65 > f.nr_of_binary_clauses():
-                fprime, valid1 = self.double_look(fprime)
-
-            fdprime = self.data_manager.duplicate_knowledge_base(f, -1, False)
-            valid2 = fdprime.set_literal(literal, True)[0]
-            if valid2:
-                valid2 = fdprime.simplify([], False)[0]
-            self.split_statistics.append(fdprime.split_statistics(self.get_elapsed_runtime()))
-
-            if valid2 and fdprime.nr_of_binary_clauses() - 65 > f.nr_of_binary_clauses():
-                fdprime, valid2 = self.double_look(fdprime)
+            if (self.workers is not None):
+                literal, (valid1, diff_f_prime, fprime), (valid2, diff_fd_prime, fdprime) = candidate
+            else:
+                literal = candidate
+                valid1, diff_f_prime, fprime = self.probe(f, literal, False)
+                valid2, diff_fd_prime, fdprime = self.probe(f, literal, True)
 
             if not valid1 and not valid2:
                 return [(None, None, None),]
             elif not valid1:
                 self.failed_literals += 1
-                f = fdprime
+                forced += 1
+                f = self.force_literal(f, fdprime, literal, True)
             elif not valid2:
                 self.failed_literals += 1
-                f = fprime
+                forced += 1
+                f = self.force_literal(f, fprime, literal, False)
             else:
-                diff_fd_prime = self.diff(f, fdprime)
-                diff_f_prime = self.diff(f, fprime)
                 heuristic[literal] = (
                     1024 * diff_f_prime * diff_fd_prime + diff_f_prime + diff_fd_prime,
                     diff_fd_prime,
                     diff_f_prime,
                 )
 
+            if f is None:
+                return [(None, None, None),]
+
+        # forced literals found later in the loop may have set literals that were ranked before
+        heuristic = {literal: values for literal, values in heuristic.items() if literal not in f.current_set_literals}
+
         if len(heuristic) == 0:
-            return [(None, None, None),]
+            if forced == 0 and not f.validate():
+                # nothing was forced, looking ahead again would give the same result, split on any open variable
+                literal = next(iter(f.bookkeeping))
+                return [(f, literal, True), (f, literal, False)]
+            return [(f, None, None),]
 
         literal, heuristic_vals = max(heuristic.items(), key=lambda kv: kv[1][0])
         if heuristic_vals[1] > heuristic_vals[2]:
@@ -149,6 +392,124 @@ class LookAHeadSolver(Solver):
         else:
             return [(f, literal, False), (f, literal, True)]
 
+    def probe_in_parallel(self, state, candidates):
+        """
+        Probes the candidates of a node on the pool of workers, every worker gets a share of the candidates
+        and the assignment of the node, which it brings its own copy of the formula to before probing.
+
+        All candidates are probed on the node as it is, the forced literals are set afterwards by look_ahead in
+        the order of the candidates. That is sound because a forced literal holds in every model of the node,
+        a candidate that a forced literal before it already set is either set to the same value or gives a conflict.
+
+        :param state:
+        :param candidates:
+        :return: per candidate, in order: the literal and the validity, heuristic value and (no) copy for both truth values
+        """
+
+        if (len(candidates) == 0):
+            return []
+
+        if (self.pool is None):
+            self.pool = Pool(self.workers, initializer=init_probe_worker, initargs=self.formula)
+
+        assignment = list(state.current_set_literals.items())
+        shares = [candidates[worker::self.workers] for worker in range(min(self.workers, len(candidates)))]
+        tasks = [(assignment, share, self.nr_of_splits, self.failed_literals) for share in shares]
+
+        results = {}
+        for probes in self.pool.map(probe_candidates, tasks):
+            for literal, valid1, diff1, valid2, diff2 in probes:
+                results[literal] = (literal, (valid1, diff1, None), (valid2, diff2, None))
+
+        return [results[literal] for literal in candidates]
+
+    def close_pool(self):
+        """
+        Stops the workers of the parallel look ahead, if there are any
+
+        :return:
+        """
+
+        if (self.pool is not None):
+            self.pool.terminate()
+            self.pool = None
+
+    def probe(self, state, literal, truth_value, look_ahead=True):
+        """
+        Sets a literal and simplifies, measures the effect with the clause reduction heuristic and, when the literal
+        gives many new binary clauses, does a double look on top of it.
+
+        In trail mode this happens on the state itself on a new decision level, the effect is read from the clause
+        length counts before and after and the level is undone afterwards, so a probe costs as much as it propagates.
+        Otherwise the literal is set on a copy of the state, which is returned to continue with when the literal is forced.
+        When the literal implies a false literal over the binary clauses it is refuted right away.
+
+        :param state:
+        :param literal:
+        :param truth_value:
+        :param look_ahead: False to only find out whether the literal is valid (for the double look)
+        :return: whether it is valid, the heuristic value and the copy (None in trail mode or when it was refuted on the implication graph)
+        """
+
+        if self.implication_graph.probe(literal if truth_value else -literal, state.current_set_literals):
+            return False, 0, None
+
+        if (not state.trail_active):
+            new_state = self.data_manager.duplicate_knowledge_base(state, -1, False)
+            valid = new_state.set_literal(literal, truth_value)[0]
+            if valid:
+                valid = new_state.simplify([], False)[0]
+            self.split_statistics.append(new_state.split_statistics(self.get_elapsed_runtime()))
+
+            if not (valid and look_ahead):
+                return valid, 0, new_state
+
+            if new_state.clause_lengths[2] - DOUBLE_LOOK_BINARIES > state.clause_lengths[2]:
+                new_state, valid = self.double_look(new_state)
+
+            return valid, self.diff(state, new_state) if valid else 0, new_state
+
+        level = state.decision_level
+        state.new_decision_level()
+        before = state.clause_lengths.copy()
+
+        valid = state.set_literal(literal, truth_value)[0]
+        if valid:
+            valid = state.simplify([], False)[0]
+        self.split_statistics.append(state.split_statistics(self.get_elapsed_runtime()))
+
+        heuristic = 0
+        if valid and look_ahead:
+            if state.clause_lengths[2] - DOUBLE_LOOK_BINARIES > before[2]:
+                valid = self.double_look(state)[1]
+            if valid:
+                heuristic = self.clause_reduction(before, state.clause_lengths)
+
+        state.backtrack(level)
+
+        return valid, heuristic, None
+
+    def force_literal(self, state, probed_state, literal, truth_value):
+        """
+        Continues with the probed state in which the forced literal is set,
+        in trail mode the forced literal is set on the state itself instead
+
+        :param state:
+        :param probed_state:
+        :param literal:
+        :param truth_value:
+        :return: the state to continue with, None if setting the literal led to a conflict
+        """
+
+        if (not state.trail_active):
+            return probed_state
+
+        valid = state.set_literal(literal, truth_value)[0]
+        if valid:
+            valid = state.simplify([], False)[0]
+
+        return state if valid else None
+
     def double_look(self, current_state):
         """
         Look ahead of the current state again, and set any forced literals.
@@ -160,24 +521,18 @@ class LookAHeadSolver(Solver):
             if literal in f.current_set_literals:
                 continue
 
-            fprime = self.data_manager.duplicate_knowledge_base(f, -1, False)
-            valid1 = fprime.set_literal(literal, False)[0]
-            if valid1:
-                valid1 = fprime.simplify([], False)[0]
-            self.split_statistics.append(fprime.split_statistics(self.get_elapsed_runtime()))
-
-            fdprime = self.data_manager.duplicate_knowledge_base(f, -1, False)
-            valid2 = fdprime.set_literal(literal, True)[0]
-            if valid2:
-                valid2 = fdprime.simplify([], False)[0]
-            self.split_statistics.append(fdprime.split_statistics(self.get_elapsed_runtime()))
+            valid1, _, fprime = self.probe(f, literal, False, look_ahead=False)
+            valid2, _, fdprime = self.probe(f, literal, True, look_ahead=False)
 
             if not valid1 and not valid2:
                 return fprime, False
             elif not valid1:
-                f = fdprime
+                f = self.force_literal(f, fdprime, literal, True)
             elif not valid2:
-                f = fprime
+                f = self.force_literal(f, fprime, literal, False)
+
+            if f is None:
+                return fprime, False
 
         return f, True
 
@@ -186,28 +541,26 @@ class LookAHeadSolver(Solver):
         Returns a heuristic value by comparing two states, implements Clause reduction heuristic (CRH).
         A higher heuristic value means this state is more promising.
         """
-        # Clause reduction heuristic
-        gammas = {2: 1, 3: 0.2, 4: 0.05, 5: 0.01, 6: 0.003}
-        for k in range(7, 10):
-            gammas[k] = 20.4514 * 0.218673 ** k
-
+        return self.clause_reduction(state.clause_lengths, new_state.clause_lengths)
 
-        count_dict_state = defaultdict(int)
-        for clause in state.clauses.values():
-            count_dict_state[len(clause)] += 1
-
-        count_dict_new_state = defaultdict(int)
-        for clause in new_state.clauses.values():
-            count_dict_new_state[len(clause)] += 1
-
-        heuristic = sum(abs(count_dict_new_state[k] - count_dict_state[k]) * gammas[k] for k in range(2, 10))
+    @staticmethod
+    def clause_reduction(before, after) -> float:
+        """
+        Clause reduction heuristic (CRH): weighted sum of the change in the number of clauses of each length
 
-        return heuristic
+        :param before: number of clauses per clause length
+        :param after: number of clauses per clause length
+        :return:
+        """
+        return sum(abs(after.get(k, 0) - before.get(k, 0)) * gamma for k, gamma in GAMMAS.items())
 
     def preselect(self, current_state, mu=5, gamma=7):
         """
         Return a set of P literals, returns a maximum amount of literals max_items
-        Literals returned are the literals that have the most occurrences in all clauses.
+        Literals returned are the literals that occur the most in binary and ternary clauses (in both polarities),
+        read in order from the preselection index, which only needs repairing for the variables whose weights changed.
+        When there are not enough of those, the other unassigned variables follow, ranked on their number of
+        occurrences in all clauses, so there is a candidate as long as there are clauses left.
         :param current_state:
         :param mu: The minimum number of literals returned (if so many are not yet set)
         :param gamma: Determines how heavy to factor in the amount of splits done so far.
@@ -216,14 +569,112 @@ class LookAHeadSolver(Solver):
         n = self.nr_of_splits
         n = max(1, n)
         max_items = int(mu + (gamma / n) + self.failed_literals)
-        all_lits = list(current_state.bookkeeping.items())
 
-        for literal, _ in sorted(all_lits, key=lambda kv: len(kv[1])):
-            if literal in current_state.current_set_literals:
+        index = self.preselection_index(current_state)
+        selected = set()
+        for literal in index.ranked():
+            if index.activity[literal] == 0:
+                # the variables after this one do not occur in binary or ternary clauses either
+                break
+            if literal in current_state.current_set_literals or literal not in current_state.bookkeeping:
                 continue
 
             yield literal
 
+            selected.add(literal)
             items += 1
             if items == max_items:
-                break
+                return
+
+        polarity_counts = current_state.polarity_counts
+
+        def occurrences(variable):
+            positive = polarity_counts.get(variable, 0)
+            negative = polarity_counts.get(-variable, 0)
+            return positive * negative + positive + negative
+
+        remaining = (variable for variable in current_state.bookkeeping if variable not in selected)
+        yield from heapq.nlargest(max_items - items, remaining, key=occurrences)
+
+    def preselection_index(self, current_state) -> PreselectionIndex:
+        """
+        The preselection index of a state, brought up to date with the weights of the state.
+        In trail mode there is one state, so the index is kept and repaired, a copied state gets a new one.
+
+        :param current_state:
+        :return:
+        """
+
+        if self.index is None or self.index.weights is not current_state.literal_weights:
+            self.index = PreselectionIndex(current_state.literal_weights)
+        else:
+            self.index.refresh(current_state.reweighted)
+        current_state.reweighted.clear()
+
+        return self.index
+
+
+def init_probe_worker(clauses: Dict[int, List[int]], clause_counter: int):
+    """
+    Builds the look ahead solver of a worker process on its own copy of the formula, in trail mode
+
+    :param clauses: literals per clause id
+    :param clause_counter:
+    :return:
+    """
+
+    knowledge_base = KnowledgeBase({id: Clause(id, literals) for id, literals in clauses.items()}, clause_counter=clause_counter, dependency_graph=False, trail=True)
+    knowledge_base.simplify_tautology()
+
+    solver = LookAHeadSolver(knowledge_base)
+    solver.start = timeit.default_timer()
+    probe_worker["solver"] = solver
+
+    # the literals of the nodes set on every decision level of the worker so far
+    probe_worker["levels"] = []
+
+
+def probe_candidates(task) -> List[Tuple[int, bool, float, bool, float]]:
+    """
+    Probes candidates of a node in a worker process.
+    The state of the worker is brought to the assignment of the node: it backtracks to the last decision level that
+    only set literals of the node and sets the literals it is missing on a new decision level.
+
+    :param task: the assignment of the node, the candidates, and the number of splits and failed literals of the solver
+    :return: per candidate: the literal and the validity and heuristic value for False and True
+    """
+
+    assignment, candidates, nr_of_splits, failed_literals = task
+
+    solver = probe_worker["solver"]
+    state = solver.initial
+    solver.nr_of_splits = nr_of_splits
+    solver.failed_literals = failed_literals
+    solver.split_statistics = []
+
+    levels = probe_worker["levels"]
+    node = dict(assignment)
+
+    level = next((level for level, literals in enumerate(levels) if any(node.get(variable, None) != value for variable, value in literals)), len(levels))
+    state.backtrack(level)
+    del levels[level:]
+
+    # what the kept levels propagated has to be part of the node too
+    if any(node.get(variable, None) != value for variable, value in state.current_set_literals.items()):
+        state.backtrack(0)
+        levels.clear()
+
+    missing = [(variable, value) for variable, value in assignment if variable not in state.current_set_literals]
+    state.new_decision_level()
+    levels.append(missing)
+    for variable, value in missing:
+        state.set_literal(variable, value)
+    state.simplify([], False)
+
+    results = []
+    for literal in candidates:
+        valid1, diff1, _ = solver.probe(state, literal, False)
+        valid2, diff2, _ = solver.probe(state, literal, True)
+        results.append((literal, valid1, diff1, valid2, diff2))
+
+    return results
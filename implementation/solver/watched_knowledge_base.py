@@ -0,0 +1,502 @@
+from collections import defaultdict, deque
+from typing import List, Dict, Tuple, Deque, Optional, Set
+
+from implementation.model.clause import Clause
+from implementation.model.split import Split
+from implementation.model.variable_heap import VariableHeap
+from implementation.solver.knowledge_base import KnowledgeBase, ASSIGNMENT
+
+
+class WatchedKnowledgeBase(KnowledgeBase):
+    """
+    knowledge base that does unit propagation with two watched literals
+
+    clauses are never shrunk or removed, instead every clause watches two of its literals that are not false.
+    Assigning a literal only visits the clauses that watch its negation, which either find a new literal to watch,
+    become unit (their other watched literal is queued) or are in conflict.
+
+    always runs in trail mode, since the watches stay valid when assignments are undone only assignments are recorded.
+
+    every assignment keeps its decision level and the clause that implied it (its reason, None for decisions),
+    together they form the implication graph that is used for first-UIP conflict analysis.
+
+    """
+
+    watched_literals: Dict[int, List[int]]
+    watches: Dict[int, List[int]]
+    queue: Deque[int]
+    assigned: List[int]
+    reasons: Dict[int, Optional[int]]
+    levels: Dict[int, int]
+    analyzed: Set[int]
+    analyzed_clauses: List[int]
+    phases: Dict[int, bool]
+    conflict: Optional[Clause]
+    variable_order: Optional[VariableHeap]
+
+    def __init__(self, clauses = None, clause_counter = 0, literal_counter = -1, timestep=0):
+
+        super().__init__(clauses, clause_counter=clause_counter, literal_counter=literal_counter, dependency_graph=False, timestep=timestep, trail=True)
+
+        # literals of each clause, the first two are watched
+        self.watched_literals = {}
+
+        # clause ids watching a literal, visited when that literal becomes false
+        self.watches = defaultdict(list)
+
+        # literals that became true and still need to be propagated
+        self.queue = deque()
+
+        # literals that are true, in order of assignment
+        self.assigned = []
+
+        # implication graph: clause id that implied each variable and the decision level it was set on
+        self.reasons = {}
+        self.levels = {}
+
+        # the clause that was violated by the last propagation
+        self.conflict = None
+
+        # variables and clause ids that took part in the last analysed conflict
+        self.analyzed = set()
+        self.analyzed_clauses = []
+
+        # last truth value of every variable that got unassigned (phase saving)
+        self.phases = {}
+
+        # optional decision order, variables that get unassigned are put back in it
+        self.variable_order = None
+
+        # number of literals propagated so far
+        self.propagations = 0
+
+        for clause in list(self.clauses.values()):
+            if not self.attach_clause(clause):
+                self.conflict = clause
+
+    @property
+    def unsatisfiable(self) -> bool:
+        """ A conflict on decision level 0 can not be undone """
+        return self.conflict is not None and self.decision_level == 0
+
+    def validate(self) -> bool:
+        """
+        Determine whether the current knowledge base is solved:
+        every variable is assigned and propagated without conflict
+        :return:
+        """
+        return self.conflict is None and len(self.queue) == 0 and len(self.current_set_literals) >= self.literal_counter
+
+    def value(self, literal: int) -> Optional[bool]:
+        """
+        Truth value of a (signed) literal under the current assignment, None if unassigned
+
+        :param literal:
+        :return:
+        """
+        truth_value = self.current_set_literals.get(abs(literal), None)
+        if truth_value is None:
+            return None
+        return truth_value == (literal > 0)
+
+    def simplify(self, set_literals, use_dependency_graph) -> Tuple[bool, int]:
+        """
+        propagates all queued literals, reports the variable of the violated clause on conflict
+        """
+
+        start = len(self.assigned)
+        conflict = self.propagate()
+
+        set_literals.extend(abs(literal) for literal in self.assigned[start:])
+
+        if conflict is not None:
+            return False, abs(conflict.first())
+
+        return True, 0
+
+    def simplify_unit_clauses(self, set_literals, use_dependency_graph) -> Tuple[bool, int]:
+        return self.simplify(set_literals, use_dependency_graph)
+
+    def simplify_pure_literal(self, set_literals, use_dependency_graph) -> Tuple[bool, int]:
+        """
+        pure literals are not tracked with watched literals
+        """
+        return True, 0
+
+    def simplify_tautology(self):
+        """
+        tautologies are never watched, so they only have to be dropped from the clauses
+        :return:
+        """
+
+        for clause in list(self.clauses.values()):
+            if clause.id not in self.watched_literals and any((-literal) in clause.literals for literal in clause.literals):
+                del self.clauses[clause.id]
+
+    def set_literal(self, literal: int, truth_value: bool, split=False, dependency_graph=False) -> Tuple[bool, int]:
+        """
+        Set a literal and its boolean value, the consequences are propagated by simplify
+        :param literal:
+        :param truth_value:
+        """
+
+        abs_literal = abs(literal)
+
+        previous = self.current_set_literals.get(abs_literal, None)
+        if previous is not None:
+            return previous == truth_value, abs_literal
+
+        self.assign(abs_literal if truth_value else -abs_literal)
+
+        return True, abs_literal
+
+    def assign(self, literal: int, reason: Optional[int] = None):
+        """
+        Makes a (signed) literal true and queues it for propagation
+
+        :param literal:
+        :param reason: id of the clause that implied the literal, None for decisions
+        :return:
+        """
+
+        abs_literal = abs(literal)
+        self.current_set_literals[abs_literal] = literal > 0
+        self.reasons[abs_literal] = reason
+        self.levels[abs_literal] = len(self.trail_limits)
+        self.record((ASSIGNMENT, abs_literal, None))
+        self.assigned.append(literal)
+        self.queue.append(literal)
+
+    def propagate(self) -> Optional[Clause]:
+        """
+        Unit propagation over the watches of all queued literals
+
+        :return: the violated clause, None if there is no conflict
+        """
+
+        if self.conflict is not None:
+            return self.conflict
+
+        watches = self.watches
+        watched_literals = self.watched_literals
+        assignment = self.current_set_literals
+
+        while self.queue:
+            false_literal = -self.queue.popleft()
+            self.propagations += 1
+
+            watch_list = watches[false_literal]
+            kept = []
+
+            for index, clause_id in enumerate(watch_list):
+                literals = watched_literals[clause_id]
+
+                # make sure the false literal is the second watch
+                if literals[0] == false_literal:
+                    literals[0] = literals[1]
+                    literals[1] = false_literal
+
+                # satisfied by the other watch
+                other = literals[0]
+                other_value = assignment.get(abs(other), None)
+                if other_value is not None and other_value == (other > 0):
+                    kept.append(clause_id)
+                    continue
+
+                # look for a new literal to watch
+                for position in range(2, len(literals)):
+                    candidate = literals[position]
+                    candidate_value = assignment.get(abs(candidate), None)
+                    if candidate_value is None or candidate_value == (candidate > 0):
+                        literals[1] = candidate
+                        literals[position] = false_literal
+                        watches[candidate].append(clause_id)
+                        break
+                else:
+                    kept.append(clause_id)
+
+                    if other_value is not None:
+                        # conflict
+                        kept.extend(watch_list[index + 1:])
+                        watches[false_literal] = kept
+                        self.queue.clear()
+                        self.conflict = self.clauses[clause_id]
+                        return self.conflict
+
+                    # unit
+                    self.assign(other, clause_id)
+
+            watches[false_literal] = kept
+
+        return None
+
+    def attach_clause(self, clause: Clause) -> bool:
+        """
+        Starts watching a clause, watches go to literals that are not false.
+        Unit clauses are assigned right away.
+
+        :param clause:
+        :return: False if the clause is violated by the current assignment
+        """
+
+        literals = list(clause.literals)
+
+        # tautologies are always satisfied
+        if not clause.literals.isdisjoint([-literal for literal in literals]):
+            return True
+
+        # common case (for instance while loading): the first two literals are unassigned and can be watched as they are
+        assignment = self.current_set_literals
+        if len(literals) > 1 and abs(literals[0]) not in assignment and abs(literals[1]) not in assignment:
+            self.watched_literals[clause.id] = literals
+            self.watches[literals[0]].append(clause.id)
+            self.watches[literals[1]].append(clause.id)
+            return True
+
+        # literals that are not false go first, then false literals from the highest decision level down
+        literals.sort(key=lambda literal: (self.value(literal) is False, -self.levels.get(abs(literal), 0)))
+
+        if len(literals) == 0 or self.value(literals[0]) is False:
+            return False
+
+        if len(literals) == 1 or self.value(literals[1]) is False:
+            if self.value(literals[0]) is None:
+                self.assign(literals[0], clause.id)
+            if len(literals) == 1:
+                return True
+
+        self.watched_literals[clause.id] = literals
+        self.watches[literals[0]].append(clause.id)
+        self.watches[literals[1]].append(clause.id)
+        return True
+
+    def add_clause(self, clause: Clause):
+        """
+        Adds a clause to KB, clauses are never removed again
+
+        :param clause:
+        :return:
+        """
+
+        if clause.id in self.clauses:
+            raise Exception("Clause id not unique")
+
+        clause = Clause(clause.id, clause.literals)
+        self.register_clause(clause)
+
+        return self.attach_clause(clause)
+
+    def register_clause(self, clause: Clause):
+        """
+        Stores a clause and its bookkeeping
+
+        :param clause:
+        :return:
+        """
+
+        self.clauses[clause.id] = clause
+        for literal in clause.literals:
+            self.bookkeeping[abs(literal)].add(clause.id)
+        self.clause_counter += 1
+
+    def learn(self, id: int, literals: List[int]) -> Clause:
+        """
+        Adds a learned clause right after backjumping to its asserting level:
+        the first literal is unassigned and gets implied by the clause, the second one is false on the highest level
+
+        :param id:
+        :param literals: output of analyze
+        :return:
+        """
+
+        clause = Clause(id, literals)
+        self.register_clause(clause)
+
+        if len(literals) > 1:
+            self.watched_literals[id] = list(literals)
+            self.watches[literals[0]].append(id)
+            self.watches[literals[1]].append(id)
+
+        self.assign(literals[0], id)
+
+        return clause
+
+    def detach_clause(self, clause: Clause):
+        """
+        Removes a clause from the watches, the clauses and the bookkeeping,
+        the clause may not be the reason of a current assignment
+
+        :param clause:
+        :return:
+        """
+
+        literals = self.watched_literals.pop(clause.id, None)
+        if literals is not None:
+            self.watches[literals[0]].remove(clause.id)
+            self.watches[literals[1]].remove(clause.id)
+
+        del self.clauses[clause.id]
+        for literal in clause.literals:
+            self.bookkeeping[abs(literal)].discard(clause.id)
+
+    def locked(self, id: int) -> bool:
+        """
+        Whether a clause is the reason of a current assignment, the implied literal is always its first watch
+
+        :param id:
+        :return:
+        """
+
+        literals = self.watched_literals.get(id, None)
+        if literals is None:
+            return False
+
+        variable = abs(literals[0])
+        return variable in self.current_set_literals and self.reasons.get(variable, None) == id
+
+    def analyze(self, conflict: Clause) -> Tuple[List[int], int]:
+        """
+        First-UIP conflict analysis:
+        resolves the conflict clause with the reasons of the literals of the current decision level, in reverse
+        order of assignment, until only one literal of that level (the unique implication point) is left.
+        The result is minimized by dropping literals that are implied by the other literals of the clause.
+
+        :param conflict: violated clause, on a decision level above 0
+        :return: learned clause (asserting literal first, then the literal of the highest other level) and the level to backjump to
+        """
+
+        level = self.decision_level
+        levels = self.levels
+        seen = set()
+        learned = [0]
+        open_literals = 0
+        index = len(self.assigned) - 1
+        literal = None
+        clause_literals = conflict.literals
+        analyzed_clauses = [conflict.id]
+
+        while True:
+            for other in clause_literals:
+                variable = abs(other)
+                if variable in seen or (literal is not None and variable == abs(literal)) or levels[variable] == 0:
+                    continue
+                seen.add(variable)
+                if levels[variable] == level:
+                    open_literals += 1
+                else:
+                    learned.append(other)
+
+            # the most recently assigned literal that takes part in the conflict
+            while abs(self.assigned[index]) not in seen:
+                index -= 1
+            literal = self.assigned[index]
+            index -= 1
+            open_literals -= 1
+
+            if open_literals == 0:
+                break
+
+            reason = self.reasons[abs(literal)]
+            analyzed_clauses.append(reason)
+            clause_literals = self.clauses[reason].literals
+
+        learned[0] = -literal
+        self.analyzed = seen
+        self.analyzed_clauses = analyzed_clauses
+        learned = self.minimize(learned)
+
+        if len(learned) == 1:
+            return learned, 0
+
+        # watch the literal of the highest level besides the asserting one
+        highest = max(range(1, len(learned)), key=lambda position: levels[abs(learned[position])])
+        learned[1], learned[highest] = learned[highest], learned[1]
+
+        return learned, levels[abs(learned[1])]
+
+    def lbd(self, literals: List[int]) -> int:
+        """
+        Literal block distance: the number of different decision levels among the literals of a clause
+
+        :param literals:
+        :return:
+        """
+        return len({self.levels[abs(literal)] for literal in literals})
+
+    def minimize(self, learned: List[int]) -> List[int]:
+        """
+        Recursive learned clause minimization:
+        a literal can be dropped when every literal in its reason is either in the clause,
+        on level 0 or can be dropped itself.
+
+        :param learned:
+        :return:
+        """
+
+        in_clause = {abs(literal) for literal in learned}
+        redundant = {}
+
+        def is_redundant(variable):
+            stack = [variable]
+            visited = []
+            while stack:
+                current = stack.pop()
+                if current in redundant:
+                    continue
+                reason = self.reasons[current]
+                if reason is None:
+                    for other in visited:
+                        redundant[other] = False
+                    return False
+                visited.append(current)
+                redundant[current] = None
+                for other in self.clauses[reason].literals:
+                    other_variable = abs(other)
+                    if other_variable == current or other_variable in in_clause or self.levels[other_variable] == 0:
+                        continue
+                    if other_variable not in redundant:
+                        stack.append(other_variable)
+                    elif redundant[other_variable] is False:
+                        for visited_variable in visited:
+                            redundant[visited_variable] = False
+                        return False
+            for other in visited:
+                redundant[other] = True
+            return True
+
+        return [learned[0]] + [literal for literal in learned[1:] if not is_redundant(abs(literal))]
+
+    def backtrack(self, level: int):
+        """
+        Undoes all assignments made after decision level 'level' was reached, drops pending propagations
+
+        :param level:
+        :return:
+        """
+
+        if level >= self.decision_level:
+            return
+
+        self.queue.clear()
+        self.conflict = None
+        super().backtrack(level)
+
+    def undo(self, entry: Tuple):
+        """
+        Undoes a single entry of the trail, only assignments are recorded
+
+        :param entry:
+        :return:
+        """
+        self.assigned.pop()
+        self.phases[entry[1]] = self.current_set_literals[entry[1]]
+        super().undo(entry)
+
+        if self.variable_order is not None:
+            self.variable_order.insert(entry[1])
+
+    def split_statistics(self, runtime) -> Split:
+        return Split(self.literal_counter - len(self.current_set_literals), len(self.clauses), runtime)
+
+    def nr_of_binary_clauses(self):
+        return sum((1 for literals in self.watched_literals.values() if len(literals) == 2))
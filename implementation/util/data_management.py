@@ -6,21 +6,41 @@ except ImportError:
 from implementation.solver.knowledge_base import KnowledgeBase
 from implementation.model.dependency_graph import DependencyGraph
 from collections import defaultdict
-from typing import Dict, Tuple
+from typing import Dict, Iterator, List, Tuple, Union
 from implementation.model.clause import Clause
+from implementation.model.clause_store import ClauseStore
+from implementation.util.dimacs_parser import DimacsParser
 try:
     import numpy as np
 except ImportError:
     raise RuntimeError("Please install numpy")
+import hashlib
 import math
+import os
+import shutil
+import tempfile
+import timeit
+
+#### Constants
+CACHE_FORMAT = "clause-store-1"
+CACHE_ARRAYS = ["variables", "literals", "offsets", "occurrences", "occurrence_offsets"]
 
 class DataManager():
 
-    def __init__(self, directory):
+    def __init__(self, directory, cache_directory=None):
 
         # determines relative disk directory for saving/loading
         self.directory = directory
 
+        # compiled dimacs files, named after the hash of their contents
+        if (cache_directory is None):
+            self.cache_directory = os.path.join(directory, "cnf_cache")
+        else:
+            self.cache_directory = cache_directory
+
+        # hits, misses and load times (in seconds) of the compiled dimacs cache
+        self.cache_statistics = {"hits": 0, "misses": 0, "hit_times": [], "miss_times": []}
+
     def save_python_obj(self, obj, name):
         """ Saves python object to disk in pickle """
 
@@ -55,6 +75,11 @@ class DataManager():
         clauses_ = self.personal_deepcopy(base.clauses)
         set_literals_ = self.duplicate_dict(base.current_set_literals)
         bookkeeping_ = self.duplicate_default_dict(base.bookkeeping, self.duplicate_set, set)
+        polarity_counts_ = self.duplicate_default_dict(base.polarity_counts, int, int)
+        pure_candidates_ = self.duplicate_set(base.pure_candidates)
+        unit_candidates_ = self.duplicate_set(base.unit_candidates)
+        clause_lengths_ = self.duplicate_default_dict(base.clause_lengths, int, int)
+        literal_weights_ = self.duplicate_default_dict(base.literal_weights, int, int) if base.literal_weights is not None else None
 
         # dependency graph stuff
         if (use_dependency_graph):
@@ -64,13 +89,21 @@ class DataManager():
         else:
             dependency_graph_ = use_dependency_graph
 
-        return KnowledgeBase(clauses=clauses_,
-                             current_set_literals= set_literals_,
-                             bookkeeping=bookkeeping_,
-                             clause_counter= base.clause_counter,
-                             literal_counter= base.literal_counter,
-                             dependency_graph=dependency_graph_,
-                             timestep=step)
+        duplicate = KnowledgeBase(clauses=clauses_,
+                                  current_set_literals= set_literals_,
+                                  bookkeeping=bookkeeping_,
+                                  clause_counter= base.clause_counter,
+                                  literal_counter= base.literal_counter,
+                                  dependency_graph=dependency_graph_,
+                                  timestep=step,
+                                  polarity_counts=polarity_counts_,
+                                  pure_candidates=pure_candidates_,
+                                  unit_candidates=unit_candidates_,
+                                  clause_lengths=clause_lengths_,
+                                  literal_weights=literal_weights_)
+        duplicate.propagations = base.propagations
+
+        return duplicate
 
 
 
@@ -119,46 +152,129 @@ class DataManager():
 
         return "".join(file)
 
-    def read_rules_string(self, rules_str: str, id: int) -> Tuple[Dict[int, Clause], int]:
+    def read_rules_string(self, rules_str: str, id: int, clause_store=False) -> Tuple[Union[Dict[int, Clause], ClauseStore], int]:
         """
         Read rules from dimacs string into datastructure
 
         :param rules_str:
         :param id:
+        :param clause_store: return a flat ClauseStore instead of a dictionary of clauses
         :return:
         """
 
-        # TODO: error on file nt found
-        clauses = {}
-        for line in rules_str.split("\t"):
-            tokens = line.split(' ')
-            if tokens[-1] != '0\n':
-                continue
+        return self.collect_clauses(DimacsParser().parse_string(rules_str), id, clause_store)
 
-            literals = [int(token) for token in tokens[0:-1]]
+    def read_rules_dimacs(self, rules_path: str, id: int, clause_store=False) -> Tuple[Union[Dict[int, Clause], ClauseStore], int]:
+        """
+        reads dimacs rules from file into datastructure, the file is streamed through the DimacsParser
 
-            clauses[id] = Clause(id, literals)
-            id += 1
+        :param rules_path:
+        :param id:
+        :param clause_store: return a flat ClauseStore instead of a dictionary of clauses
+        :return:
+        """
 
-        return clauses, id
+        if (clause_store):
+            store = ClauseStore.build_flat(DimacsParser().parse_file_flat(rules_path), first_id=id)
+            return store, id + len(store)
+
+        return self.collect_clauses(DimacsParser().parse_file(rules_path), id, clause_store)
 
-    def read_rules_dimacs(self, rules_path: str, id: int) -> Tuple[Dict[int, Clause], int]:
+    def read_compiled_dimacs(self, rules_path: str, id: int, clause_store=True) -> Tuple[Union[Dict[int, Clause], ClauseStore], int]:
         """
-        reads dimacs rules from file into string, then transfers to datastructure with read_rules_string function
+        Reads a dimacs file through the cache of compiled files:
+        on a miss the file is parsed once and its clause store is saved as .npy arrays in a directory named after
+        the hash of the file contents, on a hit those arrays are memory mapped instead of parsing the text again
 
         :param rules_path:
         :param id:
+        :param clause_store: return the (memory mapped) ClauseStore instead of a dictionary of clauses
+        :return:
+        """
+
+        start = timeit.default_timer()
+
+        with open(rules_path, "rb") as f:
+            key = hashlib.sha1(f.read()).hexdigest()
+        compiled_path = os.path.join(self.cache_directory, f"{key}-{CACHE_FORMAT}")
+
+        hit = os.path.isdir(compiled_path)
+        if (hit):
+            arrays = [np.load(os.path.join(compiled_path, name + ".npy"), mmap_mode="r") for name in CACHE_ARRAYS]
+            store = ClauseStore(arrays[0], arrays[1], arrays[2], np.arange(id, id + len(arrays[2]) - 1, dtype=np.int32), occurrences=arrays[3], occurrence_offsets=arrays[4])
+        else:
+            store, _ = self.read_rules_dimacs(rules_path, id, clause_store=True)
+            self.compile_clause_store(store, compiled_path)
+
+        elapsed = timeit.default_timer() - start
+        kind = "hit" if hit else "miss"
+        self.cache_statistics["hits" if hit else "misses"] += 1
+        self.cache_statistics[kind + "_times"].append(elapsed)
+        print(f"Cache {kind} for {os.path.basename(rules_path)}: loaded in {1000 * elapsed:.1f} ms")
+
+        if (clause_store):
+            return store, id + len(store)
+
+        return store.to_clauses(), id + len(store)
+
+    def compile_clause_store(self, store: ClauseStore, compiled_path: str):
+        """
+        Saves the arrays of a clause store as .npy files in a new directory,
+        written next to it first and then renamed, so a reader never sees a half written directory
+
+        :param store:
+        :param compiled_path:
+        :return:
+        """
+
+        os.makedirs(self.cache_directory, exist_ok=True)
+        temporary_path = tempfile.mkdtemp(dir=self.cache_directory)
+
+        for name in CACHE_ARRAYS:
+            np.save(os.path.join(temporary_path, name + ".npy"), getattr(store, name))
+
+        try:
+            os.rename(temporary_path, compiled_path)
+        except OSError:
+            # compiled by someone else in the mean time
+            shutil.rmtree(temporary_path, ignore_errors=True)
+
+    def cache_report(self) -> str:
+        """
+        Summary of the hits, misses and load times of the compiled dimacs cache
+
+        :return:
+        """
+
+        statistics = self.cache_statistics
+        report = [f"cache hits: {statistics['hits']}, misses: {statistics['misses']}"]
+        for kind in ["hit", "miss"]:
+            times = statistics[kind + "_times"]
+            if (len(times) > 0):
+                report.append(f"mean {kind} load time: {1000 * sum(times) / len(times):.1f} ms")
+
+        return ", ".join(report)
+
+    def collect_clauses(self, parsed_clauses: Iterator[List[int]], id: int, clause_store: bool) -> Tuple[Union[Dict[int, Clause], ClauseStore], int]:
+        """
+        Stores parsed clauses with consecutive ids starting at id
+
+        :param parsed_clauses:
+        :param id:
+        :param clause_store: stream the clauses straight into a flat ClauseStore instead of a dictionary of clauses
         :return:
         """
 
-        # TODO: error on file nt found
-        with open(rules_path) as f:
-            stringbuilder = "{}"
+        if (clause_store):
+            store = ClauseStore.build(parsed_clauses, first_id=id)
+            return store, id + len(store)
 
-            for line in f:
-                stringbuilder = stringbuilder.format(line + "\t{}")
+        clauses = {}
+        for literals in parsed_clauses:
+            clauses[id] = Clause(id, literals)
+            id += 1
 
-        return self.read_rules_string(stringbuilder.replace("\n{}", ""), id)
+        return clauses, id
 
     def read_text_sudoku(self, puzzle_path: str, puzzle_number: int, id: int) -> Tuple[Dict[int, Clause], bool, int]:
         """
@@ -175,39 +291,81 @@ class DataManager():
 
                 if (i == puzzle_number):
 
-                    # print(line)
+                    clauses, id = self.parse_text_sudoku(line, id)
 
-                    line = line.replace("\n", "")
+                    return clauses, True, id
 
-                    template = np.zeros((len(line), 1))
+        return None, False, id
 
-                    for j, letter in enumerate(line):
+    def read_text_sudokus(self, puzzle_path: str) -> Iterator[Tuple[int, str]]:
+        """
+        Yields every one-liner sudoku in a file with its puzzle number, in one pass over the file
 
-                        if (not letter == "."):
+        :param puzzle_path:
+        :return:
+        """
 
-                            try:
+        with open(puzzle_path) as f:
+            for i, line in enumerate(f):
+                line = line.strip()
+                if (len(line) > 0):
+                    yield i, line
 
-                                template[j, 0] = int(letter)
+    def parse_text_sudoku(self, line: str, id: int) -> Tuple[Dict[int, Clause], int]:
+        """
+        Turns one-liner sudoku into unit clauses for the givens
 
-                            except ValueError:
+        :param line:
+        :param id:
+        :return:
+        """
 
-                                continue
+        # print(line)
 
-                    template = template.reshape((int(math.sqrt(len(line))), int(math.sqrt(len(line)))))
+        line = line.replace("\n", "")
 
-                    # print(template)
+        template = np.zeros((len(line), 1))
 
-                    output = "{}"
+        for j, letter in enumerate(line):
 
-                    for y in range(len(template)):
+            if (not letter == "."):
 
-                        for x in range(len(template)):
+                try:
 
-                            if (not template[y, x] == 0):
-                                output = output.format(str(x + 1) + str(y + 1) + str(int(template[y, x])) + " 0\n\t{}")
+                    template[j, 0] = int(letter)
 
-                    returnvalues = self.read_rules_string(output.replace("\n{}", ""), id)
+                except ValueError:
 
-                    return returnvalues[0], True, returnvalues[1]
+                    continue
 
-        return None, False, id
+        template = template.reshape((int(math.sqrt(len(line))), int(math.sqrt(len(line)))))
+
+        # print(template)
+
+        output = []
+
+        for y in range(len(template)):
+
+            for x in range(len(template)):
+
+                if (not template[y, x] == 0):
+                    output.append(str(x + 1) + str(y + 1) + str(int(template[y, x])) + " 0")
+
+        return self.read_rules_string("\n".join(output), id)
+
+    def to_text_sudoku(self, knowledge_base: KnowledgeBase, size=9) -> str:
+        """
+        Transfers the true literals of a solved sudoku back to a one-liner sudoku
+
+        :param knowledge_base:
+        :param size:
+        :return:
+        """
+
+        line = ["."] * (size * size)
+        for literal, truth_value in knowledge_base.current_set_literals.items():
+            if (truth_value):
+                x, y, value = str(literal)
+                line[(int(y) - 1) * size + int(x) - 1] = value
+
+        return "".join(line)
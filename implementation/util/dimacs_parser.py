@@ -0,0 +1,283 @@
+import io
+import re
+from typing import BinaryIO, Iterator, List, Optional
+
+from implementation.model.exception_implementations import DimacsFormatException
+
+#### Constants
+CHUNK_SIZE = 1 << 20
+COMMENT = re.compile(rb"^[ \t]*c[^\n]*", re.MULTILINE)
+SPECIAL_LINE = re.compile(rb"^[ \t]*([p%])[^\n]*", re.MULTILINE)
+
+
+class DimacsParser:
+    """
+    Streaming parser for DIMACS cnf
+
+    reads its input in large chunks and yields every clause (a list of literals) as soon as its terminating 0 is read,
+    so the work and the memory of the parser itself are linear in the size of the input and nothing is built
+    up besides the clauses the caller keeps.
+
+    handles comment lines ('c'), the 'p cnf <variables> <clauses>' header, clauses spread over several lines,
+    several clauses on one line, a last clause without terminating 0 and the '%' end marker of SATLIB files.
+
+    the header is optional (the sudoku givens do not have one), but when it is there it has to come before the
+    first clause, literals may not exceed the number of variables it declares and the number of clauses is checked
+    at the end: a different number of clauses only gives a warning, since plenty of files (including the
+    sudoku rules) get it wrong.
+
+    """
+
+    variables: Optional[int]
+    expected_clauses: Optional[int]
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+
+        self.chunk_size = chunk_size
+
+        # declared in the header, None if there is no header
+        self.variables = None
+        self.expected_clauses = None
+
+        # progress
+        self.parsed_clauses = 0
+        self.line = 0
+
+        # literals of a clause that is continued on the next line or chunk
+        self.pending = []
+
+        # whether any literal was read so far
+        self.read_literals = False
+
+        # set by the '%' end marker, the rest of the input is ignored
+        self.finished = False
+
+    def parse_file(self, path: str) -> Iterator[List[int]]:
+        """
+        Yields the clauses of a dimacs file
+
+        :param path:
+        :return:
+        """
+
+        with open(path, "rb") as stream:
+            yield from self.parse_stream(stream)
+
+    def parse_file_flat(self, path: str) -> Iterator[List[int]]:
+        """
+        Yields the literals of a dimacs file in flat lists with a 0 after every clause, one list per chunk
+
+        :param path:
+        :return:
+        """
+
+        with open(path, "rb") as stream:
+            yield from self.parse_stream_flat(stream)
+
+    def parse_string(self, dimacs: str) -> Iterator[List[int]]:
+        """
+        Yields the clauses of a dimacs string
+
+        :param dimacs:
+        :return:
+        """
+
+        yield from self.parse_stream(io.BytesIO(dimacs.encode()))
+
+    def parse_stream(self, stream: BinaryIO) -> Iterator[List[int]]:
+        """
+        Yields the clauses of a binary stream
+
+        :param stream:
+        :return:
+        """
+
+        for literals in self.read_chunks(stream):
+            clause = self.pending
+            for literal in literals:
+                if literal == 0:
+                    yield self.emit(clause)
+                    clause = []
+                else:
+                    clause.append(literal)
+            self.pending = clause
+
+        # a last clause without terminating 0
+        if self.pending:
+            yield self.emit(self.pending)
+            self.pending = []
+
+        self.validate()
+
+    def parse_stream_flat(self, stream: BinaryIO) -> Iterator[List[int]]:
+        """
+        Yields the literals of a binary stream in flat lists with a 0 after every clause, one list per chunk,
+        so that a caller can process whole chunks at once instead of clause by clause
+
+        :param stream:
+        :return:
+        """
+
+        last = 0
+        for literals in self.read_chunks(stream):
+            self.parsed_clauses += literals.count(0)
+            last = literals[-1]
+            yield literals
+
+        # a last clause without terminating 0
+        if last != 0:
+            self.parsed_clauses += 1
+            yield [0]
+
+        self.validate()
+
+    def read_chunks(self, stream: BinaryIO) -> Iterator[List[int]]:
+        """
+        Reads a binary stream in chunks that are cut at the last line break and yields the literals of every chunk
+
+        :param stream:
+        :return:
+        """
+
+        remainder = b""
+        while not self.finished:
+            chunk = stream.read(self.chunk_size)
+            if not chunk:
+                break
+
+            end = chunk.rfind(b"\n")
+            if end < 0:
+                # no line break in this chunk, the line continues in the next one
+                remainder += chunk
+                continue
+
+            literals = self.parse_chunk(remainder + chunk[:end + 1])
+            remainder = chunk[end + 1:]
+            if literals:
+                yield literals
+
+        if remainder and not self.finished:
+            literals = self.parse_chunk(remainder)
+            if literals:
+                yield literals
+
+    def parse_chunk(self, data: bytes) -> List[int]:
+        """
+        Literals (and clause terminating zeros) in a chunk of whole lines
+
+        :param data:
+        :return:
+        """
+
+        first_line = self.line + 1
+        self.line += data.count(b"\n")
+
+        # the header and the end marker are the only lines that need to be looked at on their own
+        if b"p" not in data and b"%" not in data:
+            tokens = self.tokenize(data)
+        else:
+            tokens = []
+            position = 0
+            for match in SPECIAL_LINE.finditer(data):
+                tokens.extend(self.tokenize(data[position:match.start()]))
+                position = match.end()
+                if match.group(1) == b"%":
+                    self.finished = True
+                    break
+                number = first_line + data.count(b"\n", 0, match.start())
+                self.parse_header(match.group(0), number, after_literals=len(tokens) > 0 or self.read_literals)
+
+            if not self.finished:
+                tokens.extend(self.tokenize(data[position:]))
+
+        try:
+            literals = list(map(int, tokens))
+        except ValueError:
+            raise DimacsFormatException("Invalid literal", self.locate(data, first_line, self.is_integer))
+
+        if not literals:
+            return literals
+
+        self.read_literals = True
+        if self.variables is not None and max(max(literals), -min(literals)) > self.variables:
+            raise DimacsFormatException(f"Literal exceeds the {self.variables} variables declared in the header",
+                                        self.locate(data, first_line, lambda token: abs(int(token)) <= self.variables))
+
+        return literals
+
+    @staticmethod
+    def tokenize(data: bytes) -> List[bytes]:
+        """ tokens of a piece of dimacs without header, comment lines are dropped """
+        if b"c" in data:
+            data = COMMENT.sub(b"", data)
+        return data.split()
+
+    def emit(self, clause: List[int]) -> List[int]:
+        self.parsed_clauses += 1
+        return clause
+
+    def parse_header(self, line: bytes, number: int, after_literals=False):
+        """
+        Reads the 'p cnf <variables> <clauses>' line
+
+        :param line:
+        :param number: line number, for errors
+        :param after_literals: whether literals came before the header
+        :return:
+        """
+
+        if self.variables is not None:
+            raise DimacsFormatException("Duplicate header", number)
+        if after_literals:
+            raise DimacsFormatException("Header after the first clause", number)
+
+        tokens = line.split()
+        if len(tokens) != 4 or tokens[1] != b"cnf":
+            raise DimacsFormatException("Header should be 'p cnf <variables> <clauses>'", number)
+
+        try:
+            self.variables, self.expected_clauses = int(tokens[2]), int(tokens[3])
+        except ValueError:
+            raise DimacsFormatException("Header should be 'p cnf <variables> <clauses>'", number)
+
+        if self.variables < 0 or self.expected_clauses < 0:
+            raise DimacsFormatException("Negative count in header", number)
+
+    def validate(self):
+        """
+        Compares the number of clauses read with the header
+
+        :return:
+        """
+
+        if self.expected_clauses is not None and self.parsed_clauses != self.expected_clauses:
+            print(f"Warning: header declares {self.expected_clauses} clauses, read {self.parsed_clauses}")
+
+    @staticmethod
+    def is_integer(token: bytes) -> bool:
+        try:
+            int(token)
+            return True
+        except ValueError:
+            return False
+
+    @staticmethod
+    def locate(data: bytes, first_line: int, valid) -> int:
+        """
+        Line number of the first line in a chunk with a token that is not valid,
+        only used to report errors so it may be slow
+
+        :param data:
+        :param first_line:
+        :param valid: function telling whether a (integer) token is valid
+        :return:
+        """
+
+        for number, line in enumerate(data.split(b"\n"), first_line):
+            line = line.strip()
+            if not line or line[:1] in (b"c", b"p", b"%"):
+                continue
+            if not all(valid(token) for token in line.split()):
+                return number
+
+        return first_line
@@ -0,0 +1,151 @@
+import json
+import timeit
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from implementation.solver.knowledge_base import KnowledgeBase
+from implementation.solver.solver_cdcl_dpll import CDCL_DPLL_Solver
+from implementation.solver.solver_lookahead import LookAHeadSolver
+from implementation.solver.watched_knowledge_base import WatchedKnowledgeBase
+from implementation.util.data_management import DataManager
+
+#### Constants
+# methods that make up every phase of the search
+PHASES = {
+    "propagation": [(KnowledgeBase, "simplify_unit_clauses"), (WatchedKnowledgeBase, "propagate")],
+    "pure_literals": [(KnowledgeBase, "simplify_pure_literal")],
+    "duplication": [(DataManager, "duplicate_knowledge_base"), (DataManager, "personal_deepcopy")],
+    "split_selection": [(LookAHeadSolver, "look_ahead"), (CDCL_DPLL_Solver, "choose_literal")],
+    "conflict_analysis": [(WatchedKnowledgeBase, "analyze")],
+    "look_ahead_probes": [(LookAHeadSolver, "probe")],
+}
+
+
+class PhaseProfiler:
+    """
+    Counts the calls and measures the time of every phase of the search
+
+    enabling the profiler wraps the methods of the phases on their classes, disabling it puts the originals back,
+    so the solvers do not pay anything when it is off. Calls of a phase inside a call of the same phase
+    (a double look probing inside a probe) are counted but not timed again, phases that run inside another
+    phase (propagation inside a probe) are timed in both.
+
+    """
+
+    calls: Dict[str, int]
+    seconds: Dict[str, float]
+    originals: List[Tuple[type, str, object]]
+
+    def __init__(self, phases: Dict[str, List[Tuple[type, str]]] = None):
+
+        self.phases = PHASES if phases is None else phases
+
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+        # phases with a call that is being timed
+        self.active = set()
+
+        # wrapped methods, to restore them
+        self.originals = []
+
+        self.start = None
+        self.stop = None
+
+    def enable(self):
+        """
+        Wraps the methods of all phases
+
+        :return:
+        """
+
+        if self.originals:
+            return
+
+        for phase, methods in self.phases.items():
+            for cls, name in methods:
+                original = cls.__dict__[name]
+                self.originals.append((cls, name, original))
+                setattr(cls, name, self.wrap(phase, original))
+
+        self.start = timeit.default_timer()
+
+    def disable(self):
+        """
+        Restores the original methods
+
+        :return:
+        """
+
+        for cls, name, original in reversed(self.originals):
+            setattr(cls, name, original)
+        self.originals = []
+
+        self.stop = timeit.default_timer()
+
+    def wrap(self, phase: str, function):
+        """
+        Method that counts and times the calls of a function for a phase
+
+        :param phase:
+        :param function:
+        :return:
+        """
+
+        calls = self.calls
+        seconds = self.seconds
+        active = self.active
+
+        def timed(*args, **kwargs):
+            calls[phase] += 1
+            if phase in active:
+                return function(*args, **kwargs)
+
+            active.add(phase)
+            start = timeit.default_timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds[phase] += timeit.default_timer() - start
+                active.discard(phase)
+
+        timed.__name__ = function.__name__
+        timed.__doc__ = function.__doc__
+        return timed
+
+    def summary(self) -> Dict:
+        """
+        Calls and seconds per phase and the time the profiler was on
+
+        :return:
+        """
+
+        stop = self.stop if self.stop is not None else timeit.default_timer()
+
+        return {
+            "wall_time": stop - self.start if self.start is not None else 0.0,
+            "phases": {phase: {"calls": self.calls[phase], "seconds": round(self.seconds[phase], 6)} for phase in self.phases},
+        }
+
+    def write(self, path: str):
+        """
+        Writes the summary as json
+
+        :param path:
+        :return:
+        """
+
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def report(self):
+        """
+        Prints the summary, one line per phase
+
+        :return:
+        """
+
+        summary = self.summary()
+        print(f"\nProfile ({summary['wall_time']:.3f}s):")
+        for phase, values in summary["phases"].items():
+            print(f"  {phase}: {values['calls']} calls, {values['seconds']:.3f}s")
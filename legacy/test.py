@@ -1,7 +1,30 @@
+import io
+import collections
+import itertools
+import json
+import os
+import random
+import tempfile
 from implementation.model.clause import Clause
+from implementation.model.clause_store import ClauseStore
+from implementation.model.learned_clause_database import LearnedClauseDatabase
+from implementation.model.implication_graph import BinaryImplicationGraph
+from implementation.model.preselection_index import PreselectionIndex
+from implementation.model.exception_implementations import DimacsFormatException
+from implementation.util.dimacs_parser import DimacsParser
+from implementation.util.data_management import DataManager
+from implementation.util.profiler import PhaseProfiler
+from implementation.model.variable_heap import VariableHeap
 from implementation.solver.knowledge_base import KnowledgeBase
 from implementation.solver.solver_cdcl_dpll import CDCL_DPLL_Solver
-from main import get_settings
+from implementation.solver.watched_knowledge_base import WatchedKnowledgeBase
+from implementation.solver.restart_policy import LubyRestarts
+from implementation.solver.preprocessor import Preprocessor
+from implementation.solver.budget import Budget
+from implementation.solver.solver_lookahead import LookAHeadSolver
+from benchmarks.knowledge_base_benchmark import measure, mid_solve_state, operations
+from benchmarks.solver_benchmark import INSTANCE_SETS, compare, run, summarize
+from main import RESOURCE_BUDGET, get_settings, get_solver, init_batch_worker, solve_text_sudoku, solve_portfolio_configuration, PORTFOLIO_CONFIGURATIONS
 
 def test_solver_tautology():
     clauses = {1: Clause(1, [1, 2, 3, -1])}
@@ -51,4 +74,480 @@ def test_solver_case5():
     res, solved, _ = s.solve_instance()
     print(res.current_set_literals)
 
+def test_conflict_analysis():
+    ls = [[-1, 2], [-1, 3], [-2, -3, 4], [-4, 5], [-4, -5]]
+    clauses = {i: Clause(i, l) for i, l in enumerate(ls)}
+    kb = WatchedKnowledgeBase(clauses, clause_counter=len(clauses))
+
+    kb.new_decision_level()
+    kb.assign(1)
+    conflict = kb.propagate()
+    learned, level = kb.analyze(conflict)
+
+    assert learned == [-4]
+    assert level == 0
+
+def test_knowledge_base_trail():
+    ls = [[1, 4], [1, -3, -8], [1, 8, 12], [2, 11], [-7, -3, 9], [-7, 8, -9], [7, 8, -10], [7, 10, -12]]
+    clauses = {i: Clause(i, l) for i, l in enumerate(ls)}
+    kb = KnowledgeBase(clauses, clause_counter=len(clauses), dependency_graph=False, trail=True)
+    before = ({id: set(clause.literals) for id, clause in kb.clauses.items()}, {var: set(ids) for var, ids in kb.bookkeeping.items()}, kb.clause_counter)
+
+    kb.new_decision_level()
+    kb.set_literal(1, False)
+    kb.simplify([], False)
+    kb.new_decision_level()
+    kb.set_literal(7, True)
+    kb.add_clause(Clause(len(ls), [-4, 3]))
+
+    # the clause length counts follow every change
+    lengths = collections.Counter(len(clause.literals) for clause in kb.clauses.values())
+    assert {length: count for length, count in kb.clause_lengths.items() if count} == lengths
+    kb.backtrack(0)
+
+    assert ({id: set(clause.literals) for id, clause in kb.clauses.items()}, {var: set(ids) for var, ids in kb.bookkeeping.items()}, kb.clause_counter) == before
+    assert kb.current_set_literals == {}
+    assert kb.decision_level == 0
+    assert kb.nr_of_binary_clauses() == 2
+
+def test_solver_trail():
+    ls = [[1,4], [1,-3,-8], [1,8,12], [2,11], [-7,-3,9], [-7,8,-9], [7,8,-10], [7,10,-12]]
+    for version in [1, 2, 3]:
+        clauses = {i: Clause(i, l) for i, l in enumerate(ls)}
+        res, solved, stats = get_solver(clauses, len(clauses), get_settings(version)).solve_instance()
+
+        assert solved is True
+        assert all(any(res.current_set_literals[abs(lit)] == (lit > 0) for lit in l) for l in ls)
+
+def test_watched_propagation():
+    ls = [[1, 2], [-2, 3], [-3, -1, 4], [-4, -2]]
+    clauses = {i: Clause(i, l) for i, l in enumerate(ls)}
+    kb = WatchedKnowledgeBase(clauses, clause_counter=len(clauses))
+
+    kb.new_decision_level()
+    kb.set_literal(1, False)
+    valid, _ = kb.simplify([], False)
+    assert valid is True
+    assert kb.current_set_literals == {1: False, 2: True, 3: True, 4: False}
+
+    kb.backtrack(0)
+    kb.new_decision_level()
+    kb.set_literal(2, True)
+    kb.set_literal(1, True)
+    valid, _ = kb.simplify([], False)
+    assert valid is False
+    assert kb.conflict.id in (2, 3)
+
+    kb.backtrack(0)
+    assert kb.current_set_literals == {} and kb.conflict is None
+
+def test_clause_store():
+    ls = [[1, 4], [1, -3, -8], [1, 8, 12], [2, 11], [-7, -3, 9], [-7, 8, -9], [7, 8, -10], [7, 10, -12]]
+    clauses = {i: Clause(i, l) for i, l in enumerate(ls)}
+    kb = KnowledgeBase(clauses, clause_counter=len(clauses), dependency_graph=False)
+    kb.set_literal(3, True)
+
+    store = kb.to_clause_store()
+    assert store.number_of_variables == 10
+    assert list(store.variables) == sorted(store.variables)
+    assert sorted(store.clause_literals(1)) == [-8, 1]
+
+    copy = KnowledgeBase.from_clause_store(store, dependency_graph=False)
+    assert {id: clause.literals for id, clause in copy.clauses.items()} == {id: clause.literals for id, clause in kb.clauses.items()}
+    assert copy.current_set_literals == {3: True}
+    assert store.digest() == ClauseStore.from_clauses(copy.clauses, copy.current_set_literals).digest()
+
+def test_variable_heap():
+    heap = VariableHeap([1, 2, 3, 4, 5])
+    heap.increase(3, 2.0)
+    heap.increase(5, 1.0)
+    heap.increase(1, 3.0)
+
+    assert heap.pop() == 1
+    assert heap.pop() == 3
+    heap.insert(1)
+    heap.increase(4, 5.0)
+    assert [heap.pop() for _ in range(len(heap))][:3] == [4, 1, 5]
+
+def test_luby_restarts():
+    assert [LubyRestarts.luby(i) for i in range(1, 16)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+
+    policy = LubyRestarts(unit=2)
+    restarts = []
+    for conflict in range(12):
+        if policy.on_conflict(3):
+            restarts.append(conflict)
+            policy.on_restart()
+    assert restarts == [1, 3, 7, 9, 11]
+
+def test_learned_clause_reduction():
+    kb = WatchedKnowledgeBase({1: Clause(1, [1, 2, 3]), 2: Clause(2, [-1, 2, 4])}, clause_counter=2)
+    database = LearnedClauseDatabase(budget=2)
+
+    kb.new_decision_level()
+    kb.assign(-2)
+    kb.new_decision_level()
+    kb.assign(-3)
+    kb.propagate()
+    kb.backtrack(1)
+
+    # clause 3 is the reason of 3, clause 5 is more active than clause 4
+    database.add(kb.learn(3, [3, 2]), 2)
+    for id, literals in [(4, [4, 2, 1]), (5, [-4, 2, 3])]:
+        clause = Clause(id, literals)
+        kb.register_clause(clause)
+        kb.attach_clause(clause)
+        database.add(clause, 3)
+    database.bump([5])
+
+    assert database.should_reduce()
+    removed = database.reduce(kb.locked)
+    for clause in removed:
+        kb.detach_clause(clause)
+
+    assert [clause.id for clause in removed] == [4]
+    assert kb.clauses[3] is database.clauses[3]
+    assert 4 not in kb.clauses and 4 not in kb.bookkeeping[1]
+    assert all(4 not in watch_list for watch_list in kb.watches.values())
+    assert database.budget == 302
+
+def test_pure_literal_counters():
+    clauses = {1: Clause(1, [1, 2]), 2: Clause(2, [-1, -2, 3]), 3: Clause(3, [-3, 2])}
+    kb = KnowledgeBase(clauses, clause_counter=3, dependency_graph=False, trail=True)
+    assert kb.simplify_pure_literal([], False) == (True, 0)
+    counts = {literal: count for literal, count in kb.polarity_counts.items() if count}
+
+    # setting 2 removes clauses 1 and 3, which leaves 1 only negative and 3 only positive
+    kb.new_decision_level()
+    kb.set_literal(2, True)
+    assert kb.polarity_counts[1] == 0 and kb.polarity_counts[-3] == 0
+
+    set_literals = []
+    assert kb.simplify_pure_literal(set_literals, False) == (True, 1)
+    assert kb.current_set_literals[2] and (kb.current_set_literals.get(1) is False or kb.current_set_literals.get(3) is True)
+    assert len(kb.clauses) == 0 and len(set_literals) == 1
+
+    kb.backtrack(0)
+    assert {literal: count for literal, count in kb.polarity_counts.items() if count} == counts
+    assert kb.simplify_pure_literal([], False) == (True, 0)
+
+def test_dimacs_parser():
+    dimacs = "c comment\np cnf 5 5\n1 -2\nc inside a clause\n 3 0 4 0 -5\n0\n1 -5"
+
+    # every chunk size cuts the lines somewhere else
+    for chunk_size in [1, 4, 1 << 20]:
+        assert list(DimacsParser(chunk_size=chunk_size).parse_string(dimacs)) == [[1, -2, 3], [4], [-5], [1, -5]]
+
+    store = ClauseStore.build_flat(DimacsParser().parse_stream_flat(io.BytesIO(dimacs.encode())), first_id=3)
+    assert {id: clause.literals for id, clause in store.to_clauses().items()} == {3: {1, -2, 3}, 4: {4}, 5: {-5}, 6: {1, -5}}
+
+    for invalid in ["p cnf 2 1\n1 3 0\n", "1 0\np cnf 2 1\n", "p cnf 2\n", "1 x 0\n"]:
+        try:
+            list(DimacsParser().parse_string(invalid))
+            assert False
+        except DimacsFormatException:
+            pass
+
+def test_compiled_dimacs_cache():
+    rules = os.path.join(os.path.dirname(__file__), "data", "sudokus", "uf20-01.cnf")
+
+    with tempfile.TemporaryDirectory() as directory:
+        data_manager = DataManager(directory + "/")
+        parsed, last_id = data_manager.read_rules_dimacs(rules, id=5)
+        compiled, compiled_last_id = data_manager.read_compiled_dimacs(rules, id=5, clause_store=False)
+        mapped, mapped_last_id = data_manager.read_compiled_dimacs(rules, id=5)
+
+        assert data_manager.cache_statistics["misses"] == 1 and data_manager.cache_statistics["hits"] == 1
+        assert last_id == compiled_last_id == mapped_last_id
+        assert {id: clause.literals for id, clause in compiled.items()} == {id: clause.literals for id, clause in parsed.items()}
+        assert {id: clause.literals for id, clause in mapped.to_clauses().items()} == {id: clause.literals for id, clause in parsed.items()}
+
+def test_batch_worker():
+    data = os.path.join(os.path.dirname(__file__), "data")
+    puzzle = next(DataManager("/tmp/").read_text_sudokus(os.path.join(data, "sudokus", "1000sudokus.txt")))
+
+    init_batch_worker(os.path.join(data, "sudoku-rules.txt"), get_settings(2))
+
+    puzzle_number, solution, solved, runtime = solve_text_sudoku(puzzle)
+
+    assert puzzle_number == 0 and solved
+    assert all(given == "." or given == value for given, value in zip(puzzle[1], solution))
+    rows = [solution[row * 9:(row + 1) * 9] for row in range(9)]
+    assert all(len(set(row)) == 9 for row in rows) and all(len(set(column)) == 9 for column in zip(*rows))
+
+def test_incremental_solving():
+    clauses = [Clause(1, [1, 2]), Clause(2, [-1, 3]), Clause(3, [-2, 3]), Clause(4, [-3, 4, 5])]
+    kb = WatchedKnowledgeBase({clause.id: clause for clause in clauses}, clause_counter=4)
+    s = CDCL_DPLL_Solver(kb, heuristics=get_settings(2))
+
+    state, solved, stats = s.solve()
+    assert solved and state.current_set_literals[3]
+
+    # 1 or 2 both imply 3
+    assert s.solve(assumptions=[-3])[1] is False
+
+    state, solved, stats = s.solve(assumptions=[-4, 1])
+    assert solved and state.current_set_literals[1] and not state.current_set_literals[4] and state.current_set_literals[5]
+
+    assert s.solve(assumptions=[-4, -5])[1] is False
+    assert s.solve(assumptions=[2, -1])[1] is True
+
+    try:
+        s.solve(assumptions=[6])
+        assert False
+    except Exception as e:
+        assert "not a variable" in str(e)
+
+def test_portfolio_configuration():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "small.cnf")
+        with open(path, "w") as f:
+            f.write("p cnf 3 4\n1 -2 0\n2 3 0\n-3 -1 0\n1 0\n")
+
+        for configuration in [(1, 0), (2, 1), (3, 0)]:
+            program_version, seed, dimacs, solved, statistics, runtime = solve_portfolio_configuration(path, configuration)
+            assert (program_version, seed) == configuration and solved
+            assert "2 0" in dimacs and "-3 0" in dimacs
+
+def test_portfolio_configurations_differ():
+    path = os.path.join(os.path.dirname(__file__), "data", "sudokus", "uf20-01.cnf")
+
+    # no two configurations of the portfolio are the same search
+    assert len(set(PORTFOLIO_CONFIGURATIONS)) == len(PORTFOLIO_CONFIGURATIONS)
+    assert len([configuration for configuration in PORTFOLIO_CONFIGURATIONS if configuration[0] == 3]) == 1
+
+    # the seed changes the search of version 2 as well as that of version 1
+    for program_version in [1, 2]:
+        searches = []
+        for seed in [0, 1]:
+            statistics = solve_portfolio_configuration(path, (program_version, seed))[4]
+            searches.append((statistics["decisions"], statistics["conflicts"]))
+        assert searches[0] != searches[1]
+
+def test_cubes():
+    path = os.path.join(os.path.dirname(__file__), "data", "sudokus", "uf20-01.cnf")
+
+    clauses, last_id = DataManager("/tmp/").read_rules_dimacs(path, id=0)
+    cubes = list(LookAHeadSolver(KnowledgeBase(clauses, clause_counter=last_id, trail=True)).cubes(depth=3))
+    assert len(cubes) > 1 and all(len(cube) <= 3 for cube in cubes)
+
+    # the cubes do not overlap and at least one of them holds a model
+    assert all(any(-literal in other for literal in cube) for cube, other in itertools.combinations(cubes, 2))
+    clauses, last_id = DataManager("/tmp/").read_rules_dimacs(path, id=0)
+    solver = CDCL_DPLL_Solver(WatchedKnowledgeBase(clauses, clause_counter=last_id), heuristics=get_settings(2))
+    assert any(solver.solve(assumptions=cube)[1] for cube in cubes)
+
+    # satisfiable random 4-SAT, the look ahead starts without binary or ternary clauses to preselect from
+    rng = random.Random(1)
+    ls = [[variable if rng.random() < 0.5 else -variable for variable in rng.sample(range(1, 13), 4)] for _ in range(40)]
+    cubes = list(LookAHeadSolver(KnowledgeBase({i: Clause(i, l) for i, l in enumerate(ls)}, clause_counter=len(ls), trail=True)).cubes(depth=3))
+    assert len(cubes) > 1 and all(len(cube) <= 3 for cube in cubes)
+    assert all(any(-literal in other for literal in cube) for cube, other in itertools.combinations(cubes, 2))
+    solver = CDCL_DPLL_Solver(WatchedKnowledgeBase({i: Clause(i, l) for i, l in enumerate(ls)}, clause_counter=len(ls)), heuristics=get_settings(2))
+    assert any(solver.solve(assumptions=cube)[1] for cube in cubes)
+
+def test_look_ahead_probe():
+    path = os.path.join(os.path.dirname(__file__), "data", "sudokus", "uf20-01.cnf")
+
+    clauses, last_id = DataManager("/tmp/").read_rules_dimacs(path, id=0)
+    state = KnowledgeBase(clauses, clause_counter=last_id, trail=True)
+    solver = LookAHeadSolver(state)
+    solver.split_statistics = []
+    state.new_decision_level()
+    clauses, last_id = DataManager("/tmp/").read_rules_dimacs(path, id=0)
+    copied = KnowledgeBase(clauses, clause_counter=last_id)
+
+    before = {id: set(clause.literals) for id, clause in state.clauses.items()}
+    variables = {abs(literal) for clause in state.clauses.values() for literal in clause.literals}
+    for literal, truth_value in itertools.product(variables, [True, False]):
+        # probing on the trail undoes itself and measures the same as probing on a copy
+        valid, heuristic, new_state = solver.probe(state, literal, truth_value)
+        assert new_state is None and state.decision_level == 1
+        copy_valid, copy_heuristic, _ = solver.probe(copied, literal, truth_value)
+        assert valid == copy_valid and abs(heuristic - copy_heuristic) < 1e-9
+
+    assert {id: set(clause.literals) for id, clause in state.clauses.items()} == before
+    assert len(state.unit_candidates) == 0
+
+def test_preselection_index():
+    ls = [[1, 2], [-1, 3], [1, -3], [2, 3, 4], [-2, -4], [4, 5, 6, 7]]
+    clauses = {i: Clause(i, l) for i, l in enumerate(ls)}
+    kb = KnowledgeBase(clauses, clause_counter=len(clauses), dependency_graph=False, trail=True)
+    kb.track_weights()
+    weights = dict(kb.literal_weights)
+    assert weights[1] == 10 and weights[-1] == 5 and weights[4] == 1 and weights.get(5, 0) == 0
+
+    index = PreselectionIndex(kb.literal_weights)
+    ranked = list(index.ranked())
+    assert ranked[0] == 1 and [index.score(variable) for variable in ranked] == sorted(map(index.score, ranked), reverse=True)
+
+    # weights follow the changes and only the changed variables are repaired
+    kb.reweighted.clear()
+    kb.new_decision_level()
+    kb.set_literal(1, False)
+    assert kb.literal_weights[2] == 1 and kb.reweighted >= {1, 2, 3}
+    index.refresh(kb.reweighted)
+    assert [index.score(variable) for variable in index.ranked()] == sorted(map(index.score, index.ranked()), reverse=True)
+
+    kb.backtrack(0)
+    assert {literal: weight for literal, weight in kb.literal_weights.items() if weight} == weights
+
+def test_parallel_look_ahead():
+    path = os.path.join(os.path.dirname(__file__), "data", "sudokus", "uf20-01.cnf")
+
+    clauses, last_id = DataManager("/tmp/").read_rules_dimacs(path, id=0)
+    original = {id: set(clause.literals) for id, clause in clauses.items()}
+    solver = LookAHeadSolver(KnowledgeBase(clauses, clause_counter=last_id, trail=True), workers=2)
+    solution, solved, _ = solver.solve_instance()
+
+    assert solved and solver.pool is None
+    assert all(any(solution.current_set_literals.get(abs(literal), None) == (literal > 0) for literal in literals) for literals in original.values())
+
+def test_look_ahead_stack():
+    # 5 pigeons do not fit in 4 holes
+    pigeons, holes = 5, 4
+    variable = lambda pigeon, hole: pigeon * holes + hole + 1
+    ls = [[variable(pigeon, hole) for hole in range(holes)] for pigeon in range(pigeons)]
+    ls += [[-variable(pigeon, hole), -variable(other, hole)] for hole in range(holes) for pigeon, other in itertools.combinations(range(pigeons), 2)]
+
+    for trail in [True, False]:
+        solver = LookAHeadSolver(KnowledgeBase({i: Clause(i, l) for i, l in enumerate(ls)}, clause_counter=len(ls), trail=trail))
+        try:
+            solved = solver.solve_instance()[1]
+        except Exception:
+            solved = False
+
+        # every branch was tried and the stack never held more than two branches per variable
+        assert not solved and len(solver.stack) == 0
+        assert 0 < solver.search_statistics["max_stack"] <= 2 * pigeons * holes
+
+def test_look_ahead_long_clauses():
+    # random 4-SAT, no variable occurs in a binary or ternary clause before the first decision
+    for seed in range(5):
+        rng = random.Random(seed)
+        ls = [[variable if rng.random() < 0.5 else -variable for variable in rng.sample(range(1, 13), 4)] for _ in range(rng.choice([40, 200]))]
+        satisfiable = any(all(any(assignment[abs(lit) - 1] == (lit > 0) for lit in l) for l in ls) for assignment in itertools.product([False, True], repeat=12))
+
+        for trail in [True, False]:
+            solver = LookAHeadSolver(KnowledgeBase({i: Clause(i, l) for i, l in enumerate(ls)}, clause_counter=len(ls), trail=trail))
+            try:
+                state, solved, _ = solver.solve_instance()
+            except Exception:
+                solved = False
+
+            assert solved == satisfiable
+            if solved:
+                assert all(any(state.current_set_literals.get(abs(lit)) == (lit > 0) for lit in l) for l in ls)
+
+def test_phase_profiler():
+    path = os.path.join(os.path.dirname(__file__), "data", "sudokus", "uf20-01.cnf")
+    original = KnowledgeBase.simplify_unit_clauses
+
+    profiler = PhaseProfiler()
+    profiler.enable()
+    clauses, last_id = DataManager("/tmp/").read_rules_dimacs(path, id=0)
+    assert LookAHeadSolver(KnowledgeBase(clauses, clause_counter=last_id, trail=True)).solve_instance()[1]
+    profiler.disable()
+
+    # the methods are restored and the nested phases are timed within their parents
+    assert KnowledgeBase.simplify_unit_clauses is original
+    phases = json.loads(json.dumps(profiler.summary()))["phases"]
+    assert phases["look_ahead_probes"]["calls"] > 0 and phases["propagation"]["calls"] > 0
+    assert phases["split_selection"]["seconds"] >= phases["look_ahead_probes"]["seconds"] > 0
+    assert phases["conflict_analysis"]["calls"] == 0
+
+def test_solver_benchmark():
+    name, path, puzzles = INSTANCE_SETS[2]
+    measurements = run((3, name, path, puzzles, 0))
+    assert measurements["solved"] == 1
+    assert measurements["propagations"] > 0 and measurements["peak_memory_mb"] > 0
+
+    # the gate fails on a real slowdown, not on a few milliseconds of noise
+    results = summarize([dict(measurements, wall_time=1.0), dict(measurements, version=2, wall_time=0.01)])
+    baseline = summarize([dict(measurements, wall_time=0.5), dict(measurements, version=2, wall_time=0.001)])
+    assert compare(results, baseline, 0.25) == [f"v3/{name}"]
+
+def test_knowledge_base_benchmark():
+    data = os.path.join(os.path.dirname(__file__), "data")
+    data_manager = DataManager("/tmp/")
+    rules, last_id = data_manager.read_rules_dimacs(os.path.join(data, "sudoku-rules.txt"), id=0)
+    givens, found, _ = data_manager.read_text_sudoku(os.path.join(data, "sudokus", "damnhard.sdk.txt"), 0, last_id)
+    rules.update(givens)
+    state = mid_solve_state(rules, random.Random(0))
+    before = ({id: set(clause.literals) for id, clause in state.clauses.items()}, dict(state.current_set_literals), dict(state.clause_lengths))
+
+    # every operation leaves the state as it found it
+    for name, prepare in operations(LookAHeadSolver(KnowledgeBase({}))).items():
+        assert measure([state], prepare, 2, trace=False) > 0
+        assert ({id: set(clause.literals) for id, clause in state.clauses.items()}, dict(state.current_set_literals), dict(state.clause_lengths)) == before
+
+def test_budget():
+    # 6 pigeons do not fit in 5 holes, which takes more than a few decisions and conflicts to find out
+    pigeons, holes = 6, 5
+    variable = lambda pigeon, hole: pigeon * holes + hole + 1
+    ls = [[variable(pigeon, hole) for hole in range(holes)] for pigeon in range(pigeons)]
+    ls += [[-variable(pigeon, hole), -variable(other, hole)] for hole in range(holes) for pigeon, other in itertools.combinations(range(pigeons), 2)]
+
+    for version, budget, resource in [(1, Budget(decisions=3), "decisions"), (2, Budget(conflicts=2), "conflicts"), (3, Budget(propagations=10), "propagations")]:
+        settings = get_settings(version)
+        settings[RESOURCE_BUDGET] = budget
+        solver = get_solver({i: Clause(i, l) for i, l in enumerate(ls)}, len(ls), settings)
+        state, solved, stats = solver.solve_instance()
+
+        assert solved is None and solver.search_statistics["budget_exhausted"] == resource
+        assert solver.search_statistics["propagations"] > 0
+
+    # an incremental solver gets the whole budget again on every call
+    solver = CDCL_DPLL_Solver(WatchedKnowledgeBase({i: Clause(i, l) for i, l in enumerate(ls)}, clause_counter=len(ls)), heuristics=get_settings(2))
+    solver.budget = Budget(decisions=1)
+    assert solver.solve()[1] is None
+    assert solver.solve(assumptions=[variable(0, 0)])[1] is None
+    solver.budget = None
+    assert solver.solve()[1] is False
+
+def test_preprocessor():
+    formula = [[1, 2, 3], [1, 2], [-1, 2, 4], [-2, 5], [-5, 6], [3, -4, -6], [-3, -6, 7]]
+    preprocessor = Preprocessor({id: Clause(id, literals) for id, literals in enumerate(formula)}, len(formula))
+    clauses, last_id = preprocessor.preprocess()
+
+    assert preprocessor.statistics["subsumed"] >= 1 and preprocessor.statistics["eliminated"] >= 1
+    assert len(clauses) < len(formula) and not preprocessor.unsatisfiable
+
+    # every model of the simplified formula extends to a model of the original one
+    variables = sorted({abs(literal) for clause in clauses.values() for literal in clause.literals})
+    models = 0
+    for values in itertools.product([False, True], repeat=len(variables)):
+        assignment = dict(zip(variables, values))
+        if all(any(assignment[abs(literal)] == (literal > 0) for literal in clause.literals) for clause in clauses.values()):
+            preprocessor.reconstruct(assignment)
+            assert all(any(assignment[abs(literal)] == (literal > 0) for literal in literals) for literals in formula)
+            models += 1
+    assert models > 0
+
+    preprocessor = Preprocessor({1: Clause(1, [1, 2]), 2: Clause(2, [-2]), 3: Clause(3, [-1, 2])}, 3)
+    preprocessor.preprocess()
+    assert preprocessor.unsatisfiable
+
+def test_binary_implication_graph():
+    clauses = [Clause(1, [-1, 2]), Clause(2, [-2, 3]), Clause(3, [-3, 1]), Clause(4, [-4, 5]), Clause(5, [-4, -5]), Clause(6, [1, 4, 6])]
+    graph = BinaryImplicationGraph.from_clauses(clauses)
+
+    assert len(graph) == 5
+    assert graph.implied(1) == {1, 2, 3} and graph.implied(-3) == {-1, -2, -3}
+    assert graph.equivalences() == {2: 1, 3: 1}
+    assert graph.failed_literals() == [4] and graph.failed_literals() == []
+
+    # implications that contradict an assignment fail too
+    assert graph.probe(1, {3: False}) and not graph.probe(-1, {3: False})
+
+    # a learned binary only makes its ancestors probed again
+    graph.add_binary(-1, 6)
+    assert graph.failed_literals() == [] and graph.implied(3) == {1, 2, 3, 6}
+    graph.add_binary(-6, -2)
+    assert set(graph.failed_literals()) == {1, 2, 3}
+
+    # -1 implies 1 and 1 implies -1
+    graph.add_binary(1, 2)
+    assert graph.equivalences() is None
+
 test_solver_case4()
\ No newline at end of file
@@ -1,85 +1,491 @@
 import sys
 import os
+import timeit
+import contextlib
 import cProfile, pstats, io
+import atexit
+import random
 from functools import partial
+from collections import defaultdict
 from multiprocessing import Pool
+from typing import Dict, List, Tuple
 
 from implementation.solver.solver_lookahead import LookAHeadSolver
+from implementation.solver.watched_knowledge_base import WatchedKnowledgeBase
+from implementation.solver.preprocessor import Preprocessor
+from implementation.solver.budget import Budget
 
 from implementation.model.exception_implementations import RunningTimeException
 from implementation.solver.solver_cdcl_dpll import *
 from implementation.util.visualizer import print_sudoku
 from implementation.model.exception_implementations import RestartException
 from implementation.util.data_management import DataManager
+from implementation.util.profiler import PhaseProfiler
 
 
 #### Constants
 MIN_ARGUMENTS = 3
-MAX_ARGUMENTS = 3
+MAX_ARGUMENTS = 4
+BATCH = "-B"
+PORTFOLIO = "P"
+CUBE_AND_CONQUER = "-SC"
+MIN_CUBE_ARGUMENTS = 3
+MAX_CUBE_ARGUMENTS = 5
+CUBE_DEPTH = 4
+MIN_BATCH_ARGUMENTS = 5
+MAX_BATCH_ARGUMENTS = 6
 MAX_VERSION = 3
 MIN_VERSION = 1
 MIN_PYTHON = 3
 MIN_PYTHON_SUB = 5
 DEPGRAPH = "DependencyGraph"
 LOOKAHEAD = "Lookahead"
-RETRYLIMIT = 5
+TRAIL = "Trail"
+WATCHED = "Watched"
+LEARNING = "ConflictLearning"
+DECISION = "DecisionHeuristic"
+RANDOM = "Random"
+VSIDS = "VSIDS"
+RESTARTS = "Restarts"
+PHASE = "PhaseSaving"
+BUDGET = "LearnedClauseBudget"
+PREPROCESS = "PreprocessingEffort"
+PREPROCESSING_EFFORT = 2000000
+LOOKAHEAD_WORKERS = "LookaheadWorkers"
+SEED = "Seed"
+PROFILE = "--profile"
+CPROFILE = "--cprofile"
+CPROFILE_LINES = 25
+RESOURCE_BUDGET = "ResourceBudget"
+
+# flags of the resource budget with the Budget argument each one sets and its type
+BUDGET_FLAGS = {"--max-time=": ("seconds", float), "--max-decisions=": ("decisions", int), "--max-conflicts=": ("conflicts", int),
+                "--max-propagations=": ("propagations", int), "--max-memory=": ("memory", float)}
+
+# (version, seed) of every configuration raced in portfolio mode, each gets its own process.
+# The look ahead of version 3 does not depend on the seed, so it is raced once
+PORTFOLIO_CONFIGURATIONS = [(2, 0), (1, 0), (3, 0), (2, 1), (1, 1), (1, 2)]
+PORTFOLIO_WINS = "portfolio-wins.txt"
 
 data_manager = DataManager(os.getcwd() + '/results/')
 
+# rules and settings of a batch worker process, set once by init_batch_worker
+batch_worker = {}
 
-def main(program_version: int, rules_dimacs_file_path: str):
+# solver of a cube-and-conquer worker process, set once by init_cube_worker
+cube_worker = {}
+
+
+def main(program_version: int, rules_dimacs_file_path: str, processes: int = None, budget: Budget = None):
     """
     Main function for solving dimacs
 
     :param program_version:
     :param rules_dimacs_file_path:
+    :param processes: number of processes the look ahead of version 3 probes on, None for a sequential look ahead
+    :param budget: resource limits of the solve, None for no limits
     :return:
     """
-    for try_count in range(RETRYLIMIT):
-        try:
 
-            # get settings
-            settings = get_settings(program_version)
+    # get settings
+    settings = get_settings(program_version)
+    if (processes is not None):
+        settings[LOOKAHEAD_WORKERS] = processes
+    settings[RESOURCE_BUDGET] = budget
 
-            # load clauses
-            all_clauses, last_id = data_manager.read_rules_dimacs(rules_dimacs_file_path, id=0)
+    # load clauses
+    all_clauses, last_id = data_manager.read_rules_dimacs(rules_dimacs_file_path, id=0)
 
-            # init implementation
-            solver = get_solver(all_clauses, last_id, settings)
+    # simplify
+    all_clauses, last_id, preprocessor = preprocess(all_clauses, last_id, settings)
+    if (preprocessor is not None and preprocessor.unsatisfiable):
+        write_solution(rules_dimacs_file_path, "", False)
 
-            # retrieve solution
-            solution, solved, stats = solver.solve_instance()
+    # init implementation
+    solver = get_solver(all_clauses, last_id, settings)
+
+    # retrieve solution, restarts are handled by the solver itself
+    try:
+        solution, solved, stats = solver.solve_instance()
+    except RestartException:
+        raise Exception("Could not get a valid answer")
+
+    print_statistics(solver.search_statistics)
+
+    # give the eliminated variables their value
+    if (solved and preprocessor is not None):
+        preprocessor.reconstruct(solution.current_set_literals)
+
+    # get dimacs, unsatisfiable problems get an empty file
+    dimacs = data_manager.to_dimacs_str(solution) if solved else ""
+
+    write_solution(rules_dimacs_file_path, dimacs, solved)
+
+
+def preprocess(all_clauses: Dict[int, Clause], last_id: int, settings: Dict) -> Tuple[Dict[int, Clause], int, Preprocessor]:
+    """
+    Simplifies the clauses before solving when the settings ask for it
+
+    :param all_clauses:
+    :param last_id:
+    :param settings:
+    :return: the clauses to solve, the last clause id in use and the preprocessor, None when there was no preprocessing
+    """
+
+    if (settings.get(PREPROCESS, None) is None):
+        return all_clauses, last_id, None
+
+    preprocessor = Preprocessor(all_clauses, last_id, effort=settings[PREPROCESS])
+    all_clauses, last_id = preprocessor.preprocess()
+
+    return all_clauses, last_id, preprocessor
+
+
+def write_solution(rules_dimacs_file_path: str, dimacs: str, solved: bool):
+    """
+    Writes the solution next to the input file and exits
+
+    :param rules_dimacs_file_path:
+    :param dimacs: solution, empty for unsatisfiable problems
+    :param solved: None when the budget ran out, then no file is written
+    :return:
+    """
 
-            # get dimacs
-            dimacs =data_manager.to_dimacs_str(solution)
+    # unknown: an earlier answer is removed, so the output file never contradicts this run
+    if (solved is None):
+        if (os.path.exists(rules_dimacs_file_path+".out")):
+            os.remove(rules_dimacs_file_path+".out")
+        print("\n\n\nFINISHED: Unknown, the budget ran out before an answer was found")
+        sys.exit(0)
+
+    # save to file
+    file = open(rules_dimacs_file_path+".out", "w")
+    file.write(dimacs+"\n")
+    file.close()
+
+    # notify user
+    if not solved:
+        print("\n\n\nFINISHED: Unsatisfiable, written to file successfully")
+        sys.exit(0)
+    print("\n\n\nFINISHED: Solved and written to file successfully")
+    sys.exit(0)
+
+
+def main_portfolio(rules_dimacs_file_path: str, configurations: List[Tuple[int, int]] = PORTFOLIO_CONFIGURATIONS):
+    """
+    Races several versions and seeds on the same dimacs file, one process each, and keeps the first answer.
+    The other processes are terminated as soon as it comes in, configurations that fail to give an answer
+    (a RestartException) are left out of the race. The winner is appended to results/portfolio-wins.txt.
+
+    :param rules_dimacs_file_path:
+    :param configurations: (version, seed) pairs
+    :return:
+    """
+
+    start = timeit.default_timer()
+    winner = None
+
+    # leaving the pool terminates the workers that are still searching
+    with Pool(len(configurations)) as pool:
+        for result in pool.imap_unordered(partial(solve_portfolio_configuration, rules_dimacs_file_path), configurations):
+            if result is not None:
+                winner = result
+                break
+
+    if (winner is None):
+        raise Exception("Could not get a valid answer")
+
+    program_version, seed, dimacs, solved, statistics, runtime = winner
+    wall_time = timeit.default_timer() - start
+
+    print(f"\nPortfolio: version {program_version} with seed {seed} won in {runtime:.2f}s ({wall_time:.2f}s wall time)")
+    print_statistics(statistics)
+    record_portfolio_win(rules_dimacs_file_path, program_version, seed, solved, runtime)
 
-            # save to file
-            file = open(rules_dimacs_file_path+".out", "w")
-            file.write(dimacs+"\n")
-            file.close()
+    write_solution(rules_dimacs_file_path, dimacs, solved)
 
-            # notify user
-            print("\n\n\nFINISHED: Solved and written to file successfully")
-            sys.exit(0)
 
+def solve_portfolio_configuration(rules_dimacs_file_path: str, configuration: Tuple[int, int]):
+    """
+    Solves a dimacs file with one configuration of the portfolio
+
+    :param rules_dimacs_file_path:
+    :param configuration: version and seed
+    :return: version, seed, dimacs of the solution, whether it was solved, search statistics and runtime,
+             None if the configuration could not give an answer
+    """
+
+    program_version, seed = configuration
+    start = timeit.default_timer()
+    random.seed(seed)
+
+    # the progress of the solvers is not readable with several processes at once
+    settings = get_settings(program_version)
+    settings[SEED] = seed
+    with contextlib.redirect_stdout(io.StringIO()):
+        all_clauses, last_id = data_manager.read_rules_dimacs(rules_dimacs_file_path, id=0)
+        all_clauses, last_id, preprocessor = preprocess(all_clauses, last_id, settings)
+        if (preprocessor is not None and preprocessor.unsatisfiable):
+            return program_version, seed, "", False, {}, timeit.default_timer() - start
+        solver = get_solver(all_clauses, last_id, settings)
+        try:
+            solution, solved, stats = solver.solve_instance()
         except RestartException:
-            print(f"Restarted")
+            return None
+
+    if (solved and preprocessor is not None):
+        preprocessor.reconstruct(solution.current_set_literals)
+
+    dimacs = data_manager.to_dimacs_str(solution) if solved else ""
+
+    return program_version, seed, dimacs, solved, dict(solver.search_statistics), timeit.default_timer() - start
+
+
+def record_portfolio_win(rules_dimacs_file_path: str, program_version: int, seed: int, solved: bool, runtime: float):
+    """
+    Appends the winner of a race to the wins file and prints the wins per configuration so far,
+    which is what the portfolio mix is tuned on
+
+    :param rules_dimacs_file_path:
+    :param program_version:
+    :param seed:
+    :param solved:
+    :param runtime:
+    :return:
+    """
+
+    wins_path = os.path.join(data_manager.directory, PORTFOLIO_WINS)
+    os.makedirs(data_manager.directory, exist_ok=True)
+    with open(wins_path, "a") as wins_file:
+        wins_file.write(f"{os.path.basename(rules_dimacs_file_path)}\t{program_version}\t{seed}\t{'sat' if solved else 'unsat'}\t{runtime:.4f}\n")
+
+    wins = defaultdict(int)
+    with open(wins_path) as wins_file:
+        for line in wins_file:
+            fields = line.split("\t")
+            wins[(int(fields[1]), int(fields[2]))] += 1
+
+    print("Wins so far: " + ", ".join(f"-S{version} seed {seed}: {count}" for (version, seed), count in sorted(wins.items())))
+
+
+def main_cube_and_conquer(rules_dimacs_file_path: str, depth: int, processes: int):
+    """
+    Cube-and-conquer: the look ahead solver (version 3) splits the problem into cubes of at most 'depth' decisions,
+    a pool of conflict learning workers (version 2) solves the formula under every cube as assumptions.
+    Cubes are handed out while they are split off, the first satisfiable cube stops everything,
+    the problem is unsatisfiable when all cubes are.
+
+    :param rules_dimacs_file_path:
+    :param depth:
+    :param processes:
+    :return:
+    """
+
+    start = timeit.default_timer()
+
+    all_clauses, last_id = data_manager.read_rules_dimacs(rules_dimacs_file_path, id=0)
+    splitter = LookAHeadSolver(KnowledgeBase(all_clauses, clause_counter=last_id, trail=True))
+
+    solved = False
+    dimacs = ""
+    cubes = 0
+
+    # leaving the pool terminates the workers that are still searching
+    with Pool(processes, initializer=init_cube_worker, initargs=(rules_dimacs_file_path,)) as pool:
+        for cube, solved, dimacs, runtime in pool.imap_unordered(solve_cube, splitter.cubes(depth)):
+            cubes += 1
+            if solved:
+                print(f"\nCube {cube} is satisfiable, solved in {runtime:.2f}s")
+                break
+
+    wall_time = timeit.default_timer() - start
+    print(f"\nCube-and-conquer: {cubes} cubes solved in {wall_time:.2f}s with {processes} processes, "
+          f"{splitter.nr_of_splits + 1} look ahead nodes, {splitter.failed_literals} failed literals")
+
+    write_solution(rules_dimacs_file_path, dimacs, solved)
+
+
+def init_cube_worker(rules_dimacs_file_path: str):
+    """
+    Builds one conflict learning solver per worker process, it solves all cubes the worker gets incrementally
+
+    :param rules_dimacs_file_path:
+    :return:
+    """
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        all_clauses, last_id = data_manager.read_rules_dimacs(rules_dimacs_file_path, id=0)
+        cube_worker["solver"] = get_solver(all_clauses, last_id, get_settings(2))
+
+
+def solve_cube(cube: List[int]) -> Tuple[List[int], bool, str, float]:
+    """
+    Solves the formula of a cube-and-conquer worker under a cube
+
+    :param cube: literals to assume
+    :return: the cube, whether it is satisfiable, the solution as dimacs and the time it took
+    """
+
+    start = timeit.default_timer()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        solution, solved, stats = cube_worker["solver"].solve(assumptions=cube)
+
+    dimacs = data_manager.to_dimacs_str(solution) if solved else ""
+
+    return cube, solved, dimacs, timeit.default_timer() - start
+
+
+def main_batch(program_versions: List[int], puzzles_path: str, rules_dimacs_file_path: str, processes: int, budget: Budget = None):
+    """
+    Solves every one-liner sudoku in a file over a pool of worker processes, for each version.
+    The rules are compiled once and every worker loads them once, the solutions are written to one file per version
+    as they come in: puzzle number, solution (or 'unsatisfiable', or 'unknown' when the budget ran out) and solve time on every line.
+
+    :param program_versions:
+    :param puzzles_path:
+    :param rules_dimacs_file_path:
+    :param processes:
+    :param budget: resource limits of every puzzle, None for no limits
+    :return:
+    """
+
+    # compile the rules, so the workers only memory map them
+    data_manager.read_compiled_dimacs(rules_dimacs_file_path, id=0)
+
+    puzzles = list(data_manager.read_text_sudokus(puzzles_path))
+
+    for program_version in program_versions:
+
+        settings = get_settings(program_version)
+        settings[RESOURCE_BUDGET] = budget
+        results_path = f"{puzzles_path}.S{program_version}.out"
+        latencies = []
+        unsolved = 0
+        unknown = 0
 
-    raise Exception(f"Tried {RETRYLIMIT} times, could not get a valid answer")
+        start = timeit.default_timer()
+        with Pool(processes, initializer=init_batch_worker, initargs=(rules_dimacs_file_path, settings)) as pool, open(results_path, "w") as results_file:
+            for puzzle_number, solution, solved, runtime in pool.imap_unordered(solve_text_sudoku, puzzles):
+                results_file.write(f"{puzzle_number}\t{solution if solved else 'unknown' if solved is None else 'unsatisfiable'}\t{runtime:.4f}\n")
+                results_file.flush()
+                latencies.append(runtime)
+                unsolved += not solved
+                unknown += solved is None
+        wall_time = timeit.default_timer() - start
+
+        print_batch_statistics(program_version, latencies, unsolved, unknown, wall_time, results_path)
+
+
+def init_batch_worker(rules_dimacs_file_path: str, settings: Dict[str, bool]):
+    """
+    Loads the rules once per worker process, every puzzle gets a copy of them.
+    With conflict learning one solver is built on the rules instead, it solves every puzzle incrementally
+    with the givens as assumptions and keeps what it learned in between.
+
+    :param rules_dimacs_file_path:
+    :param settings:
+    :return:
+    """
+
+    rules, last_id = data_manager.read_compiled_dimacs(rules_dimacs_file_path, id=0, clause_store=False)
+
+    batch_worker["last_id"] = last_id
+    batch_worker["settings"] = settings
+
+    if (settings[LEARNING]):
+        with contextlib.redirect_stdout(io.StringIO()):
+            batch_worker["solver"] = get_solver(rules, last_id, settings)
+    else:
+        batch_worker["rules"] = data_manager.dump_only(rules)
+
+
+def solve_text_sudoku(puzzle: Tuple[int, str]) -> Tuple[int, str, bool, float]:
+    """
+    Solves one one-liner sudoku in a batch worker
+
+    :param puzzle: puzzle number and line
+    :return: puzzle number, solution as one-liner, whether it was solved and the time it took
+    """
+
+    puzzle_number, line = puzzle
+    start = timeit.default_timer()
+
+    givens, last_id = data_manager.parse_text_sudoku(line, batch_worker["last_id"])
+
+    # the progress of the solvers is not readable with many processes at once
+    with contextlib.redirect_stdout(io.StringIO()):
+        if ("solver" in batch_worker):
+            solution, solved, stats = batch_worker["solver"].solve(assumptions=[clause.first() for clause in givens.values()])
+        else:
+            clauses = data_manager.load_only(batch_worker["rules"])
+            clauses.update(givens)
+            solver = get_solver(clauses, last_id, batch_worker["settings"])
+            try:
+                solution, solved, stats = solver.solve_instance()
+            except RestartException:
+                solved = False
+
+    runtime = timeit.default_timer() - start
+
+    return puzzle_number, data_manager.to_text_sudoku(solution) if solved else "", solved, runtime
+
+
+def print_batch_statistics(program_version: int, latencies: List[float], unsolved: int, unknown: int, wall_time: float, results_path: str):
+    """
+    Prints the throughput and the latency percentiles of a batch
+
+    :param program_version:
+    :param latencies:
+    :param unsolved:
+    :param unknown: puzzles of which the budget ran out, they are among the unsolved ones
+    :param wall_time:
+    :param results_path:
+    :return:
+    """
+
+    latencies = sorted(latencies)
+    percentiles = ", ".join(f"p{percentile}: {1000 * latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]:.1f} ms" for percentile in [50, 90, 99])
+
+    print(f"\nVersion {program_version}: {len(latencies)} puzzles ({unsolved} unsolved, {unknown} over budget) in {wall_time:.2f}s, "
+          f"{len(latencies) / wall_time:.1f} puzzles/second, latency {percentiles}, max: {1000 * latencies[-1]:.1f} ms, "
+          f"written to {results_path}")
+
+
+def print_statistics(search_statistics: Dict):
+    """
+    Prints the counters of the search
+
+    :param search_statistics:
+    :return:
+    """
+
+    statistics = dict(search_statistics)
+    intervals = statistics.pop("restart_intervals", [])
+    if (len(intervals) > 0):
+        statistics["mean_restart_interval"] = sum(intervals) / len(intervals)
+        statistics["max_restart_interval"] = max(intervals)
+
+    print("\nStatistics: " + ", ".join(f"{key}: {value}" for key, value in sorted(statistics.items())))
 
 
 def get_solver(clauses : Dict[int, Clause], last_id : int, settings: Dict[str, bool]):
     """ Retrieves implementation fit to version """
 
     # build knowledge base
-    kb = KnowledgeBase(clauses, clause_counter=last_id, dependency_graph=settings[DEPGRAPH])
+    if (settings[WATCHED]):
+        kb = WatchedKnowledgeBase(clauses, clause_counter=last_id)
+    else:
+        kb = KnowledgeBase(clauses, clause_counter=last_id, dependency_graph=settings[DEPGRAPH], trail=settings[TRAIL])
 
     # init implementation
     if (settings[LOOKAHEAD]):
-        solver = LookAHeadSolver(kb)
+        solver = LookAHeadSolver(kb, workers=settings.get(LOOKAHEAD_WORKERS, None))
     else:
         solver = CDCL_DPLL_Solver(kb,  heuristics=settings)
 
+    solver.budget = settings.get(RESOURCE_BUDGET, None)
+
     return solver
 
 def get_settings(program_version: int):
@@ -94,11 +500,11 @@ def get_settings(program_version: int):
         raise Exception("Program version should be between 1-3")
 
     if program_version == 3:
-        return {DEPGRAPH : False, LOOKAHEAD : True}
+        return {DEPGRAPH : False, LOOKAHEAD : True, TRAIL : True, WATCHED : False, LEARNING : False, DECISION : RANDOM, RESTARTS : "None", PHASE : False, BUDGET : None, PREPROCESS : PREPROCESSING_EFFORT}
     elif (program_version == 1):
-        return {DEPGRAPH : False, LOOKAHEAD : False}
+        return {DEPGRAPH : False, LOOKAHEAD : False, TRAIL : True, WATCHED : True, LEARNING : False, DECISION : RANDOM, RESTARTS : "None", PHASE : False, BUDGET : None, PREPROCESS : None}
     elif (program_version == 2):
-        return {DEPGRAPH : True,  LOOKAHEAD: False}
+        return {DEPGRAPH : False, LOOKAHEAD: False, TRAIL : True, WATCHED : True, LEARNING : True, DECISION : VSIDS, RESTARTS : "Glucose", PHASE : True, BUDGET : 2000, PREPROCESS : None}
 
 def enforce_python_version():
     """
@@ -112,6 +518,74 @@ def enforce_python_version():
         raise Exception("\n\n####################\nMake sure correct version of python is installed (3.5 or higher)\n####################\n\n")
 
 
+def start_profiling(input_file: str, use_cprofile: bool):
+    """
+    Turns on the phase profiler, and cProfile if asked, for the rest of the run.
+    At exit the phase summary is printed and written as json to [inputfile].profile.json,
+    the cProfile statistics are printed and written to [inputfile].prof.
+
+    :param input_file:
+    :param use_cprofile:
+    :return:
+    """
+
+    profiler = PhaseProfiler()
+    profiler.enable()
+
+    profile = cProfile.Profile() if use_cprofile else None
+    if (profile is not None):
+        profile.enable()
+
+    def stop_profiling():
+        profiler.disable()
+        profiler.report()
+        profiler.write(input_file + ".profile.json")
+
+        if (profile is not None):
+            profile.disable()
+            profile.dump_stats(input_file + ".prof")
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(CPROFILE_LINES)
+            print(stream.getvalue())
+
+    atexit.register(stop_profiling)
+
+    return profiler
+
+def parse_profile_arguments(arguments):
+    """
+    Takes the profiling flags out of the arguments: --profile for the phase profiler, --cprofile for cProfile as well
+
+    :param arguments:
+    :return: the other arguments, whether to profile and whether to use cProfile
+    """
+
+    use_cprofile = CPROFILE in arguments
+    use_profiler = use_cprofile or PROFILE in arguments
+
+    return [argument for argument in arguments if argument not in (PROFILE, CPROFILE)], use_profiler, use_cprofile
+
+def parse_budget_arguments(arguments):
+    """
+    Takes the budget flags out of the arguments: --max-time=[seconds], --max-decisions=[n], --max-conflicts=[n],
+    --max-propagations=[n] and --max-memory=[megabytes]
+
+    :param arguments:
+    :return: the other arguments and the budget, None when no flag was given
+    """
+
+    limits = {}
+    others = []
+    for argument in arguments:
+        flag = next((flag for flag in BUDGET_FLAGS if argument.startswith(flag)), None)
+        if (flag is None):
+            others.append(argument)
+        else:
+            name, type = BUDGET_FLAGS[flag]
+            limits[name] = type(argument[len(flag):])
+
+    return others, Budget(**limits) if len(limits) > 0 else None
+
 def parse_arguments(arguments):
     """
     Parses argument
@@ -127,24 +601,105 @@ def parse_arguments(arguments):
     if len(option) != 3 or option[0:2] != '-S':
         raise RuntimeError("Invalid program option")
 
-    program_version = int(option[2])
+    # -SP races all versions, None stands for the portfolio
+    program_version = None if option[2] == PORTFOLIO else int(option[2])
+
+
+    dirname = os.path.dirname(__file__)
+    input_file = os.path.join(dirname, arguments[2])
+
+    # the look ahead of version 3 can probe on several processes
+    processes = int(arguments[3]) if number_of_arguments == MAX_ARGUMENTS else None
+
+    return program_version, input_file, processes
 
+def parse_cube_arguments(arguments):
+    """
+    Parses arguments of cube-and-conquer: -SC [inputfile] [depth] [processes]
+
+    :param arguments:
+    :return:
+    """
+    number_of_arguments = len(arguments)
+    if (number_of_arguments < MIN_CUBE_ARGUMENTS or number_of_arguments > MAX_CUBE_ARGUMENTS):
+        raise Exception(f"You gave {number_of_arguments} arguments while it should be between {MIN_CUBE_ARGUMENTS} - {MAX_CUBE_ARGUMENTS} in cube-and-conquer mode")
 
     dirname = os.path.dirname(__file__)
     input_file = os.path.join(dirname, arguments[2])
+    depth = int(arguments[3]) if number_of_arguments > 3 else CUBE_DEPTH
+    processes = int(arguments[4]) if number_of_arguments > 4 else os.cpu_count()
+
+    return input_file, depth, processes
 
-    return program_version, input_file
+def parse_batch_arguments(arguments):
+    """
+    Parses arguments of batch mode: -S#[#...] -B [puzzlefile] [rulesfile] [processes]
+
+    :param arguments:
+    :return:
+    """
+    number_of_arguments = len(arguments)
+    if (number_of_arguments < MIN_BATCH_ARGUMENTS or number_of_arguments > MAX_BATCH_ARGUMENTS):
+        raise Exception(f"You gave {number_of_arguments} arguments while it should be between {MIN_BATCH_ARGUMENTS} - {MAX_BATCH_ARGUMENTS} in batch mode")
+
+    option = arguments[1]
+    if len(option) < 3 or option[0:2] != '-S' or not option[2:].isdigit():
+        raise RuntimeError("Invalid program option")
+
+    program_versions = [int(version) for version in option[2:]]
+
+    dirname = os.path.dirname(__file__)
+    puzzles_file = os.path.join(dirname, arguments[3])
+    rules_file = os.path.join(dirname, arguments[4])
+    processes = int(arguments[5]) if number_of_arguments == MAX_BATCH_ARGUMENTS else os.cpu_count()
+
+    return program_versions, puzzles_file, rules_file, processes
 
 if __name__ == "__main__":
 
     # check env
     enforce_python_version()
 
-    # get arguments
-    program_version, input_file = parse_arguments(sys.argv)
+    # profiling and budget flags can go anywhere
+    arguments, use_profiler, use_cprofile = parse_profile_arguments(sys.argv)
+    arguments, budget = parse_budget_arguments(arguments)
+
+    if (len(arguments) > 2 and arguments[2] == BATCH):
+
+        # get arguments
+        program_versions, puzzles_file, rules_file, processes = parse_batch_arguments(arguments)
+        if (use_profiler):
+            start_profiling(puzzles_file, use_cprofile)
+
+        # run
+        main_batch(program_versions, puzzles_file, rules_file, processes, budget)
+
+    elif (len(arguments) > 1 and arguments[1] == CUBE_AND_CONQUER):
+
+        # get arguments
+        input_file, depth, processes = parse_cube_arguments(arguments)
+        if (use_profiler):
+            start_profiling(input_file, use_cprofile)
+
+        # run
+        if (budget is not None):
+            raise Exception("Budgets are not supported in cube-and-conquer mode")
+        main_cube_and_conquer(input_file, depth, processes)
+
+    else:
 
-    # run
-    main(program_version, input_file)
+        # get arguments
+        program_version, input_file, processes = parse_arguments(arguments)
+        if (use_profiler):
+            start_profiling(input_file, use_cprofile)
+
+        # run
+        if (program_version is None):
+            if (budget is not None):
+                raise Exception("Budgets are not supported in portfolio mode")
+            main_portfolio(input_file)
+        else:
+            main(program_version, input_file, processes, budget)
 
     # exit successfully
     sys.exit(0)